@@ -0,0 +1,168 @@
+"""
+Change notifications for waiting clients.
+
+Every commit that bumps the change versions (see change_tracking.py) advances
+the sync token and wakes requests blocked in /sync/wait or streaming
+/sync/events. The token is the commit time in epoch milliseconds (strictly
+increasing); clients send back the last token they saw.
+
+Backends (CHANGE_NOTIFIER_BACKEND):
+- "memory": wakeups stay inside this process (single worker).
+- "postgres": every committing transaction also sends pg_notify(), and a
+  listener thread applies other workers' changes to the local versions, so
+  waits and ETags are correct across workers. Falls back to "memory" on
+  other databases.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+from typing import Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .change_tracking import change_tracker, pending_tables
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "financehub_changes"
+
+
+class ChangeNotifier:
+    """Sync token plus the asyncio futures of everyone waiting for it to move."""
+
+    def __init__(self):
+        self.token = int(time.time() * 1000)
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = set()
+        self._lock = threading.Lock()
+
+    def notify(self, tables: Set[str]) -> None:
+        """Advance the token and wake all waiters. Safe to call from any thread."""
+        with self._lock:
+            self.token = max(int(time.time() * 1000), self.token + 1)
+            waiters = list(self._waiters)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    async def wait(self, since: int, timeout: float) -> int:
+        """Return the current token once it is newer than `since`, or after `timeout` seconds."""
+        if self.token > since:
+            return self.token
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            # Re-check: a commit may have landed before we registered
+            if self.token <= since:
+                await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        return self.token
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+notifier = ChangeNotifier()
+
+
+class PostgresChangeListener(threading.Thread):
+    """LISTENs on a dedicated connection and applies other workers' changes locally."""
+
+    def __init__(self, engine: Engine, channel: str = NOTIFY_CHANNEL):
+        super().__init__(name="pg-change-listener", daemon=True)
+        self.dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                logger.info(f"[NOTIFY] Listening on channel {self.channel}")
+                backoff = 1.0
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"[NOTIFY] Listener connection failed: {e}; retrying in {backoff:.0f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _handle(self, payload: str) -> None:
+        epoch, _, tables = payload.partition(":")
+        if epoch == change_tracker.epoch:
+            return  # Our own commit, already applied
+        changed = {t for t in tables.split(",") if t}
+        logger.debug(f"[NOTIFY] Remote change from {epoch}: {sorted(changed)}")
+        change_tracker.bump(changed)
+
+
+def install_postgres_publisher(session_factory, channel: str = NOTIFY_CHANNEL) -> None:
+    """Send pg_notify() inside every committing transaction that changed tables."""
+
+    @event.listens_for(session_factory, "before_commit")
+    def _publish(session):
+        if session.in_nested_transaction():
+            return
+        # Flush now so the pending set includes the final flush of this commit
+        session.flush()
+        tables = pending_tables(session)
+        if tables:
+            payload = f"{change_tracker.epoch}:{','.join(sorted(tables))}"
+            # Transactional: delivered only if this commit succeeds
+            session.connection().exec_driver_sql("SELECT pg_notify(%s, %s)", (channel, payload))
+
+
+_listener: Optional[PostgresChangeListener] = None
+
+
+def start(engine: Engine, session_factory) -> None:
+    """Hook the notifier to commits and start the configured backend."""
+    global _listener
+    change_tracker.add_listener(notifier.notify)
+
+    backend = settings.change_notifier_backend
+    if backend == "postgres":
+        if engine.dialect.name != "postgresql":
+            logger.warning(f"[NOTIFY] Postgres backend needs PostgreSQL, got {engine.dialect.name}; using memory")
+            return
+        install_postgres_publisher(session_factory)
+        _listener = PostgresChangeListener(engine)
+        _listener.start()
+    logger.info(f"[NOTIFY] Change notifier started (backend={backend})")
+
+
+def stop() -> None:
+    change_tracker.remove_listener(notifier.notify)
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,176 @@
+"""
+Per-table change versions for conditional GETs.
+
+Every committed write through a Session bumps an in-memory counter for each
+table it touched (ORM flushes and Core/bulk UPDATE/INSERT/DELETE statements
+alike). Read endpoints derive a weak ETag from the counters of the tables
+they read, so a client polling with If-None-Match gets 304 Not Modified from
+one in-memory comparison instead of re-running the queries.
+
+Counters live in the process. The epoch (random per process start) is part
+of every ETag, so a restart can never produce a stale match. With several
+workers, either use CHANGE_NOTIFIER_BACKEND=postgres (workers apply each
+other's changes, see change_notifier.py) or disable ETags with
+ETAG_ENABLED=false.
+"""
+import hashlib
+import logging
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "changed_tables"
+
+# Bookkeeping tables whose writes are not data changes (see ignore_tables)
+_IGNORED_TABLES: Set[str] = set()
+
+ChangeListener = Callable[[Set[str]], None]
+
+
+class ChangeTracker:
+    """Monotonic version counter per table, plus commit listeners."""
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self._versions: Dict[str, int] = {}
+        self._listeners: List[ChangeListener] = []
+        self._lock = threading.Lock()
+
+    def bump(self, tables: Iterable[str]) -> None:
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            listeners = list(self._listeners)
+        logger.debug(f"[CHANGES] Bumped versions: {sorted(tables)}")
+        for listener in listeners:
+            try:
+                listener(tables)
+            except Exception as e:
+                logger.error(f"[CHANGES] Listener {listener!r} failed: {e}", exc_info=True)
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._versions)
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """Call `listener(tables)` after every commit that changed something."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: ChangeListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def etag(self, tables: Iterable[str], *variant: object) -> str:
+        """
+        Weak ETag over the versions of `tables`. `variant` holds whatever else
+        the response depends on (query parameters, Accept type).
+        """
+        with self._lock:
+            state = ",".join(f"{t}={self._versions.get(t, 0)}" for t in sorted(tables))
+        digest = hashlib.blake2b(f"{state}|{variant!r}".encode("utf-8"), digest_size=8).hexdigest()
+        return f'W/"{self.epoch}-{digest}"'
+
+
+change_tracker = ChangeTracker()
+
+
+def mark_changed(session: Session, *tables: str) -> None:
+    """Record tables written in ways the session can't see (e.g. raw connection SQL)."""
+    session.info.setdefault(_PENDING_KEY, set()).update(tables)
+
+
+def pending_tables(session: Session) -> Set[str]:
+    """Tables changed in the session's current transaction so far."""
+    return set(session.info.get(_PENDING_KEY, ())) - _IGNORED_TABLES
+
+
+def ignore_tables(*tables: str) -> None:
+    """Don't bump versions or wake waiters for writes to `tables`."""
+    _IGNORED_TABLES.update(tables)
+
+
+def install(session_factory) -> None:
+    """Collect touched tables on a sessionmaker and bump them on commit."""
+
+    @event.listens_for(session_factory, "after_flush")
+    def _after_flush(session, flush_context):
+        touched = {
+            obj.__table__.name
+            for obj in (*session.new, *session.dirty, *session.deleted)
+            if hasattr(obj, "__table__")
+        }
+        if touched:
+            session.info.setdefault(_PENDING_KEY, set()).update(touched)
+
+    @event.listens_for(session_factory, "do_orm_execute")
+    def _do_orm_execute(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = getattr(orm_execute_state.statement, "table", None)
+            if table is not None:
+                mark_changed(orm_execute_state.session, table.name)
+
+    @event.listens_for(session_factory, "after_commit")
+    def _after_commit(session):
+        # Savepoint releases also fire after_commit; only the outer commit counts
+        if session.in_nested_transaction():
+            return
+        tables = session.info.pop(_PENDING_KEY, None)
+        if tables:
+            change_tracker.bump(tables - _IGNORED_TABLES)
+
+    @event.listens_for(session_factory, "after_rollback")
+    def _after_rollback(session):
+        if not session.in_nested_transaction():
+            session.info.pop(_PENDING_KEY, None)
+
+
+def etag_for(tables: Iterable[str], request: Request, *variant: object) -> Optional[str]:
+    """ETag for a read of `tables`, varying on the query string and Accept."""
+    if not settings.etag_enabled:
+        return None
+    return change_tracker.etag(tables, request.url.query, request.headers.get("accept", ""), *variant)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """304 response when If-None-Match already names `etag`, else None."""
+    header = request.headers.get("if-none-match")
+    if etag is None or not header or not _matches(header, etag):
+        return None
+    return Response(status_code=304, headers=etag_headers(etag))
+
+
+def etag_headers(etag: Optional[str]) -> Dict[str, str]:
+    """Headers to attach to a full response; clients must revalidate before reuse."""
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": "no-cache"}
@@ -0,0 +1,343 @@
+"""
+HTTP compression middleware.
+
+Responses are compressed with the best encoding the client accepts (zstd, br
+or gzip) once they reach a minimum size. Streaming responses are compressed
+chunk by chunk with a flush after each chunk, so NDJSON/event streams keep
+flowing. Compressed request bodies (Content-Encoding) are accepted on the
+configured path prefixes, e.g. /api/v1/sync/atomic uploads from phones.
+
+brotli and zstandard are optional; encodings whose library is missing are
+simply never negotiated.
+"""
+import io
+import logging
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content types that are already compressed (or not worth compressing)
+INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/",
+    "application/gzip", "application/x-gzip", "application/zip",
+    "application/zstd", "application/x-brotli",
+)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class RequestTooLarge(Exception):
+    """Decompressed request body exceeds the configured limit."""
+
+
+def _gunzip(data: bytes, limit: int) -> bytes:
+    obj = zlib.decompressobj(47)  # gzip or zlib header
+    out = obj.decompress(data, limit + 1)
+    if len(out) > limit or obj.unconsumed_tail:
+        raise RequestTooLarge()
+    if not obj.eof:
+        raise ValueError("truncated gzip stream")
+    return out
+
+
+def _unbrotli(data: bytes, limit: int) -> bytes:
+    # output_buffer_limit stops each process() call once its output buffer
+    # reaches the remaining budget (it may overshoot by one buffer step); the
+    # rest stays inside the decoder until asked for with empty input, so a
+    # bomb never expands much past the limit (brotli >= 1.2)
+    obj = brotli.Decompressor()
+    out = bytearray(obj.process(data, output_buffer_limit=limit + 1))
+    while len(out) <= limit and not obj.can_accept_more_data():
+        out += obj.process(b"", output_buffer_limit=limit + 1 - len(out))
+    if len(out) > limit:
+        raise RequestTooLarge()
+    if not obj.is_finished():
+        raise ValueError("truncated brotli stream")
+    return bytes(out)
+
+
+# Older brotli can't bound its output: br request bodies are then refused (415)
+_BROTLI_BOUNDED = brotli is not None and hasattr(brotli.Decompressor, "can_accept_more_data")
+
+
+def _unzstd(data: bytes, limit: int) -> bytes:
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+    out = reader.read(limit + 1)
+    if len(out) > limit:
+        raise RequestTooLarge()
+    return out
+
+
+def available_encodings() -> List[str]:
+    """Supported encodings in server preference order."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: Sequence[str]) -> Optional[str]:
+    """
+    Pick the encoding with the highest q-value from Accept-Encoding.
+    Ties are broken by server preference (order of `supported`).
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware) so streaming bodies are
+    compressed as they are produced instead of being buffered.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+        decompress_paths: Sequence[str] = (),
+        max_request_size: int = 16 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.decompress_paths = tuple(decompress_paths)
+        self.max_request_size = max_request_size
+        self.supported = available_encodings()
+        self._factories: Dict[str, Callable[[], object]] = {
+            "gzip": lambda: _GzipCompressor(gzip_level),
+            "br": lambda: _BrotliCompressor(brotli_quality),
+            "zstd": lambda: _ZstdCompressor(zstd_level),
+        }
+        self._decoders: Dict[str, Callable[[bytes, int], bytes]] = {"gzip": _gunzip, "x-gzip": _gunzip}
+        if _BROTLI_BOUNDED:
+            self._decoders["br"] = _unbrotli
+        if zstandard is not None:
+            self._decoders["zstd"] = _unzstd
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+
+        request_encoding = headers.get("content-encoding", "").strip().lower()
+        if request_encoding and request_encoding != "identity" and scope["path"].startswith(self.decompress_paths):
+            decoded = await self._decompress_request(scope, receive, send, request_encoding)
+            if decoded is None:
+                return
+            scope, receive = decoded
+
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""), self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self.app, self._factories[encoding], encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+    async def _decompress_request(
+        self, scope: Scope, receive: Receive, send: Send, encoding: str
+    ) -> Optional[Tuple[Scope, Receive]]:
+        decoder = self._decoders.get(encoding)
+        if decoder is None:
+            await _plain_response(send, 415, f"Unsupported Content-Encoding: {encoding}")
+            return None
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        try:
+            body = decoder(b"".join(chunks), self.max_request_size)
+        except RequestTooLarge:
+            await _plain_response(send, 413, "Decompressed request body too large")
+            return None
+        except Exception as e:
+            logger.warning(f"[COMPRESSION] Failed to decode {encoding} request body: {e}")
+            await _plain_response(send, 400, f"Invalid {encoding} request body")
+            return None
+
+        logger.debug(f"[COMPRESSION] Request body {encoding}: {sum(map(len, chunks))} -> {len(body)} bytes")
+
+        new_scope = dict(scope)
+        request_headers = MutableHeaders(scope=new_scope)
+        del request_headers["content-encoding"]
+        request_headers["content-length"] = str(len(body))
+
+        sent = False
+
+        async def decoded_receive() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return new_scope, decoded_receive
+
+
+class _CompressingResponder:
+    def __init__(self, app: ASGIApp, factory: Callable[[], object], encoding: str, minimum_size: int):
+        self.app = app
+        self.factory = factory
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+        self.started = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _should_skip(self, headers: MutableHeaders) -> bool:
+        if self.start_message["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return True
+        content_type = headers.get("content-type", "").lower()
+        return content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+    async def send_wrapper(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Defer until the first body chunk tells us size and streaming mode
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if self._should_skip(headers) or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                if not self._should_skip(headers):
+                    headers.add_vary_header("Accept-Encoding")
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = self.factory()
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Streaming: length unknown, flush every chunk so readers see it promptly
+                del headers["content-length"]
+                chunk = self.compressor.compress(body) + self.compressor.flush()
+            else:
+                chunk = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(chunk))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if more_body:
+            chunk = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            chunk = self.compressor.compress(body) + self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+async def _plain_response(send: Send, status: int, detail: str) -> None:
+    body = ('{"detail": "%s"}' % detail).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
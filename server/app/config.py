@@ -7,7 +7,70 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
-    
+
+    # SQL profiling (see app/sql_profiler.py)
+    sql_profile_sample_rate: float = 0.0  # Fraction of requests profiled without the header
+    sql_profile_header_enabled: bool = True  # Allow X-Profile-SQL: 1 to force profiling
+    sql_profile_top_n: int = 10
+    sql_profile_history_size: int = 200
+
+    # HTTP compression (see app/compression.py)
+    compression_minimum_size: int = 1024  # Smaller responses are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    max_decompressed_request_size: int = 16 * 1024 * 1024  # Guard against compression bombs
+
+    # Conditional GETs (see app/change_tracking.py)
+    etag_enabled: bool = True  # Versions are per process: disable for multi-worker setups without a notifier
+
+    # Change notifications (see app/change_notifier.py)
+    change_notifier_backend: str = "memory"  # "memory" or "postgres" (LISTEN/NOTIFY, multi-worker)
+    sync_wait_max_timeout: int = 60  # Seconds a long-poll may block
+    sync_events_keepalive: int = 15  # Seconds between SSE keepalive comments
+
+    # Atomic sync
+    atomic_sync_parallel_workers: int = 0  # >1 runs independent groups concurrently (PostgreSQL only)
+    atomic_sync_coalesce: bool = True  # Fold create/update/delete chains per entity before replay
+    idempotency_ttl_seconds: int = 24 * 3600  # How long a stored /sync/atomic response can be replayed
+    idempotency_cache_size: int = 1024  # Responses kept in the in-memory LRU in front of the table
+
+    # Device sync state (see app/services/device_sync_service.py)
+    device_active_days: int = 30  # Devices seen within this window hold back tombstone purging
+    device_seen_resolution: int = 60  # Seconds; last_seen_at is not rewritten more often than this
+
+    # Tombstone compaction (see app/services/compaction_service.py)
+    tombstone_retention_days: int = 90  # Soft-deleted rows are kept at least this long
+    compaction_respect_devices: bool = True  # Also wait until every active device acknowledged the delete
+    compaction_batch_size: int = 500  # Rows per delete batch (one short transaction each)
+    compaction_interval_hours: int = 0  # >0 runs compaction (and archiving) periodically in the API process
+
+    # Expense archive (see app/services/archive_service.py)
+    archive_after_days: int = 0  # >0 moves expenses created longer ago than this to expenses_archive
+    archive_batch_size: int = 1000
+
+    # Expense partitioning (migrations/optional/001_partition_expenses_by_year.sql)
+    expense_partition_years_ahead: int = 1  # Partitions kept ready beyond the current year
+
+    # Entity ids (see app/models/types.py and app/models/link_ids.py)
+    native_uuid_keys: bool = False  # PostgreSQL only, after migrations/optional/002_native_uuid_keys.sql
+    compact_link_tables: bool = False  # (parent, tag) keyed link tables, after migrations/optional/003_compact_link_tables.sql
+
+    # Sync payloads (see app/sync_payloads.py)
+    sync_sql_json: bool = False  # PostgreSQL builds /sync/updated-data and /sync/full JSON itself (json_agg)
+
+    # Bootstrap snapshots (see app/services/snapshot_service.py)
+    snapshot_dir: str = "./data/snapshots"  # Under the ./data volume in docker-compose.yml
+    snapshot_interval_minutes: int = 0  # >0 rebuilds the snapshot periodically in the API process
+    snapshot_max_age_minutes: int = 60  # /sync/snapshot rebuilds an older (or missing) snapshot on demand
+    snapshot_compression_level: int = 6  # gzip level of the snapshot file
+    snapshot_accel_redirect_prefix: str = ""  # e.g. "/snapshots/": nginx sends the file (X-Accel-Redirect, sendfile)
+
+    # In-memory indexes (see app/services/memory_index.py)
+    memory_index_refresh_delay: float = 0.5  # Seconds to coalesce writes before a refresh
+    memory_index_rebuild_seconds: int = 3600  # Full rebuild interval (0 disables)
+    tag_autocomplete_half_life_days: float = 30  # Usage older than this counts half
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,7 +1,9 @@
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from .config import settings
+from . import sql_profiler
+from . import change_tracking
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,9 +26,15 @@ def receive_commit(conn):
 def receive_rollback(conn):
     logger.warning(f"[DB ENGINE] ROLLBACK executed on connection")
 
+# Per-request SQL profiling hooks (no-op unless a request is being profiled)
+sql_profiler.install(engine)
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Bump per-table change versions on commit (ETags, change notifications)
+change_tracking.install(SessionLocal)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -48,6 +56,20 @@ def get_db():
         logger.info(f"[DB SESSION] Session {id(db)} closed")
 
 
+def begin_read_snapshot(db: Session) -> None:
+    """
+    Start the session's next transaction as a consistent, read-only snapshot
+    (REPEATABLE READ, READ ONLY on PostgreSQL), ending any transaction
+    already open. On SQLite a single statement reads one snapshot anyway.
+    """
+    if db.in_transaction():
+        db.commit()
+    options = {}
+    if engine.dialect.name == "postgresql":
+        options = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+    db.connection(execution_options=options)
+
+
 def create_tables():
     """Create all tables in the database"""
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -1,16 +1,27 @@
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
+import asyncio
 import time
 import logging
 import json
+import uuid
 
-from .database import get_db, create_tables
+from .database import get_db, create_tables, engine, SessionLocal
 from .config import settings
-from .routes import operations, sync, query, batch_sync, atomic_sync
+from .routes import operations, sync, query, search, batch_sync, atomic_sync, notifications, devices
 from .logging_config import setup_logging
+from . import sql_profiler
+from . import change_notifier
+from .compression import CompressionMiddleware
+from .services.compaction_service import compaction_loop
+from .services.partition_service import ensure_expense_partitions
+from .services.search_service import ensure_search_index
+from .services.snapshot_service import snapshot_loop
+from .services.tag_autocomplete import tag_autocomplete
+from .services.title_tag_index import title_tag_index
 
 # Setup logging
 setup_logging()
@@ -21,7 +32,8 @@ app = FastAPI(
     title="FinanceHub API",
     description="Personal Finance Tracking API with sync capabilities",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware for development
@@ -33,18 +45,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression (zstd/br/gzip) and compressed sync uploads
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+    zstd_level=settings.compression_zstd_level,
+    decompress_paths=("/api/v1/sync/atomic",),
+    max_request_size=settings.max_decompressed_request_size,
+)
+
 # Validation error handler
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error(f"Validation error for {request.method} {request.url.path}")
     logger.error(f"Validation errors: {json.dumps(exc.errors(), indent=2)}")
     
-    # Read body carefully to avoid consuming it
-    try:
-        body = await request.body()
-        logger.error(f"Request body: {body.decode('utf-8')[:500]}")
-    except:
-        pass
+    # The body stream was already consumed by the route; re-reading it here
+    # waits for a message that never comes. Log what validation saw instead.
+    if exc.body is not None:
+        logger.error(f"Request body: {str(exc.body)[:500]}")
     
     return JSONResponse(
         status_code=422,
@@ -99,6 +120,30 @@ async def log_requests(request: Request, call_next):
         )
         raise
 
+# SQL profiling middleware
+@app.middleware("http")
+async def profile_sql(request: Request, call_next):
+    """
+    Record every SQL statement for requests that ask for it (X-Profile-SQL: 1)
+    or are picked by the sampling rate, and attach a summary header.
+    """
+    if not sql_profiler.should_profile(request.headers):
+        return await call_next(request)
+    
+    request_id = request.headers.get(sql_profiler.REQUEST_ID_HEADER) or uuid.uuid4().hex
+    profile, token = sql_profiler.start_profile(request_id, request.method, request.url.path)
+    try:
+        response = await call_next(request)
+    finally:
+        sql_profiler.finish_profile(profile, token)
+    
+    response.headers[sql_profiler.REQUEST_ID_HEADER] = request_id
+    response.headers[sql_profiler.SUMMARY_HEADER] = profile.header_value()
+    return response
+
+compaction_task = None
+snapshot_task = None
+
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
@@ -111,11 +156,40 @@ async def startup_event():
     
     create_tables()
     logger.info("✅ Database tables created/verified")
+    
+    try:
+        ensure_expense_partitions(SessionLocal)
+    except Exception as e:
+        logger.error(f"❌ Could not create expense partitions: {e}")
+    
+    try:
+        ensure_search_index(SessionLocal)
+    except Exception as e:
+        logger.error(f"❌ Could not create search indexes: {e}")
+    
+    change_notifier.start(engine, SessionLocal)
+    tag_autocomplete.start(SessionLocal)
+    title_tag_index.start(SessionLocal)
+    
+    global compaction_task, snapshot_task
+    if settings.compaction_interval_hours > 0:
+        compaction_task = asyncio.create_task(compaction_loop(SessionLocal))
+        logger.info(f"🧹 Tombstone compaction every {settings.compaction_interval_hours}h")
+    if settings.snapshot_interval_minutes > 0:
+        snapshot_task = asyncio.create_task(snapshot_loop(SessionLocal))
+        logger.info(f"📦 Bootstrap snapshot every {settings.snapshot_interval_minutes}min")
     logger.info("🎯 API ready to accept requests")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("👋 Shutting down FinanceHub API server...")
+    change_notifier.stop()
+    tag_autocomplete.stop()
+    title_tag_index.stop()
+    if compaction_task is not None:
+        compaction_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
 
 # Health check endpoint
 @app.get("/health")
@@ -140,12 +214,33 @@ async def debug_info():
         "version": "1.0.0"
     }
 
+# SQL profile endpoints (only in debug mode)
+@app.get("/debug/profiles")
+async def list_sql_profiles():
+    if not settings.debug:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    return {"request_ids": sql_profiler.profile_store.list_ids()}
+
+@app.get("/debug/profiles/{request_id}")
+async def get_sql_profile(request_id: str):
+    if not settings.debug:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    profile = sql_profiler.profile_store.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
 # Include routers
 app.include_router(operations.router, prefix="/api/v1/operations", tags=["operations"])
 app.include_router(sync.router, prefix="/api/v1/sync", tags=["sync"])
 app.include_router(batch_sync.router, prefix="/api/v1/sync", tags=["batch-sync"])
 app.include_router(atomic_sync.router, prefix="/api/v1/sync", tags=["atomic-sync"])
+app.include_router(notifications.router, prefix="/api/v1/sync", tags=["notifications"])
+app.include_router(devices.router, prefix="/api/v1/sync", tags=["devices"])
 app.include_router(query.router, prefix="/api/v1", tags=["query"])
+app.include_router(search.router, prefix="/api/v1", tags=["search"])
 
 if __name__ == "__main__":
     import uvicorn
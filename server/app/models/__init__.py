@@ -1,15 +1,22 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-import uuid
+from sqlalchemy.sql import func, text
+from ..config import settings
 from ..database import Base
+from ..utils.uuid7 import new_id
+from .link_ids import link_id_property
+from .types import GUID
+
+if settings.compact_link_tables and settings.native_uuid_keys:
+    # Derived link ids ("<parent>:<tag>") are not UUIDs and can't live in uuid columns
+    raise RuntimeError("COMPACT_LINK_TABLES and NATIVE_UUID_KEYS cannot be combined")
 
 
 class Expense(Base):
     __tablename__ = "expenses"
     
     # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     
     # Original fields from Android app
     local_id = Column(Integer, nullable=True)  # Original Android auto-increment ID
@@ -23,10 +30,27 @@ class Expense(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Row version, bumped on every write (see services/versioned_writes.py)
     
     # Relationships
     expense_tags = relationship("ExpenseTagsCrossRef", back_populates="expense", cascade="all, delete-orphan")
     
+    # Indexes (live rows only; see migrations/008_add_query_shape_indexes.sql)
+    __table_args__ = (
+        # Monthly totals: year/month equality, amount read from the index
+        Index('idx_expenses_year_month_live', 'year', 'month',
+              postgresql_include=['amount'],
+              postgresql_where=text('deleted_at IS NULL'), sqlite_where=text('deleted_at IS NULL')),
+        # Delta sync: updated_at > since
+        Index('idx_expenses_updated_live', 'updated_at',
+              postgresql_where=text('deleted_at IS NULL'), sqlite_where=text('deleted_at IS NULL')),
+        # Expense listing: ORDER BY created_at DESC
+        Index('idx_expenses_created_live', 'created_at',
+              postgresql_where=text('deleted_at IS NULL'), sqlite_where=text('deleted_at IS NULL')),
+    )
+    
+    __mapper_args__ = {"version_id_col": version}
+    
     def __repr__(self):
         return f"<Expense(id={self.id}, title={self.title}, amount={self.amount})>"
 
@@ -35,7 +59,7 @@ class Tag(Base):
     __tablename__ = "tags"
     
     # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     
     # Original fields from Android app
     local_id = Column(Integer, nullable=True)
@@ -51,13 +75,20 @@ class Tag(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     expense_tags = relationship("ExpenseTagsCrossRef", back_populates="tag", cascade="all, delete-orphan")
     targets = relationship("Target", back_populates="tag", cascade="all, delete-orphan")
     
     # Indexes
-    __table_args__ = (Index('idx_tag_name', 'tag'),)
+    __table_args__ = (
+        Index('idx_tag_name', 'tag'),
+        Index('idx_tags_updated_live', 'updated_at',
+              postgresql_where=text('deleted_at IS NULL'), sqlite_where=text('deleted_at IS NULL')),
+    )
+    
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self):
         return f"<Tag(id={self.id}, tag={self.tag})>"
@@ -66,12 +97,19 @@ class Tag(Base):
 class ExpenseTagsCrossRef(Base):
     __tablename__ = "expense_tags"
     
-    # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    
-    # Foreign keys
-    expense_id = Column(String, ForeignKey("expenses.id"), nullable=False)
-    tag_id = Column(String, ForeignKey("tags.id"), nullable=False)
+    if settings.compact_link_tables:
+        # Compact layout: the pair is the primary key, `id` is derived (see link_ids.py)
+        expense_id = Column(GUID, ForeignKey("expenses.id"), primary_key=True)
+        tag_id = Column(GUID, ForeignKey("tags.id"), primary_key=True)
+        legacy_id = Column(String, nullable=True)  # id of links created before the migration
+        id = link_id_property("expense_id")
+    else:
+        # Primary key - server uses UUID
+        id = Column(GUID, primary_key=True, default=new_id)
+        
+        # Foreign keys
+        expense_id = Column(GUID, ForeignKey("expenses.id"), nullable=False)
+        tag_id = Column(GUID, ForeignKey("tags.id"), nullable=False)
     
     # Server-side metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -81,8 +119,17 @@ class ExpenseTagsCrossRef(Base):
     expense = relationship("Expense", back_populates="expense_tags")
     tag = relationship("Tag", back_populates="expense_tags")
     
-    # Unique constraint to prevent duplicates
-    __table_args__ = (Index('idx_expense_tag_unique', 'expense_id', 'tag_id', unique=True),)
+    __table_args__ = (
+        # Tag-side joins (filter by tag, recommendations): the pair index leads with expense_id
+        Index('idx_expense_tags_tag_expense', 'tag_id', 'expense_id'),
+        Index('idx_expense_tags_updated', 'updated_at'),
+    ) + ((
+        Index('idx_expense_tags_legacy', 'legacy_id', unique=True,
+              postgresql_where=text('legacy_id IS NOT NULL'), sqlite_where=text('legacy_id IS NOT NULL')),
+    ) if settings.compact_link_tables else (
+        # Unique constraint to prevent duplicates
+        Index('idx_expense_tag_unique', 'expense_id', 'tag_id', unique=True),
+    ))
     
     def __repr__(self):
         return f"<ExpenseTagsCrossRef(id={self.id}, expense_id={self.expense_id}, tag_id={self.tag_id})>"
@@ -92,12 +139,12 @@ class Target(Base):
     __tablename__ = "targets"
     
     # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     
     # Original composite key fields (now just regular columns)
     month = Column(Integer, nullable=False)
     year = Column(Integer, nullable=False)
-    tag_id = Column(String, ForeignKey("tags.id"), nullable=False)
+    tag_id = Column(GUID, ForeignKey("tags.id"), nullable=False)
     
     # Original fields
     amount = Column(Integer, nullable=False)
@@ -107,6 +154,7 @@ class Target(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     tag = relationship("Tag", back_populates="targets")
@@ -114,9 +162,12 @@ class Target(Base):
     # Indexes and unique constraint
     __table_args__ = (
         Index('idx_target_tag', 'tag_id'),
-        Index('idx_target_unique', 'month', 'year', 'tag_id', unique=True)
+        Index('idx_target_unique', 'month', 'year', 'tag_id', unique=True),
+        Index('idx_targets_updated', 'updated_at'),
     )
     
+    __mapper_args__ = {"version_id_col": version}
+    
     def __repr__(self):
         return f"<Target(id={self.id}, month={self.month}, year={self.year}, tag_id={self.tag_id}, amount={self.amount})>"
 
@@ -125,23 +176,26 @@ class GraphEdge(Base):
     __tablename__ = "graph_edges"
     
     # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     
     # Foreign keys
-    from_tag_id = Column(String, ForeignKey("tags.id"), nullable=False)
-    to_tag_id = Column(String, ForeignKey("tags.id"), nullable=False)
+    from_tag_id = Column(GUID, ForeignKey("tags.id"), nullable=False)
+    to_tag_id = Column(GUID, ForeignKey("tags.id"), nullable=False)
     weight = Column(Integer, nullable=False)
     
     # Server-side metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Indexes and unique constraint
     __table_args__ = (
         Index('idx_graph_from_tag', 'from_tag_id'),
-        Index('idx_graph_unique', 'from_tag_id', 'to_tag_id', unique=True)
+        Index('idx_graph_unique', 'from_tag_id', 'to_tag_id', unique=True),
+        Index('idx_graph_edges_updated', 'updated_at'),
     )
     
+    __mapper_args__ = {"version_id_col": version}
     
     def __repr__(self):
         return f"<GraphEdge(id={self.id}, from_tag_id={self.from_tag_id}, to_tag_id={self.to_tag_id}, weight={self.weight})>"
@@ -151,7 +205,7 @@ class WishlistItem(Base):
     __tablename__ = "wishlist"
     
     # Primary key - server uses UUID
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=new_id)
     
     # Original fields
     name = Column(String, nullable=False)
@@ -163,10 +217,15 @@ class WishlistItem(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     wishlist_tags = relationship("WishlistTagsCrossRef", back_populates="wishlist")
     
+    __table_args__ = (Index('idx_wishlist_updated', 'updated_at'),)
+    
+    __mapper_args__ = {"version_id_col": version}
+    
     def __repr__(self):
         return f"<WishlistItem(id={self.id}, name={self.name}, min_price={self.min_price}, max_price={self.max_price})>"
 
@@ -192,10 +251,17 @@ class WishlistTagsCrossRef(Base):
     # `models.ExpenseTagsCrossRef` usually has a primary key.
     # Let's assume a surrogate `id` field is best for syncable entities.
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    
-    wishlist_id = Column(String, ForeignKey("wishlist.id"), nullable=False)
-    tag_id = Column(String, ForeignKey("tags.id"), nullable=False)
+    if settings.compact_link_tables:
+        # Compact layout, as for ExpenseTagsCrossRef
+        wishlist_id = Column(GUID, ForeignKey("wishlist.id"), primary_key=True)
+        tag_id = Column(GUID, ForeignKey("tags.id"), primary_key=True)
+        legacy_id = Column(String, nullable=True)
+        id = link_id_property("wishlist_id")
+    else:
+        id = Column(GUID, primary_key=True, default=new_id)
+        
+        wishlist_id = Column(GUID, ForeignKey("wishlist.id"), nullable=False)
+        tag_id = Column(GUID, ForeignKey("tags.id"), nullable=False)
     
     # Server-side metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -206,10 +272,16 @@ class WishlistTagsCrossRef(Base):
     wishlist = relationship("WishlistItem", back_populates="wishlist_tags")
     tag = relationship("Tag")
 
-    # Unique constraint
     __table_args__ = (
+        Index('idx_wishlist_tags_tag', 'tag_id', 'wishlist_id'),
+        Index('idx_wishlist_tags_updated', 'updated_at'),
+    ) + ((
+        Index('idx_wishlist_tags_legacy', 'legacy_id', unique=True,
+              postgresql_where=text('legacy_id IS NOT NULL'), sqlite_where=text('legacy_id IS NOT NULL')),
+    ) if settings.compact_link_tables else (
+        # Unique constraint
         Index('idx_wishlist_tag_unique', 'wishlist_id', 'tag_id', unique=True),
-    )
+    ))
 
     def __repr__(self):
         return f"<WishlistTagsCrossRef(id={self.id}, wishlist_id={self.wishlist_id}, tag_id={self.tag_id})>"
@@ -228,7 +300,7 @@ class EntityMapping(Base):
     client_id = Column(String, primary_key=True)
     
     # The server-assigned UUID
-    server_id = Column(String, nullable=False)
+    server_id = Column(GUID, nullable=False)
     
     # Track when mapping was created
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -241,3 +313,111 @@ class EntityMapping(Base):
     
     def __repr__(self):
         return f"<EntityMapping(entity_type={self.entity_type}, client_id={self.client_id}, server_id={self.server_id})>"
+
+
+class IdempotencyRecord(Base):
+    """
+    Stored /sync/atomic response for a request-level idempotency key.
+    An exact retry is answered from here without replaying its operations.
+    """
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)  # Idempotency-Key header or "device_id:client_timestamp"
+    request_hash = Column(String(64), nullable=False)  # Fingerprint of the request body
+    response = Column(Text, nullable=False)  # AtomicSyncResponse as JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_idempotency_keys_expires', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f"<IdempotencyRecord(key={self.key}, expires_at={self.expires_at})>"
+
+
+class DeviceSyncState(Base):
+    """
+    Per-device sync watermark: the server timestamp (epoch ms) up to which the
+    device has acknowledged pulled changes, and when it was last seen.
+    """
+    __tablename__ = "device_sync_state"
+    
+    device_id = Column(String(255), primary_key=True)
+    acknowledged_until = Column(BigInteger, nullable=False, default=0)  # Epoch ms, only moves forward
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_device_sync_state_last_seen', 'last_seen_at'),
+    )
+    
+    def __repr__(self):
+        return f"<DeviceSyncState(device_id={self.device_id}, acknowledged_until={self.acknowledged_until})>"
+
+
+class ArchivedExpense(Base):
+    """
+    Append-only cold storage for old expenses (see services/archive_service.py).
+    Same columns as Expense; rows move back to `expenses` if they are edited.
+    """
+    __tablename__ = "expenses_archive"
+    
+    id = Column(GUID, primary_key=True)
+    local_id = Column(Integer, nullable=True)
+    title = Column(String, nullable=False)
+    amount = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    date = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('idx_expenses_archive_created', 'created_at'),
+        # /sync/updated-data: updated_at > since
+        Index('idx_expenses_archive_updated', 'updated_at'),
+    )
+    
+    def __repr__(self):
+        return f"<ArchivedExpense(id={self.id}, title={self.title}, amount={self.amount})>"
+
+
+class ArchivedExpenseTag(Base):
+    """Expense-tag links of archived expenses."""
+    __tablename__ = "expense_tags_archive"
+    
+    id = Column(GUID, primary_key=True)
+    expense_id = Column(GUID, nullable=False)
+    tag_id = Column(GUID, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        Index('idx_expense_tags_archive_expense', 'expense_id'),
+        Index('idx_expense_tags_archive_tag', 'tag_id'),
+        Index('idx_expense_tags_archive_updated', 'updated_at'),
+    )
+    
+    def __repr__(self):
+        return f"<ArchivedExpenseTag(id={self.id}, expense_id={self.expense_id}, tag_id={self.tag_id})>"
+
+
+class ExpenseMonthlyRollup(Base):
+    """
+    Totals of archived expenses per month, overall (tag_id "") and per tag,
+    so dashboards never have to scan the archive.
+    """
+    __tablename__ = "expense_monthly_rollups"
+    
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    tag_id = Column(String, primary_key=True, default="")  # "" = all expenses of the month
+    total_amount = Column(BigInteger, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<ExpenseMonthlyRollup(year={self.year}, month={self.month}, tag_id={self.tag_id}, total={self.total_amount})>"
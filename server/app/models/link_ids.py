@@ -0,0 +1,88 @@
+"""
+Ids of cross-reference rows in the compact link layout (COMPACT_LINK_TABLES).
+
+Compact link tables have no surrogate id: the primary key is the pair
+(parent id, tag id). The sync API still identifies a link by one string, so
+`id` becomes a hybrid attribute:
+
+* links created after the migration are "<parent id>:<tag id>", derived from
+  the key itself and never stored;
+* links that existed before keep their old UUID in `legacy_id`, covered by a
+  partial unique index, so clients holding those ids still find them.
+
+Comparing `Model.id` with a value turns into a primary-key lookup (or a
+legacy_id lookup), so filters written against the old layout stay indexed.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import String, and_, cast, false, func, or_, tuple_
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
+
+SEPARATOR = ":"
+
+
+def derive_link_id(parent_id: str, tag_id: str) -> str:
+    return f"{parent_id}{SEPARATOR}{tag_id}"
+
+
+def parse_link_id(value: str) -> Optional[Tuple[str, str]]:
+    """(parent id, tag id) of a derived id; None for a legacy UUID."""
+    parent_id, separator, tag_id = str(value).partition(SEPARATOR)
+    if not separator or not parent_id or not tag_id:
+        return None
+    return parent_id, tag_id
+
+
+class _LinkIdComparator(Comparator):
+    def __init__(self, cls, parent_attr: str):
+        self.parent = getattr(cls, parent_attr)
+        self.tag = cls.tag_id
+        self.legacy = cls.legacy_id
+        super().__init__(func.coalesce(
+            self.legacy, cast(self.parent, String) + SEPARATOR + cast(self.tag, String)
+        ))
+
+    def __eq__(self, other):
+        if not isinstance(other, str):
+            return self.expression == other
+        pair = parse_link_id(other)
+        if pair is None:
+            return self.legacy == other
+        return and_(self.parent == pair[0], self.tag == pair[1])
+
+    def in_(self, values: Iterable[str]):
+        values = list(values)
+        pairs: List[Tuple[str, str]] = []
+        legacy: List[str] = []
+        for value in values:
+            pair = parse_link_id(value)
+            if pair is None:
+                legacy.append(value)
+            else:
+                pairs.append(pair)
+        clauses = []
+        if pairs:
+            clauses.append(tuple_(self.parent, self.tag).in_(pairs))
+        if legacy:
+            clauses.append(self.legacy.in_(legacy))
+        return or_(*clauses) if clauses else false()
+
+
+def link_id_property(parent_attr: str) -> hybrid_property:
+    """`id` for a compact link model whose parent key column is `parent_attr`."""
+
+    def fget(self):
+        if self.legacy_id is not None:
+            return self.legacy_id
+        parent_id = getattr(self, parent_attr)
+        if parent_id is None or self.tag_id is None:
+            return None
+        return derive_link_id(parent_id, self.tag_id)
+
+    def fset(self, value):
+        # Derived ids follow from the key; anything else is an id from the old layout
+        if value is not None and parse_link_id(value) is None:
+            self.legacy_id = value
+
+    prop = hybrid_property(fget, fset)
+    return prop.comparator(lambda cls: _LinkIdComparator(cls, parent_attr))
@@ -150,4 +150,31 @@ class RecommendationResponse(BaseModel):
     
     
 class RecommendationRequest(BaseModel):
-    tag_id: str
\ No newline at end of file
+    tag_id: str
+
+
+class TitleRecommendationRequest(BaseModel):
+    title: str = Field(..., min_length=1, max_length=255)
+    limit: int = Field(default=5, ge=1, le=20)
+
+# Search models
+class TagSearchResult(BaseModel):
+    id: str
+    name: str
+    score: float
+
+
+class ExpenseSearchResult(BaseModel):
+    id: str
+    title: str
+    amount: int
+    year: int
+    month: int
+    date: int
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    tags: List[TagSearchResult] = []
+    expenses: List[ExpenseSearchResult] = []
@@ -0,0 +1,46 @@
+"""
+Column types shared by the models.
+"""
+import uuid
+
+from sqlalchemy import String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.types import TypeDecorator
+
+from ..config import settings
+
+_NIL = "00000000-0000-0000-0000-000000000000"
+
+
+class GUID(TypeDecorator):
+    """
+    Entity id, handled as a string in Python.
+
+    Stored as text unless NATIVE_UUID_KEYS is enabled on PostgreSQL (after
+    migrations/optional/002_native_uuid_keys.sql), where it is a 16-byte
+    UUID column.
+    """
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql" and settings.native_uuid_keys:
+            return dialect.type_descriptor(UUID(as_uuid=False))
+        return dialect.type_descriptor(String())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != "postgresql" or not settings.native_uuid_keys:
+            return value
+        # A client-supplied id that is not a UUID (stale or foreign data) matches
+        # nothing, instead of failing the whole statement with a cast error
+        try:
+            return str(uuid.UUID(str(value)))
+        except ValueError:
+            return _NIL
+
+    def _sentinel_value_resolver(self, dialect):
+        # Batched ORM inserts match RETURNING rows to their parameters by primary
+        # key, and psycopg2 returns uuid columns as uuid.UUID, not str
+        if dialect.name == "postgresql" and settings.native_uuid_keys:
+            return uuid.UUID
+        return None
@@ -2,25 +2,34 @@
 Atomic Sync Routes
 Single unified endpoint for atomic batch synchronization.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 import time
 import logging
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from ..schemas_atomic import (
     AtomicSyncRequest,
     AtomicSyncResponse
 )
 from ..services.atomic_sync_service import AtomicSyncService
+from ..services.device_sync_service import DeviceSyncService
+from ..services.idempotency_service import (
+    IdempotencyConflict, IdempotencyService,
+    idempotency_key, request_fingerprint
+)
+from ..wire_format import (
+    ATOMIC_REQUEST_OPENAPI, MsgPackResponse,
+    accepts_msgpack, negotiated_response, read_atomic_request
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-@router.post("/atomic", response_model=AtomicSyncResponse)
+@router.post("/atomic", response_model=AtomicSyncResponse, openapi_extra=ATOMIC_REQUEST_OPENAPI)
 async def atomic_sync(
-    request: AtomicSyncRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -30,10 +39,31 @@ async def atomic_sync(
     - All operations in a group succeed together
     - Or all operations in a group fail and rollback together
     - Groups are independent of each other
+    
+    Accepts JSON or MessagePack (Content-Type: application/msgpack) and
+    answers in MessagePack when requested via Accept.
+    
+    Retries with the same Idempotency-Key header (or device ID + client
+    timestamp) get the stored response of the first fully successful
+    request, marked with Idempotent-Replayed: true.
     """
+    request: AtomicSyncRequest = await read_atomic_request(http_request)
     logger.info("[ATOMIC_SYNC] ===== VALIDATION PASSED - ENTERED ROUTE HANDLER =====")
     start_time = time.time()
     
+    idempotency = IdempotencyService(db)
+    key, explicit_key = idempotency_key(http_request, request)
+    request_hash = request_fingerprint(request) if key else None
+    if key:
+        try:
+            stored = idempotency.lookup(key, request_hash, explicit_key)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if stored is not None:
+            replay = negotiated_response(http_request, stored)
+            replay.headers["Idempotent-Replayed"] = "true"
+            return replay
+    
     try:
         # Log request summary
         total_operations = sum(len(group.operations) for group in request.groups)
@@ -57,7 +87,7 @@ async def atomic_sync(
                 f"  Types: {operation_types}"
             )
         
-        service = AtomicSyncService(db)
+        service = AtomicSyncService(db, session_factory=SessionLocal)
         
         logger.info("[DB] Starting group processing...")
         # Process all groups
@@ -71,10 +101,25 @@ async def atomic_sync(
         logger.info(f"[DB PRE-OUTER-COMMIT] Session in transaction: {db.in_transaction()}")
         logger.info(f"[DB PRE-OUTER-COMMIT] Session is active: {db.is_active}")
         
+        if request.device_id:
+            DeviceSyncService(db).record(request.device_id)
+        
+        response = AtomicSyncResponse(
+            group_results=group_results,
+            server_timestamp=int(time.time() * 1000)
+        )
+        # Only fully successful requests are replayable; failed groups get retried
+        cacheable = key is not None and all(r.success for r in group_results)
+        if cacheable:
+            response_body = response.model_dump(mode="json", by_alias=True)
+            idempotency.store(key, request_hash, response_body)
+        
         # Commit outer transaction (all savepoints already committed/rolled back)
         logger.info("[OUTER COMMIT] Calling db.commit() on outer transaction...")
         db.commit()
         logger.info("[OUTER COMMIT] ✓✓✓ OUTER TRANSACTION COMMITTED ✓✓✓")
+        if cacheable:
+            idempotency.remember(key, request_hash, response_body)
         
         logger.info(f"[DB POST-OUTER-COMMIT] Session state - dirty: {len(db.dirty)}, new: {len(db.new)}, deleted: {len(db.deleted)}")
         logger.info(f"[DB POST-OUTER-COMMIT] Session in transaction: {db.in_transaction()}")
@@ -143,10 +188,9 @@ async def atomic_sync(
             f"Duration: {elapsed_ms:.2f}ms"
         )
         
-        return AtomicSyncResponse(
-            group_results=group_results,
-            server_timestamp=int(time.time() * 1000)
-        )
+        if accepts_msgpack(http_request):
+            return MsgPackResponse(response.model_dump(by_alias=True))
+        return response
         
     except Exception as e:
         elapsed_ms = (time.time() - start_time) * 1000
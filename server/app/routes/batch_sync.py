@@ -1,19 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import time
 from datetime import datetime
 
-from ..database import get_db
-from ..models import Expense, Tag, Target, ExpenseTagsCrossRef, GraphEdge, WishlistItem, WishlistTagsCrossRef
+from ..database import begin_read_snapshot, get_db
+from ..models import (
+    Expense, Tag, Target, ExpenseTagsCrossRef, GraphEdge, WishlistItem, WishlistTagsCrossRef,
+    ArchivedExpense, ArchivedExpenseTag
+)
 from ..schemas import (
     BatchSyncExpensesRequest, BatchSyncTagsRequest, BatchSyncTargetsRequest,
     BatchSyncExpenseTagsRequest, BatchSyncGraphEdgesRequest, BatchSyncWishlistRequest,
     BatchSyncResponse, SyncResultType,
     CreateExpenseBatchRequest, UpdateExpenseBatchRequest, DeleteExpenseBatchRequest,
-    ApiExpense, ApiTag, ApiTarget, ApiExpenseTag, ApiGraphEdge, ApiWishlistItem,
-    UpdatedDataResponse, BatchSyncWishlistTagsRequest, ApiWishlistTag
+    UpdatedDataResponse, BatchSyncWishlistTagsRequest
+)
+from ..sync_payloads import (
+    EXPENSE_SPEC, TAG_SPEC, TARGET_SPEC, EXPENSE_TAG_SPEC,
+    GRAPH_EDGE_SPEC, WISHLIST_SPEC, WISHLIST_TAG_SPEC, SYNC_ENTITY_SPECS,
+    ARCHIVED_EXPENSE_SPEC, ARCHIVED_EXPENSE_TAG_SPEC,
+    json_document, select_many, serialize_many, sql_json_enabled
 )
+from ..wire_format import accepts_msgpack, negotiated_response
+from ..change_tracking import etag_for, etag_headers, not_modified
+from ..services.device_sync_service import DeviceSyncService, now_ms
+from ..services.versioned_writes import delete_versioned, update_versioned
+
+# Tables read by /updated-data (ETag scope)
+UPDATED_DATA_TABLES = [spec.model.__tablename__ for spec in SYNC_ENTITY_SPECS] + [
+    ArchivedExpense.__tablename__, ArchivedExpenseTag.__tablename__
+]
 
 router = APIRouter()
 
@@ -53,19 +71,20 @@ async def batch_sync_expenses(
                     
                 elif operation.type == "update_expense":
                     # Update existing expense
-                    expense = db.query(Expense).filter(Expense.id == operation.server_id).first()
-                    if expense:
-                        expense.title = operation.title
-                        expense.amount = operation.amount
-                        expense.year = operation.year
-                        expense.month = operation.month
-                        expense.date = operation.date
-                        expense.updated_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, Expense, operation.server_id, {
+                        "title": operation.title,
+                        "amount": operation.amount,
+                        "year": operation.year,
+                        "month": operation.month,
+                        "date": operation.date,
+                        "updated_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -77,14 +96,15 @@ async def batch_sync_expenses(
                         
                 elif operation.type == "delete_expense":
                     # Soft delete expense
-                    expense = db.query(Expense).filter(Expense.id == operation.server_id).first()
-                    if expense:
-                        expense.deleted_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, Expense, operation.server_id, {
+                        "deleted_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -112,156 +132,90 @@ async def batch_sync_expenses(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _updated_data_parts(since_datetime: datetime):
+    """
+    (spec, filters) of each entity list in /updated-data, in response order.
+    Archived expenses and links are read into the same lists.
+    """
+    return [
+        (EXPENSE_SPEC, (Expense.deleted_at.is_(None), Expense.updated_at > since_datetime)),
+        (ARCHIVED_EXPENSE_SPEC, (ArchivedExpense.updated_at > since_datetime,)),
+        (TAG_SPEC, (Tag.deleted_at.is_(None), Tag.updated_at > since_datetime)),
+        (TARGET_SPEC, (Target.updated_at > since_datetime,)),
+        (EXPENSE_TAG_SPEC, (ExpenseTagsCrossRef.updated_at > since_datetime,)),
+        (ARCHIVED_EXPENSE_TAG_SPEC, (ArchivedExpenseTag.updated_at > since_datetime,)),
+        (GRAPH_EDGE_SPEC, (GraphEdge.updated_at > since_datetime,)),
+        (WISHLIST_SPEC, (WishlistItem.updated_at > since_datetime,)),
+        (WISHLIST_TAG_SPEC, (WishlistTagsCrossRef.updated_at > since_datetime,)),
+    ]
+
+
 @router.get("/updated-data", response_model=UpdatedDataResponse)
 async def get_updated_data(
-    since: int,
+    request: Request,
+    since: Optional[int] = Query(None, description="Server timestamp (ms) of the last applied pull"),
+    device_id: Optional[str] = Query(None, description="Resume from this device's stored watermark"),
     db: Session = Depends(get_db)
 ):
     """
     Get all data updated since the given timestamp
     Returns data in ApiExpense, ApiTag, etc. format
+    (MessagePack with Accept: application/msgpack)
+    Supports If-None-Match (304 when nothing changed)
+    
+    With `device_id`, `since` is recorded as the device's acknowledged
+    watermark, or taken from it when omitted. X-Sync-Watermark carries the
+    value to send as `since` (or to /sync/ack) next time. Without either,
+    the request fails validation (422) as before device_id existed.
     """
+    if since is None and device_id is None:
+        # Same 422 as when `since` was a required parameter
+        raise RequestValidationError([{
+            "type": "missing",
+            "loc": ("query", "since"),
+            "msg": "Field required (or pass device_id)",
+            "input": None,
+        }])
+    
+    if device_id is not None:
+        try:
+            devices = DeviceSyncService(db)
+            if since is None:
+                since = devices.get_watermark(device_id)
+            else:
+                devices.record(device_id, min(since, now_ms()))
+            if db.new or db.dirty:
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    # Versions are read before querying: a write racing the queries only
+    # makes the next poll miss, never serves stale data as current
+    etag = etag_for(UPDATED_DATA_TABLES, request, since)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
     try:
+        watermark = now_ms()
+        
         # Convert timestamp (milliseconds) to datetime
         since_datetime = datetime.fromtimestamp(since / 1000.0)
+        parts = _updated_data_parts(since_datetime)
         
-        # Query expenses
-        expenses = db.query(Expense).filter(
-            Expense.deleted_at.is_(None),
-            Expense.updated_at > since_datetime
-        ).all()
-        
-        expense_responses = [
-            ApiExpense(
-                id=str(exp.id),
-                title=exp.title,
-                amount=exp.amount,
-                year=exp.year,
-                month=exp.month,
-                date=exp.date,
-                created_at=int(exp.created_at.timestamp() * 1000) if exp.created_at else 0,
-                updated_at=int(exp.updated_at.timestamp() * 1000) if exp.updated_at else 0
-            )
-            for exp in expenses
-        ]
-        
-        # Query tags
-        tags = db.query(Tag).filter(
-            Tag.deleted_at.is_(None),
-            Tag.updated_at > since_datetime
-        ).all()
-        
-        tag_responses = [
-            ApiTag(
-                id=str(tag.id),
-                name=tag.tag,
-                monthly_amount=tag.monthly_amount,
-                current_month=tag.current_month,
-                current_year=tag.current_year,
-                created_day=tag.created_day,
-                created_month=tag.created_month,
-                created_year=tag.created_year,
-                created_at=int(tag.created_at.timestamp() * 1000) if tag.created_at else 0,
-                updated_at=int(tag.updated_at.timestamp() * 1000) if tag.updated_at else 0
-            )
-            for tag in tags
-        ]
-        
-        # Query targets
-        targets = db.query(Target).filter(
-            Target.updated_at > since_datetime
-        ).all()
-        
-        target_responses = [
-            ApiTarget(
-                id=str(target.id),
-                month=target.month,
-                year=target.year,
-                tag_id=str(target.tag_id),
-                amount=target.amount,
-                spent=target.spent,
-                created_at=int(target.created_at.timestamp() * 1000) if target.created_at else 0,
-                updated_at=int(target.updated_at.timestamp() * 1000) if target.updated_at else 0
-            )
-            for target in targets
-        ]
-        
-        # Query expense tags
-        expense_tags = db.query(ExpenseTagsCrossRef).filter(
-            ExpenseTagsCrossRef.updated_at > since_datetime
-        ).all()
-        
-        expense_tag_responses = [
-            ApiExpenseTag(
-                id=str(et.id),
-                expense_id=str(et.expense_id),
-                tag_id=str(et.tag_id),
-                created_at=int(et.created_at.timestamp() * 1000) if et.created_at else 0,
-                updated_at=int(et.updated_at.timestamp() * 1000) if et.updated_at else 0
-            )
-            for et in expense_tags
-        ]
-        
-        # Query graph edges
-        graph_edges = db.query(GraphEdge).filter(
-            GraphEdge.updated_at > since_datetime
-        ).all()
-        
-        graph_edge_responses = [
-            ApiGraphEdge(
-                id=str(edge.id),
-                from_tag_id=str(edge.from_tag_id),
-                to_tag_id=str(edge.to_tag_id),
-                weight=edge.weight,
-                created_at=int(edge.created_at.timestamp() * 1000) if edge.created_at else 0,
-                updated_at=int(edge.updated_at.timestamp() * 1000) if edge.updated_at else 0
-            )
-            for edge in graph_edges
-        ]
-        
-        # Query wishlist
-        wishlist_items = db.query(WishlistItem).filter(
-            WishlistItem.updated_at > since_datetime
-        ).all()
-        
-        wishlist_responses = [
-            ApiWishlistItem(
-                id=str(item.id),
-                name=item.name,
-                minPrice=item.min_price,
-                maxPrice=item.max_price,
-                # tagId removed
-                createdAt=int(item.created_at.timestamp() * 1000) if item.created_at else 0,
-                updatedAt=int(item.updated_at.timestamp() * 1000) if item.updated_at else 0
-            )
-            for item in wishlist_items
-        ]
-
-        # Query wishlist tags
-        wishlist_tags = db.query(WishlistTagsCrossRef).filter(
-            WishlistTagsCrossRef.updated_at > since_datetime
-        ).all()
-
-        wishlist_tag_responses = [
-            ApiWishlistTag(
-                id=str(wt.id),
-                wishlistId=str(wt.wishlist_id),
-                tagId=str(wt.tag_id),
-                createdAt=int(wt.created_at.timestamp() * 1000) if wt.created_at else 0,
-                updatedAt=int(wt.updated_at.timestamp() * 1000) if wt.updated_at else 0
-            )
-            for wt in wishlist_tags
-        ]
-        
-        return UpdatedDataResponse(
-            expenses=expense_responses,
-            tags=tag_responses,
-            targets=target_responses,
-            expense_tags=expense_tag_responses,
-            graph_edges=graph_edge_responses,
-            wishlist=wishlist_responses,
-            wishlist_tags=wishlist_tag_responses
-        )
+        # Every entity list is read in one statement, inside one snapshot
+        begin_read_snapshot(db)
+        if sql_json_enabled(db) and not accepts_msgpack(request):
+            # PostgreSQL assembles the JSON; no per-row work in Python
+            response = Response(json_document(db, parts), media_type="application/json")
+        else:
+            # Server-built payload: serialize straight to dicts and skip
+            # response_model re-validation by returning the response directly
+            response = negotiated_response(request, serialize_many(parts, select_many(db, parts)))
+        response.headers.update(etag_headers(etag))
+        response.headers["X-Sync-Watermark"] = str(watermark)
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -302,18 +256,19 @@ async def batch_sync_tags(
                     ))
                     
                 elif operation.type == "update_tag":
-                    tag = db.query(Tag).filter(Tag.id == operation.server_id).first()
-                    if tag:
-                        tag.tag = operation.name
-                        tag.monthly_amount = operation.monthly_amount
-                        tag.current_month = operation.current_month
-                        tag.current_year = operation.current_year
-                        tag.updated_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, Tag, operation.server_id, {
+                        "tag": operation.name,
+                        "monthly_amount": operation.monthly_amount,
+                        "current_month": operation.current_month,
+                        "current_year": operation.current_year,
+                        "updated_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -324,14 +279,15 @@ async def batch_sync_tags(
                         ))
                         
                 elif operation.type == "delete_tag":
-                    tag = db.query(Tag).filter(Tag.id == operation.server_id).first()
-                    if tag:
-                        tag.deleted_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, Tag, operation.server_id, {
+                        "deleted_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -390,16 +346,17 @@ async def batch_sync_targets(
                     ))
                     
                 elif operation.type == "update_target":
-                    target = db.query(Target).filter(Target.id == operation.server_id).first()
-                    if target:
-                        target.amount = operation.amount
-                        target.spent = operation.spent
-                        target.updated_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, Target, operation.server_id, {
+                        "amount": operation.amount,
+                        "spent": operation.spent,
+                        "updated_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -410,10 +367,7 @@ async def batch_sync_targets(
                         ))
                         
                 elif operation.type == "delete_target":
-                    target = db.query(Target).filter(Target.id == operation.server_id).first()
-                    if target:
-                        db.delete(target)
-                        
+                    if delete_versioned(db, Target, operation.server_id, operation.expected_version):
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
@@ -473,12 +427,7 @@ async def batch_sync_expense_tags(
                     ))
                     
                 elif operation.type == "delete_expense_tag":
-                    expense_tag = db.query(ExpenseTagsCrossRef).filter(
-                        ExpenseTagsCrossRef.id == operation.server_id
-                    ).first()
-                    if expense_tag:
-                        db.delete(expense_tag)
-                        
+                    if delete_versioned(db, ExpenseTagsCrossRef, operation.server_id):
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
@@ -539,15 +488,16 @@ async def batch_sync_graph_edges(
                     ))
                     
                 elif operation.type == "update_graph_edge":
-                    edge = db.query(GraphEdge).filter(GraphEdge.id == operation.server_id).first()
-                    if edge:
-                        edge.weight = operation.weight
-                        edge.updated_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, GraphEdge, operation.server_id, {
+                        "weight": operation.weight,
+                        "updated_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -558,10 +508,7 @@ async def batch_sync_graph_edges(
                         ))
                         
                 elif operation.type == "delete_graph_edge":
-                    edge = db.query(GraphEdge).filter(GraphEdge.id == operation.server_id).first()
-                    if edge:
-                        db.delete(edge)
-                        
+                    if delete_versioned(db, GraphEdge, operation.server_id, operation.expected_version):
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
@@ -623,18 +570,18 @@ async def batch_sync_wishlist(
                     ))
                     
                 elif operation.type == "update_wishlist":
-                    item = db.query(WishlistItem).filter(WishlistItem.id == operation.server_id).first()
-                    if item:
-                        item.name = operation.name
-                        item.min_price = operation.min_price
-                        item.max_price = operation.max_price
-                        # tag_id removed
-                        item.updated_at = datetime.utcnow()
-                        
+                    version = update_versioned(db, WishlistItem, operation.server_id, {
+                        "name": operation.name,
+                        "min_price": operation.min_price,
+                        "max_price": operation.max_price,
+                        "updated_at": datetime.utcnow(),
+                    }, operation.expected_version)
+                    if version is not None:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
-                            server_id=operation.server_id
+                            server_id=operation.server_id,
+                            version=version
                         ))
                     else:
                         results.append(SyncResultType(
@@ -645,10 +592,7 @@ async def batch_sync_wishlist(
                         ))
                         
                 elif operation.type == "delete_wishlist":
-                    item = db.query(WishlistItem).filter(WishlistItem.id == operation.server_id).first()
-                    if item:
-                        db.delete(item)
-                        
+                    if delete_versioned(db, WishlistItem, operation.server_id, operation.expected_version):
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
@@ -724,17 +668,16 @@ async def batch_sync_wishlist_tags(
                     ))
                     
                 elif operation.type == "delete_wishlist_tag":
-                    rel = None
+                    deleted = False
                     if operation.server_id:
-                        rel = db.query(WishlistTagsCrossRef).filter(WishlistTagsCrossRef.id == operation.server_id).first()
+                        deleted = delete_versioned(db, WishlistTagsCrossRef, operation.server_id)
                     elif operation.wishlist_id and operation.tag_id:
-                        rel = db.query(WishlistTagsCrossRef).filter(
+                        deleted = db.query(WishlistTagsCrossRef).filter(
                             WishlistTagsCrossRef.wishlist_id == operation.wishlist_id,
                             WishlistTagsCrossRef.tag_id == operation.tag_id
-                        ).first()
+                        ).delete(synchronize_session="fetch") > 0
 
-                    if rel:
-                        db.delete(rel)
+                    if deleted:
                         results.append(SyncResultType(
                             success=True,
                             client_id=None,
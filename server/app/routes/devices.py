@@ -0,0 +1,54 @@
+"""
+Device Sync State Routes
+Watermark acknowledgements and a per-device lag report.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+import logging
+
+from ..database import get_db
+from ..schemas import SyncAckRequest, DeviceSyncStateResponse
+from ..services.device_sync_service import DeviceSyncService, now_ms
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/ack", response_model=DeviceSyncStateResponse)
+async def acknowledge_sync(ack: SyncAckRequest, db: Session = Depends(get_db)):
+    """
+    Record that the device applied everything up to `watermark` (the
+    X-Sync-Watermark of its last /updated-data pull).
+    """
+    try:
+        service = DeviceSyncService(db)
+        state = service.record(ack.device_id, min(ack.watermark, now_ms()))
+        db.commit()
+        return _state_response(service, state)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/devices", response_model=List[DeviceSyncStateResponse])
+async def get_device_lag(db: Session = Depends(get_db)):
+    """
+    Every known device with its acknowledged watermark and lag, most behind
+    first. lagMs is null for devices that never acknowledged a pull.
+    """
+    try:
+        service = DeviceSyncService(db)
+        return [_state_response(service, state) for state in service.list_states()]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _state_response(service: DeviceSyncService, state) -> DeviceSyncStateResponse:
+    return DeviceSyncStateResponse(
+        device_id=state.device_id,
+        acknowledged_until=state.acknowledged_until,
+        last_seen_at=state.last_seen_at,
+        lag_ms=max(now_ms() - state.acknowledged_until, 0) if state.acknowledged_until else None,
+        active=service.is_active(state)
+    )
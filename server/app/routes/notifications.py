@@ -0,0 +1,66 @@
+"""
+Change Notification Routes
+Long-poll and server-sent events so devices learn about writes without
+polling /sync/updated-data.
+"""
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import logging
+
+from ..config import settings
+from ..change_notifier import notifier
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/wait")
+async def wait_for_changes(
+    since: int = Query(0, description="Last sync token seen by the client"),
+    timeout: int = Query(30, ge=0, description="Seconds to wait for a change"),
+):
+    """
+    Long-poll until a write commits after `since`, or the timeout expires.
+    Returns the current sync token and whether it moved past `since`.
+    Holds no database connection while waiting.
+    """
+    timeout = min(timeout, settings.sync_wait_max_timeout)
+    token = await notifier.wait(since, timeout)
+    return {"token": token, "changed": token > since}
+
+
+@router.get("/events")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, description="Last sync token seen by the client"),
+):
+    """
+    Server-sent events: one `change` event (data: {"token": ...}) per commit
+    batch, with keepalive comments in between. Reconnecting clients resume
+    from the Last-Event-ID header.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None:
+        since = int(last_event_id) if last_event_id and last_event_id.isdigit() else notifier.token
+
+    async def events():
+        last = since
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            token = await notifier.wait(last, settings.sync_events_keepalive)
+            if token > last:
+                last = token
+                yield f"id: {token}\nevent: change\ndata: {json.dumps({'token': token})}\n\n"
+            else:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: don't buffer the stream
+        },
+    )
@@ -1,48 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy import and_, desc, exists, select, tuple_, union_all
 from typing import List, Optional
+from datetime import datetime
+import base64
 
 from ..database import get_db
-from ..models import Expense, Tag, Target
-from ..models.schemas import ExpenseResponse, TagResponse, TargetResponse, RecommendationRequest, RecommendationResponse, ExpenseQueryParams
+from ..models import Expense, Tag, Target, ExpenseTagsCrossRef, ArchivedExpense, ArchivedExpenseTag
+from ..models.schemas import ExpenseResponse, TagResponse, TargetResponse, RecommendationRequest, RecommendationResponse, ExpenseQueryParams, TagSearchResult, TitleRecommendationRequest
 from ..services.graph_service import GraphService
+from ..services.archive_service import ArchiveService
+from ..services.tag_autocomplete import tag_autocomplete
+from ..services.title_tag_index import title_tag_index
+from ..change_tracking import etag_for, etag_headers, not_modified
 
 router = APIRouter()
 
 
+# Sparse fieldsets (?fields=) for GET /expenses
+_EXPENSE_FIELDS = ("id", "local_id", "title", "amount", "year", "month", "date", "created_at", "updated_at")
+
+
+def _encode_cursor(created_at, expense_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{expense_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    """(created_at, id) of the last row of the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, expense_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), expense_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in _EXPENSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
 @router.get("/expenses", response_model=List[ExpenseResponse])
 async def get_expenses(
+    response: Response,
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    offset: int = Query(0, ge=0, description="Deprecated, use cursor"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
     since: Optional[int] = Query(None, description="Unix timestamp"),
     tag_ids: Optional[str] = Query(None, description="Comma-separated tag IDs"),
+    tag_match: str = Query("any", pattern="^(any|all)$", description="Match any or all of tag_ids"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,title,amount,date"),
     db: Session = Depends(get_db)
 ):
     """
-    Get expenses with pagination and filtering
+    Get expenses, newest first, with keyset pagination and filtering
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one;
+    every page costs the same, however deep. With `fields` only those
+    columns are read and returned.
+    Archived expenses are included when the requested range reaches them
     """
+    after = _decode_cursor(cursor) if cursor else None
+    requested_fields = _parse_fields(fields)
+    
     try:
-        query = db.query(Expense).filter(Expense.deleted_at.is_(None))
-        
-        # Filter by timestamp if provided
-        if since:
-            from datetime import datetime
-            since_datetime = datetime.fromtimestamp(since)
-            query = query.filter(Expense.created_at >= since_datetime)
-        
-        # Filter by tag IDs if provided
-        if tag_ids:
-            tag_id_list = tag_ids.split(',')
-            from ..models import ExpenseTagsCrossRef
-            query = query.join(ExpenseTagsCrossRef).filter(
-                ExpenseTagsCrossRef.tag_id.in_(tag_id_list)
-            )
+        since_datetime = datetime.fromtimestamp(since) if since else None
+        tag_id_list = list(dict.fromkeys(tag_ids.split(','))) if tag_ids else None
+        # The cursor needs created_at and id whatever was asked for
+        selected = _EXPENSE_FIELDS if requested_fields is None else tuple(
+            dict.fromkeys(requested_fields + ["created_at", "id"]))
+        
+        def expense_select(model, link_model):
+            stmt = select(*(getattr(model, name) for name in selected))
+            if model is Expense:
+                stmt = stmt.where(Expense.deleted_at.is_(None))
+            
+            # Filter by timestamp if provided
+            if since_datetime:
+                stmt = stmt.where(model.created_at >= since_datetime)
+            
+            # Filter by tag IDs (semi-join, so an expense with several matching tags appears once)
+            if tag_id_list:
+                def has_tag(*ids):
+                    return exists().where(link_model.expense_id == model.id, link_model.tag_id.in_(ids))
+                if tag_match == "all":
+                    stmt = stmt.where(*(has_tag(tag_id) for tag_id in tag_id_list))
+                else:
+                    stmt = stmt.where(has_tag(*tag_id_list))
+            return stmt
+        
+        hot = expense_select(Expense, ExpenseTagsCrossRef)
+        if ArchiveService(db).covers(since_datetime):
+            combined = union_all(hot, expense_select(ArchivedExpense, ArchivedExpenseTag)).subquery()
+            stmt, columns = select(combined), combined.c
+        else:
+            stmt, columns = hot, Expense
         
-        # Apply pagination and ordering
-        expenses = query.order_by(desc(Expense.created_at)).offset(offset).limit(limit).all()
+        # Keyset pagination on (created_at, id)
+        if after:
+            stmt = stmt.where(tuple_(columns.created_at, columns.id) < tuple_(*after))
+        elif offset:
+            stmt = stmt.offset(offset)
+        rows = db.execute(
+            stmt.order_by(desc(columns.created_at), desc(columns.id)).limit(limit)
+        ).mappings().all()
         
-        return [ExpenseResponse.from_orm(exp) for exp in expenses]
+        headers = {}
+        if len(rows) == limit:
+            headers["X-Next-Cursor"] = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        
+        if requested_fields is not None:
+            return ORJSONResponse(
+                content=[{name: row[name] for name in requested_fields} for row in rows],
+                headers=headers
+            )
+        response.headers.update(headers)
+        return [ExpenseResponse(**row) for row in rows]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -50,13 +129,22 @@ async def get_expenses(
 
 @router.get("/tags", response_model=List[TagResponse])
 async def get_tags(
+    request: Request,
+    response: Response,
     limit: int = Query(100, ge=1, le=200),
     search: Optional[str] = Query(None, description="Search tag names"),
     db: Session = Depends(get_db)
 ):
     """
     Get tags with optional search
+    Supports If-None-Match (304 when no tag changed)
     """
+    etag = etag_for([Tag.__tablename__], request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
+    
     try:
         query = db.query(Tag).filter(Tag.deleted_at.is_(None))
         
@@ -72,8 +160,28 @@ async def get_tags(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/tags/autocomplete", response_model=List[TagSearchResult])
+async def autocomplete_tags(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Tags with a word starting with `prefix`, most (and most recently) used first
+    Served from the in-memory index, without a database query, so a tag
+    written in the last MEMORY_INDEX_REFRESH_DELAY seconds (0.5 by default)
+    may not be suggested yet
+    """
+    try:
+        tag_autocomplete.ensure_built()
+        return tag_autocomplete.suggest(prefix, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/targets", response_model=List[TargetResponse])
 async def get_targets(
+    request: Request,
+    response: Response,
     month: Optional[int] = Query(None, ge=1, le=12),
     year: Optional[int] = Query(None, ge=2000, le=3000),
     tag_id: Optional[str] = Query(None),
@@ -81,7 +189,14 @@ async def get_targets(
 ):
     """
     Get targets with optional filtering
+    Supports If-None-Match (304 when no target changed)
     """
+    etag = etag_for([Target.__tablename__], request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers.update(etag_headers(etag))
+    
     try:
         query = db.query(Target).filter(Target.deleted_at.is_(None))
         
@@ -125,6 +240,20 @@ async def get_tag_recommendations(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/recommendations/by-title", response_model=List[RecommendationResponse])
+async def get_title_recommendations(request: TitleRecommendationRequest):
+    """
+    Get tag recommendations for an expense title (no tags picked yet)
+    Served from the in-memory title token index, without a database query;
+    like autocomplete, it trails writes by MEMORY_INDEX_REFRESH_DELAY seconds
+    """
+    try:
+        title_tag_index.ensure_built()
+        return [RecommendationResponse(**rec) for rec in title_tag_index.suggest(request.title, request.limit)]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/expenses/{expense_id}", response_model=ExpenseResponse)
 async def get_expense(expense_id: str, db: Session = Depends(get_db)):
     """
@@ -135,6 +264,8 @@ async def get_expense(expense_id: str, db: Session = Depends(get_db)):
             and_(Expense.id == expense_id, Expense.deleted_at.is_(None))
         ).first()
         
+        if not expense:
+            expense = ArchiveService(db).get_archived_expense(expense_id)
         if not expense:
             raise HTTPException(status_code=404, detail="Expense not found")
         
@@ -189,6 +320,8 @@ async def get_summary_stats(db: Session = Depends(get_db)):
                 Expense.deleted_at.is_(None)
             )
         ).scalar() or 0
+        archive = ArchiveService(db)
+        current_month_total += archive.month_totals(current_year, current_month)[0]
         
         # Total expenses last month
         last_month = current_month - 1 if current_month > 1 else 12
@@ -201,11 +334,13 @@ async def get_summary_stats(db: Session = Depends(get_db)):
                 Expense.deleted_at.is_(None)
             )
         ).scalar() or 0
+        last_month_total += archive.month_totals(last_month_year, last_month)[0]
         
-        # Total number of expenses
+        # Total number of expenses (archived ones from the rollups)
         total_expenses = db.query(func.count(Expense.id)).filter(
             Expense.deleted_at.is_(None)
         ).scalar() or 0
+        total_expenses += archive.archived_count()
         
         # Total number of tags
         total_tags = db.query(func.count(Tag.id)).filter(
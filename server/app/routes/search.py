@@ -0,0 +1,36 @@
+"""
+Search Routes
+Ranked substring search over tag names and expense titles.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models.schemas import SearchResponse
+from ..services.search_service import SearchService
+
+router = APIRouter()
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=100, description="Search term"),
+    type: str = Query("all", pattern="^(all|tags|expenses)$", description="What to search"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Search tags by name and expenses by title, best matches first
+    `limit`/`offset` page each result list separately
+    """
+    try:
+        service = SearchService(db)
+        q = q.strip()
+        return SearchResponse(
+            query=q,
+            tags=service.search_tags(q, limit, offset) if type in ("all", "tags") else [],
+            expenses=service.search_expenses(q, limit, offset) if type in ("all", "expenses") else []
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
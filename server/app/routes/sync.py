@@ -1,15 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, select
+import asyncio
 import time
-from typing import Optional
+from typing import Optional, Tuple
 
-from ..database import get_db
-from ..models import Expense, Tag, Target, GraphEdge
-from ..models.schemas import SyncDeltaResponse, SyncPushRequest, SyncPushResponse, ExpenseResponse, TagResponse, TargetResponse
+from ..config import settings
+from ..database import SessionLocal, begin_read_snapshot, get_db
+from ..models import Expense, Tag, Target, GraphEdge, ArchivedExpense
+from ..models.schemas import SyncDeltaResponse, SyncPushRequest, SyncPushResponse
+from ..sync_payloads import (
+    FULL_EXPENSE_SPEC, FULL_ARCHIVED_EXPENSE_SPEC, FULL_TAG_SPEC, FULL_TARGET_SPEC, FULL_GRAPH_EDGE_SPEC,
+    json_document, select_many, serialize_many, sql_json_enabled
+)
+from ..services.snapshot_service import MEDIA_TYPE as SNAPSHOT_MEDIA_TYPE, snapshot_service
 
 router = APIRouter()
 
+# (spec, filters) of each list in /sync/full
+FULL_SYNC_PARTS = [
+    (FULL_EXPENSE_SPEC, (Expense.deleted_at.is_(None),)),
+    (FULL_ARCHIVED_EXPENSE_SPEC, ()),
+    (FULL_TAG_SPEC, (Tag.deleted_at.is_(None),)),
+    (FULL_TARGET_SPEC, (Target.deleted_at.is_(None),)),
+    (FULL_GRAPH_EDGE_SPEC, ()),
+]
+
 
 @router.get("/delta", response_model=SyncDeltaResponse)
 async def get_sync_delta(
@@ -26,79 +43,33 @@ async def get_sync_delta(
             from datetime import datetime
             since_datetime = datetime.fromtimestamp(since)
         
-        # Query for expenses
-        expense_query = db.query(Expense).filter(Expense.deleted_at.is_(None))
-        if since_datetime:
-            expense_query = expense_query.filter(
-                or_(
-                    Expense.created_at > since_datetime,
-                    Expense.updated_at > since_datetime
-                )
-            )
-        
-        expenses = expense_query.all()
-        expense_responses = [ExpenseResponse.from_orm(exp) for exp in expenses]
-        
-        # Query for tags
-        tag_query = db.query(Tag).filter(Tag.deleted_at.is_(None))
-        if since_datetime:
-            tag_query = tag_query.filter(
-                or_(
-                    Tag.created_at > since_datetime,
-                    Tag.updated_at > since_datetime
-                )
-            )
-        
-        tags = tag_query.all()
-        tag_responses = [TagResponse.from_orm(tag) for tag in tags]
-        
-        # Query for targets
-        target_query = db.query(Target).filter(Target.deleted_at.is_(None))
-        if since_datetime:
-            target_query = target_query.filter(
-                or_(
-                    Target.created_at > since_datetime,
-                    Target.updated_at > since_datetime
-                )
-            )
+        def changed(model):
+            if since_datetime is None:
+                return ()
+            return (or_(model.created_at > since_datetime, model.updated_at > since_datetime),)
         
-        targets = target_query.all()
-        target_responses = [TargetResponse.from_orm(target) for target in targets]
-        
-        # Query for graph edges
-        graph_edge_query = db.query(GraphEdge)
-        if since_datetime:
-            graph_edge_query = graph_edge_query.filter(
-                or_(
-                    GraphEdge.created_at > since_datetime,
-                    GraphEdge.updated_at > since_datetime
-                )
-            )
-        
-        graph_edges = graph_edge_query.all()
-        graph_edge_responses = [
-            {
-                "from_tag_id": edge.from_tag_id,
-                "to_tag_id": edge.to_tag_id,
-                "weight": edge.weight,
-                "created_at": edge.created_at.isoformat() if edge.created_at else None,
-                "updated_at": edge.updated_at.isoformat() if edge.updated_at else None
-            }
-            for edge in graph_edges
-        ]
-        
-        return SyncDeltaResponse(
-            expenses=expense_responses,
-            tags=tag_responses,
-            targets=target_responses,
-            graph_edges=graph_edge_responses,
-            last_sync_timestamp=int(time.time())
-        )
+        return ORJSONResponse(_delta_document(db, [
+            (FULL_EXPENSE_SPEC, (Expense.deleted_at.is_(None),) + changed(Expense)),
+            (FULL_ARCHIVED_EXPENSE_SPEC, changed(ArchivedExpense)),
+            (FULL_TAG_SPEC, (Tag.deleted_at.is_(None),) + changed(Tag)),
+            (FULL_TARGET_SPEC, (Target.deleted_at.is_(None),) + changed(Target)),
+            (FULL_GRAPH_EDGE_SPEC, changed(GraphEdge)),
+        ]))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _delta_document(db: Session, parts) -> dict:
+    """
+    SyncDeltaResponse as a dict, serialized straight from column tuples
+    (see sync_payloads.FULL_*_SPEC) instead of one Pydantic model per row.
+    """
+    document = serialize_many(parts, select_many(db, parts))
+    document["last_sync_timestamp"] = int(time.time())
+    return document
+
+
 @router.post("/push", response_model=SyncPushResponse)
 async def push_sync_data(
     request: SyncPushRequest,
@@ -279,34 +250,107 @@ async def full_sync(db: Session = Depends(get_db)):
     Get all data for initial sync or recovery
     """
     try:
-        # Get all non-deleted data
-        expenses = db.query(Expense).filter(Expense.deleted_at.is_(None)).all()
-        tags = db.query(Tag).filter(Tag.deleted_at.is_(None)).all()
-        targets = db.query(Target).filter(Target.deleted_at.is_(None)).all()
-        graph_edges = db.query(GraphEdge).all()
-        
-        expense_responses = [ExpenseResponse.from_orm(exp) for exp in expenses]
-        tag_responses = [TagResponse.from_orm(tag) for tag in tags]
-        target_responses = [TargetResponse.from_orm(target) for target in targets]
+        begin_read_snapshot(db)
+        if sql_json_enabled(db):
+            # PostgreSQL assembles the JSON (same shape, see sync_payloads.FULL_*_SPEC)
+            return Response(json_document(db, FULL_SYNC_PARTS, extra={
+                "last_sync_timestamp": int(time.time())
+            }), media_type="application/json")
         
-        graph_edge_responses = [
-            {
-                "from_tag_id": edge.from_tag_id,
-                "to_tag_id": edge.to_tag_id,
-                "weight": edge.weight,
-                "created_at": edge.created_at.isoformat() if edge.created_at else None,
-                "updated_at": edge.updated_at.isoformat() if edge.updated_at else None
-            }
-            for edge in graph_edges
-        ]
+        # Get all non-deleted data
+        return ORJSONResponse(_delta_document(db, FULL_SYNC_PARTS))
         
-        return SyncDeltaResponse(
-            expenses=expense_responses,
-            tags=tag_responses,
-            targets=target_responses,
-            graph_edges=graph_edge_responses,
-            last_sync_timestamp=int(time.time())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshot")
+async def get_bootstrap_snapshot(request: Request):
+    """
+    Download the bootstrap snapshot for a new device (gzip NDJSON, see
+    app/services/snapshot_service.py). Supports single Range requests
+    (with If-Range) so an interrupted download can resume.
+    
+    X-Sync-Watermark is the snapshot's watermark: afterwards, pull
+    /sync/updated-data?since=<watermark> for what changed since it was built.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(
+            None, snapshot_service.ensure, SessionLocal, settings.snapshot_max_age_minutes * 60
         )
-        
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    headers = {
+        "ETag": snapshot.etag,
+        "X-Sync-Watermark": str(snapshot.watermark),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{snapshot.name}"',
+        "Cache-Control": "no-cache",
+    }
+    if settings.snapshot_accel_redirect_prefix:
+        # nginx serves the file itself: sendfile, Range and If-Range included
+        headers["X-Accel-Redirect"] = settings.snapshot_accel_redirect_prefix.rstrip("/") + "/" + snapshot.name
+        return Response(media_type=SNAPSHOT_MEDIA_TYPE, headers=headers)
+    
+    size = snapshot.path.stat().st_size
+    byte_range = _requested_range(request, snapshot.etag, size)
+    if byte_range == _UNSATISFIABLE:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    start, end = byte_range or (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        _read_file(snapshot.path, start, end + 1),
+        status_code=206 if byte_range else 200,
+        media_type=SNAPSHOT_MEDIA_TYPE,
+        headers=headers
+    )
+
+
+_UNSATISFIABLE = (-1, -1)
+_CHUNK_SIZE = 256 * 1024
+
+
+def _requested_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (first, last) byte of a single-range request, None to send the whole file
+    (no Range, several ranges, or an If-Range that no longer matches), or
+    _UNSATISFIABLE.
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                return _UNSATISFIABLE
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return _UNSATISFIABLE
+    return start, min(end, size - 1)
+
+
+def _read_file(path, start: int, stop: int):
+    # Runs in the threadpool (sync iterator); the open handle outlives a prune
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Union, Literal, Annotated
+from datetime import datetime
 from pydantic import Discriminator
 
 # Base models for database entities
@@ -119,6 +120,7 @@ class UpdateExpenseBatchRequest(BaseModel):
     year: int
     month: int
     date: int
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -126,6 +128,7 @@ class UpdateExpenseBatchRequest(BaseModel):
 class DeleteExpenseBatchRequest(BaseModel):
     type: Literal["delete_expense"]
     server_id: str = Field(..., alias="serverId")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -163,6 +166,7 @@ class UpdateTagBatchRequest(BaseModel):
     monthly_amount: int = Field(..., alias="monthlyAmount")
     current_month: int = Field(..., alias="currentMonth")
     current_year: int = Field(..., alias="currentYear")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -170,6 +174,7 @@ class UpdateTagBatchRequest(BaseModel):
 class DeleteTagBatchRequest(BaseModel):
     type: Literal["delete_tag"]
     server_id: str = Field(..., alias="serverId")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -203,6 +208,7 @@ class UpdateTargetBatchRequest(BaseModel):
     server_id: str = Field(..., alias="serverId")
     amount: int
     spent: int
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -210,6 +216,7 @@ class UpdateTargetBatchRequest(BaseModel):
 class DeleteTargetBatchRequest(BaseModel):
     type: Literal["delete_target"]
     server_id: str = Field(..., alias="serverId")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -268,6 +275,7 @@ class UpdateGraphEdgeBatchRequest(BaseModel):
     type: Literal["update_graph_edge"]
     server_id: str = Field(..., alias="serverId")
     weight: int
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -275,6 +283,7 @@ class UpdateGraphEdgeBatchRequest(BaseModel):
 class DeleteGraphEdgeBatchRequest(BaseModel):
     type: Literal["delete_graph_edge"]
     server_id: str = Field(..., alias="serverId")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -295,6 +304,7 @@ class SyncResultType(BaseModel):
     success: bool
     client_id: Optional[str] = Field(None, alias="clientId")
     server_id: Optional[str] = Field(None, alias="serverId")
+    version: Optional[int] = None  # Row version after an update
     error: Optional[str] = None
     
     class Config:
@@ -316,6 +326,7 @@ class ApiExpense(BaseModel):
     date: int
     created_at: int = Field(..., alias="createdAt")
     updated_at: int = Field(..., alias="updatedAt")
+    version: int = 1
     
     class Config:
         populate_by_name = True
@@ -331,6 +342,7 @@ class ApiTag(BaseModel):
     created_year: int = Field(..., alias="createdYear")
     created_at: int = Field(..., alias="createdAt")
     updated_at: int = Field(..., alias="updatedAt")
+    version: int = 1
 
 class ApiTarget(BaseModel):
     id: str
@@ -341,6 +353,7 @@ class ApiTarget(BaseModel):
     spent: int
     created_at: int = Field(..., alias="createdAt")
     updated_at: int = Field(..., alias="updatedAt")
+    version: int = 1
 
 class ApiExpenseTag(BaseModel):
     id: str
@@ -356,6 +369,7 @@ class ApiGraphEdge(BaseModel):
     weight: int
     created_at: int = Field(..., alias="createdAt")
     updated_at: int = Field(..., alias="updatedAt")
+    version: int = 1
 
 # Updated data response for delta sync
 # Wishlist Models
@@ -376,6 +390,7 @@ class ApiWishlistItem(WishlistItemBase):
     id: str
     created_at: int = Field(alias="createdAt")
     updated_at: int = Field(alias="updatedAt")
+    version: int = 1
 
     class Config:
         orm_mode = True
@@ -425,6 +440,7 @@ class UpdateWishlistBatchRequest(BaseModel):
     name: str
     min_price: int = Field(..., alias="minPrice")
     max_price: int = Field(..., alias="maxPrice")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -432,6 +448,7 @@ class UpdateWishlistBatchRequest(BaseModel):
 class DeleteWishlistBatchRequest(BaseModel):
     type: Literal["delete_wishlist"]
     server_id: str = Field(..., alias="serverId")
+    expected_version: Optional[int] = Field(None, alias="expectedVersion")
     
     class Config:
         populate_by_name = True
@@ -493,3 +510,22 @@ class UpdatedDataResponse(BaseModel):
     class Config:
         orm_mode = True
         populate_by_name = True
+
+# Device sync state
+
+class SyncAckRequest(BaseModel):
+    device_id: str = Field(..., alias="deviceId")
+    watermark: int  # Server timestamp (ms) of the last applied pull
+
+    class Config:
+        populate_by_name = True
+
+class DeviceSyncStateResponse(BaseModel):
+    device_id: str = Field(..., alias="deviceId")
+    acknowledged_until: int = Field(..., alias="acknowledgedUntil")
+    last_seen_at: datetime = Field(..., alias="lastSeenAt")
+    lag_ms: Optional[int] = Field(None, alias="lagMs")  # None until the first acknowledgement
+    active: bool
+
+    class Config:
+        populate_by_name = True
@@ -107,6 +107,7 @@ class AtomicGroupResult(BaseModel):
         alias="entityMappings"
     )
     rolled_back: bool = Field(default=False, alias="rolledBack")
+    folded_operations: int = Field(default=0, alias="foldedOperations")
     
     class Config:
         populate_by_name = True
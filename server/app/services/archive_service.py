@@ -0,0 +1,187 @@
+"""
+Archive Service
+Moves old expenses (and their expense_tags) out of the hot tables into
+append-only archive tables, keeping per-month rollups of what was archived
+so dashboards never scan the archive. Expenses are archived by created_at,
+in batches, each batch in its own transaction.
+
+Reads that reach back past the newest archived row (see covers()) union
+the archive in; writes to an archived expense move it back first
+(restore_expense()), so sync clients never notice the difference.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import time
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import (
+    Expense, ExpenseTagsCrossRef,
+    ArchivedExpense, ArchivedExpenseTag, ExpenseMonthlyRollup
+)
+
+logger = logging.getLogger(__name__)
+
+ALL_TAGS = ""  # ExpenseMonthlyRollup.tag_id of the month total
+
+_EXPENSE_COLUMNS = ("id", "local_id", "title", "amount", "year", "month", "date", "created_at", "updated_at", "version")
+_EXPENSE_TAG_COLUMNS = ("id", "expense_id", "tag_id", "created_at", "updated_at")
+
+
+def expense_columns(model) -> List[Any]:
+    """Columns shared by Expense and ArchivedExpense, for unions."""
+    return [getattr(model, name) for name in _EXPENSE_COLUMNS]
+
+
+class ArchiveService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # Archiving
+
+    def archive_horizon(self) -> Optional[datetime]:
+        """Expenses created before this are archived; None when archiving is off."""
+        if settings.archive_after_days <= 0:
+            return None
+        return datetime.utcnow() - timedelta(days=settings.archive_after_days)
+
+    def archive(self, before: datetime, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Move live expenses created before `before` into the archive."""
+        batch_size = batch_size or settings.archive_batch_size
+        start = time.time()
+        archived = links = batches = 0
+
+        candidates = select(Expense.id).where(
+            Expense.deleted_at.is_(None),
+            Expense.created_at < before
+        ).limit(batch_size)
+
+        while True:
+            ids = self.db.scalars(candidates).all()
+            if not ids:
+                break
+            try:
+                batch_links = self._archive_batch(ids)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            archived += len(ids)
+            links += batch_links
+            batches += 1
+            if len(ids) < batch_size:
+                break
+
+        report = {
+            "before": before.isoformat(),
+            "expenses": archived,
+            "expense_tags": links,
+            "batches": batches,
+            "duration_ms": round((time.time() - start) * 1000, 2),
+        }
+        logger.info(f"[ARCHIVE] Archived {archived} expenses ({links} tag links) in {batches} batches")
+        return report
+
+    def _archive_batch(self, ids: List[str]) -> int:
+        # Rollups first, while the rows are still in the hot tables
+        totals = self.db.execute(
+            select(Expense.year, Expense.month, func.sum(Expense.amount), func.count())
+            .where(Expense.id.in_(ids))
+            .group_by(Expense.year, Expense.month)
+        ).all()
+        tag_totals = self.db.execute(
+            select(Expense.year, Expense.month, ExpenseTagsCrossRef.tag_id, func.sum(Expense.amount), func.count())
+            .join(ExpenseTagsCrossRef, ExpenseTagsCrossRef.expense_id == Expense.id)
+            .where(Expense.id.in_(ids))
+            .group_by(Expense.year, Expense.month, ExpenseTagsCrossRef.tag_id)
+        ).all()
+        self._apply_rollups([(y, m, ALL_TAGS, a, c) for y, m, a, c in totals], sign=1)
+        self._apply_rollups(tag_totals, sign=1)
+
+        self.db.execute(insert(ArchivedExpense).from_select(
+            list(_EXPENSE_COLUMNS),
+            select(*expense_columns(Expense)).where(Expense.id.in_(ids))
+        ))
+        links = self.db.execute(insert(ArchivedExpenseTag).from_select(
+            list(_EXPENSE_TAG_COLUMNS),
+            select(*(getattr(ExpenseTagsCrossRef, c) for c in _EXPENSE_TAG_COLUMNS))
+            .where(ExpenseTagsCrossRef.expense_id.in_(ids))
+        )).rowcount
+        self.db.execute(delete(ExpenseTagsCrossRef).where(ExpenseTagsCrossRef.expense_id.in_(ids)))
+        self.db.execute(delete(Expense).where(Expense.id.in_(ids)))
+        return max(links, 0)
+
+    def _apply_rollups(self, rows: Iterable[Tuple[int, int, str, int, int]], sign: int) -> None:
+        for year, month, tag_id, amount, count in rows:
+            rollup = self.db.get(ExpenseMonthlyRollup, (year, month, tag_id))
+            if rollup is None:
+                rollup = ExpenseMonthlyRollup(year=year, month=month, tag_id=tag_id, total_amount=0, expense_count=0)
+                self.db.add(rollup)
+            rollup.total_amount += sign * (amount or 0)
+            rollup.expense_count += sign * count
+        self.db.flush()
+
+    # Restoring (write to an archived expense)
+
+    def restore_expense(self, expense_id: str) -> bool:
+        """
+        Move an archived expense and its links back into the hot tables.
+        Returns False if it is not archived. Does not commit.
+        """
+        archived = self.db.get(ArchivedExpense, expense_id)
+        if archived is None:
+            return False
+
+        archived_links = self.db.query(ArchivedExpenseTag).filter(ArchivedExpenseTag.expense_id == expense_id).all()
+        self._apply_rollups(
+            [(archived.year, archived.month, ALL_TAGS, archived.amount, 1)]
+            + [(archived.year, archived.month, link.tag_id, archived.amount, 1) for link in archived_links],
+            sign=-1
+        )
+
+        # INSERT statement rather than add(): a flush would reset the row version to 1
+        self.db.execute(insert(Expense).values(**{c: getattr(archived, c) for c in _EXPENSE_COLUMNS}))
+        for link in archived_links:
+            self.db.add(ExpenseTagsCrossRef(**{c: getattr(link, c) for c in _EXPENSE_TAG_COLUMNS}))
+            self.db.delete(link)
+        self.db.delete(archived)
+        self.db.flush()
+        logger.info(f"[ARCHIVE] Restored expense {expense_id} ({len(archived_links)} tag links)")
+        return True
+
+    def restore_expense_of_link(self, link_id: str) -> bool:
+        link = self.db.get(ArchivedExpenseTag, link_id)
+        return link is not None and self.restore_expense(link.expense_id)
+
+    # Reads
+
+    def newest_archived(self) -> Optional[datetime]:
+        """created_at of the newest archived expense (None if the archive is empty)."""
+        return self.db.query(func.max(ArchivedExpense.created_at)).scalar()
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        """Whether a read of expenses created at/after `since` needs the archive."""
+        newest = self.newest_archived()
+        if newest is None:
+            return False
+        return since is None or _naive(since) <= _naive(newest)
+
+    def get_archived_expense(self, expense_id: str) -> Optional[ArchivedExpense]:
+        return self.db.get(ArchivedExpense, expense_id)
+
+    def month_totals(self, year: int, month: int) -> Tuple[int, int]:
+        """(total amount, count) of the archived expenses of a month."""
+        rollup = self.db.get(ExpenseMonthlyRollup, (year, month, ALL_TAGS))
+        return (rollup.total_amount, rollup.expense_count) if rollup else (0, 0)
+
+    def archived_count(self) -> int:
+        return self.db.query(func.coalesce(func.sum(ExpenseMonthlyRollup.expense_count), 0)).filter(
+            ExpenseMonthlyRollup.tag_id == ALL_TAGS
+        ).scalar()
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
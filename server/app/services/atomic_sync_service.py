@@ -3,10 +3,12 @@ Atomic Sync Service
 Processes atomic sync groups with ACID guarantees.
 Each group is processed in a savepoint (nested transaction).
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy.orm import Session
 from sqlalchemy import exc
 from datetime import datetime
+import contextvars
 import logging
 
 from ..models import (
@@ -42,8 +44,80 @@ from ..schemas_atomic import (
     SyncOperation
 )
 
+from .operation_coalescer import TombstoneCreate, coalesce_operations, entity_type_of
+from .archive_service import ArchiveService
+from .versioned_writes import delete_versioned, update_versioned
+from ..config import settings
+
 logger = logging.getLogger(__name__)
 
+# Operation fields that identify an entity (created, updated or referenced)
+_ENTITY_ID_FIELDS = ("client_id", "server_id", "expense_id", "tag_id", "from_tag_id", "to_tag_id", "wishlist_id")
+
+# IDs per entity_mappings lookup when partitioning
+_MAPPING_CHUNK = 500
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.atomic_sync_parallel_workers,
+            thread_name_prefix="atomic-sync"
+        )
+    return _executor
+
+
+def _group_keys(group: AtomicSyncGroup) -> set:
+    """Client/server IDs and unique tag names a group creates, changes or references."""
+    keys = set()
+    for op in group.operations:
+        for field in _ENTITY_ID_FIELDS:
+            value = getattr(op, field, None)
+            if value:
+                keys.add(value)
+        if isinstance(op, (CreateTagBatchRequest, UpdateTagBatchRequest)):
+            keys.add(f"tag-name:{op.name}")
+    return keys
+
+
+def partition_groups(
+    groups: List[AtomicSyncGroup],
+    aliases: Optional[Dict[str, str]] = None
+) -> List[List[int]]:
+    """
+    Split groups into partitions that share no entity (union-find over keys).
+    `aliases` maps client IDs to the server IDs they were given in earlier
+    requests (entity_mappings), so a group naming an entity by either ID
+    lands with the others. Each partition lists group indexes in request
+    order; partitions are ordered by their first group.
+    """
+    aliases = aliases or {}
+    parent = list(range(len(groups)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[str, int] = {}
+    for idx, group in enumerate(groups):
+        for key in {aliases.get(key, key) for key in _group_keys(group)}:
+            if key in owner:
+                a, b = find(idx), find(owner[key])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            else:
+                owner[key] = idx
+
+    partitions: Dict[int, List[int]] = {}
+    for idx in range(len(groups)):
+        partitions.setdefault(find(idx), []).append(idx)
+    return list(partitions.values())
+
 
 class AtomicSyncService:
     """
@@ -51,8 +125,9 @@ class AtomicSyncService:
     Each group succeeds completely or fails completely with rollback.
     """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, session_factory: Optional[Callable[[], Session]] = None):
         self.db = db
+        self.session_factory = session_factory
         self.entity_mappings: Dict[str, str] = {}  # clientId -> serverId within current group
     
     # Idempotency helpers
@@ -106,6 +181,11 @@ class AtomicSyncService:
         client_timestamp: int
     ) -> List[AtomicGroupResult]:
         """Process all groups. Each group is independent transaction."""
+        if self._parallel_enabled(groups):
+            partitions = partition_groups(groups, self._mapped_server_ids(groups))
+            if len(partitions) > 1:
+                return self._process_partitions_parallel(groups, partitions, client_timestamp)
+        
         results = []
         
         for group in groups:
@@ -116,6 +196,95 @@ class AtomicSyncService:
             
         return results
     
+    def _mapped_server_ids(self, groups: List[AtomicSyncGroup]) -> Dict[str, str]:
+        """clientId -> serverId for every ID in `groups` mapped by an earlier request."""
+        keys = list(set().union(*(_group_keys(group) for group in groups)))
+        aliases: Dict[str, str] = {}
+        for start in range(0, len(keys), _MAPPING_CHUNK):
+            aliases.update(self.db.query(EntityMappingModel.client_id, EntityMappingModel.server_id).filter(
+                EntityMappingModel.client_id.in_(keys[start:start + _MAPPING_CHUNK])
+            ).all())
+        return aliases
+    
+    def _parallel_enabled(self, groups: List[AtomicSyncGroup]) -> bool:
+        if settings.atomic_sync_parallel_workers < 2 or len(groups) < 2 or self.session_factory is None:
+            return False
+        # SQLite serializes writers; concurrent sessions would only hit "database is locked"
+        return self.db.get_bind().dialect.name != "sqlite"
+    
+    def _process_partitions_parallel(
+        self,
+        groups: List[AtomicSyncGroup],
+        partitions: List[List[int]],
+        client_timestamp: int
+    ) -> List[AtomicGroupResult]:
+        """
+        Run independent partitions concurrently, each worker on its own
+        session (and pooled connection). Groups inside a partition keep
+        request order; results are returned in request order.
+        
+        Each worker commits its groups itself, before the route stores the
+        idempotency record in the request session. If that final commit fails
+        the groups stay committed and a retry runs them again: creates resolve
+        to the rows already made through their persistent client-id mappings,
+        and updates/deletes re-apply the same values.
+        """
+        workers = min(settings.atomic_sync_parallel_workers, len(partitions))
+        # Largest partitions first, each to the least loaded worker
+        buckets: List[List[int]] = [[] for _ in range(workers)]
+        loads = [0] * workers
+        for partition in sorted(partitions, key=lambda p: -sum(len(groups[i].operations) for i in p)):
+            target = loads.index(min(loads))
+            buckets[target].extend(partition)
+            loads[target] += sum(len(groups[i].operations) for i in partition)
+        
+        logger.info(f"[PARALLEL] {len(groups)} groups in {len(partitions)} partitions across {workers} workers")
+        
+        executor = _get_executor()
+        futures = [
+            # copy_context keeps request-scoped state (e.g. SQL profiling) in the worker
+            executor.submit(contextvars.copy_context().run, self._process_bucket, groups, sorted(bucket), client_timestamp)
+            for bucket in buckets if bucket
+        ]
+        
+        results: List[Optional[AtomicGroupResult]] = [None] * len(groups)
+        for future in futures:
+            for idx, result in future.result():
+                results[idx] = result
+        return results
+    
+    def _process_bucket(
+        self,
+        groups: List[AtomicSyncGroup],
+        indexes: List[int],
+        client_timestamp: int
+    ) -> List[tuple]:
+        """Process groups (request order) on a fresh session and commit them together."""
+        session = self.session_factory()
+        try:
+            service = AtomicSyncService(session)
+            processed = []
+            for idx in indexes:
+                service.entity_mappings.clear()
+                processed.append((idx, service.process_single_group(groups[idx], client_timestamp)))
+            session.commit()
+            return processed
+        except Exception as e:
+            session.rollback()
+            logger.error(f"[PARALLEL] Worker commit failed, {len(indexes)} groups rolled back: {e}", exc_info=True)
+            return [
+                (idx, AtomicGroupResult(
+                    group_id=groups[idx].group_id,
+                    success=False,
+                    error=str(e),
+                    entity_mappings=[],
+                    rolled_back=True
+                ))
+                for idx in indexes
+            ]
+        finally:
+            session.close()
+    
     def process_single_group(
         self,
         group: AtomicSyncGroup,
@@ -141,25 +310,33 @@ class AtomicSyncService:
         try:
             entity_mappings = []
             
+            # Fold redundant chains (create -> update -> delete) before replay
+            operations, folded = (
+                coalesce_operations(group.operations) if settings.atomic_sync_coalesce
+                else (group.operations, 0)
+            )
+            
             # Count operation types for logging
             operation_types = {}
-            for op in group.operations:
+            for op in operations:
                 op_type = type(op).__name__
                 operation_types[op_type] = operation_types.get(op_type, 0) + 1
             
             logger.info(
                 f"Processing group {group.group_id}\n"
-                f"  Operations: {len(group.operations)}\n"
+                f"  Operations: {len(operations)} ({folded} folded)\n"
                 f"  Types: {operation_types}"
             )
             
             # Process operations in sequence
-            for idx, operation in enumerate(group.operations):
+            for idx, operation in enumerate(operations):
                 op_type = type(operation).__name__
-                logger.debug(f"  [{idx+1}/{len(group.operations)}] Processing {op_type}")
+                logger.debug(f"  [{idx+1}/{len(operations)}] Processing {op_type}")
                 
-                mapping = self._process_operation(operation, group.group_id)
+                mapping = self._process_operation(self._resolve_server_id(operation), group.group_id)
                 if mapping:
+                    # Later operations of the group may address it by client ID
+                    self.entity_mappings[f"{mapping.entity_type}:{mapping.client_id}"] = mapping.server_id
                     entity_mappings.append(mapping)
                     logger.debug(
                         f"    ✓ Created mapping: {mapping.entity_type} "
@@ -191,7 +368,8 @@ class AtomicSyncService:
                 group_id=group.group_id,
                 success=True,
                 entity_mappings=entity_mappings,
-                rolled_back=False
+                rolled_back=False,
+                folded_operations=folded
             )
             
         except Exception as e:
@@ -217,6 +395,20 @@ class AtomicSyncService:
                 rolled_back=True
             )
     
+    def _resolve_server_id(self, operation: Any) -> Any:
+        """
+        Point an update/delete at the server ID of an entity created earlier
+        in this group when it names the entity by its client ID (in-memory
+        mappings only, no query).
+        """
+        server_id = getattr(operation, "server_id", None)
+        if not server_id:
+            return operation
+        resolved = self.entity_mappings.get(f"{entity_type_of(operation)}:{server_id}")
+        if resolved is None:
+            return operation
+        return operation.model_copy(update={"server_id": str(resolved)})
+    
     def _process_operation(
         self,
         operation: Any,
@@ -264,9 +456,38 @@ class AtomicSyncService:
             return self._create_wishlist_tag(operation)
         elif isinstance(operation, DeleteWishlistTagBatchRequest):
             return self._delete_wishlist_tag(operation)
+        elif isinstance(operation, TombstoneCreate):
+            return self._create_tombstone(operation)
         else:
             raise ValueError(f"Unknown operation type: {type(operation)}")
     
+    # Folded create -> delete, by operation `type` (coded MessagePack subclasses share it)
+    _TOMBSTONE_MODELS = {
+        "create_expense": Expense,
+        "create_tag": Tag,
+        "create_target": Target,
+        "create_wishlist": WishlistItem,
+    }
+    
+    def _create_tombstone(self, tombstone: TombstoneCreate) -> EntityMapping:
+        """
+        Create the entity and mark it deleted in the same flush. The mapping
+        is still returned so the client can resolve its local row.
+        """
+        mapping = self._process_operation(tombstone.operation, "")
+        model = self._TOMBSTONE_MODELS[tombstone.operation.type]
+        # Just created or loaded by the idempotency check: identity map hit, no SELECT
+        entity = self.db.get(model, mapping.server_id)
+        if entity is not None and entity.deleted_at is None:
+            entity.deleted_at = datetime.utcnow()
+        logger.debug(f"[TOMBSTONE] {mapping.entity_type} {mapping.client_id} -> {mapping.server_id} created deleted")
+        return mapping
+    
+    def _write(self, model: Any, entity: str, operation: Any, values: Dict[str, Any]) -> None:
+        """One UPDATE ... RETURNING version, checked against the operation's expected_version."""
+        if update_versioned(self.db, model, operation.server_id, values, operation.expected_version) is None:
+            raise ValueError(f"{entity} not found: {operation.server_id}")
+    
     # Expense operations
     def _create_expense(self, operation: CreateExpenseBatchRequest) -> EntityMapping:
         logger.debug(f"[CREATE_EXPENSE] client_id={operation.client_id}, title={operation.title}")
@@ -275,7 +496,7 @@ class AtomicSyncService:
         if existing_id:
             # Verify the entity actually exists
             existing_expense = self.db.query(Expense).filter(Expense.id == existing_id).first()
-            if existing_expense:
+            if existing_expense or ArchiveService(self.db).restore_expense(existing_id):
                 logger.info(f"[CREATE_EXPENSE] Expense already exists for client_id {operation.client_id}, returning existing server_id {existing_id}")
                 self.entity_mappings[f"expense:{operation.client_id}"] = existing_id
                 return EntityMapping(
@@ -331,26 +552,27 @@ class AtomicSyncService:
             server_id=str(new_expense.id)
         )
     
-    def _update_expense(self, operation: UpdateExpenseBatchRequest) -> Optional[EntityMapping]:
-        expense = self.db.query(Expense).filter(Expense.id == operation.server_id).first()
-        if not expense:
+    def _write_expense(self, operation: Any, values: Dict[str, Any]) -> None:
+        """Versioned UPDATE of an expense, moving it back from the archive if it was archived."""
+        version = update_versioned(self.db, Expense, operation.server_id, values, operation.expected_version)
+        if version is None and ArchiveService(self.db).restore_expense(operation.server_id):
+            version = update_versioned(self.db, Expense, operation.server_id, values, operation.expected_version)
+        if version is None:
             raise ValueError(f"Expense not found: {operation.server_id}")
-        
-        expense.title = operation.title
-        expense.amount = operation.amount
-        expense.year = operation.year
-        expense.month = operation.month
-        expense.date = operation.date
-        expense.updated_at = datetime.utcnow()
-        
+    
+    def _update_expense(self, operation: UpdateExpenseBatchRequest) -> Optional[EntityMapping]:
+        self._write_expense(operation, {
+            "title": operation.title,
+            "amount": operation.amount,
+            "year": operation.year,
+            "month": operation.month,
+            "date": operation.date,
+            "updated_at": datetime.utcnow(),
+        })
         return None  # No new mapping needed for updates
     
     def _delete_expense(self, operation: DeleteExpenseBatchRequest) -> Optional[EntityMapping]:
-        expense = self.db.query(Expense).filter(Expense.id == operation.server_id).first()
-        if not expense:
-            raise ValueError(f"Expense not found: {operation.server_id}")
-        
-        expense.deleted_at = datetime.utcnow()
+        self._write_expense(operation, {"deleted_at": datetime.utcnow()})
         return None
     
     # Tag operations
@@ -420,24 +642,17 @@ class AtomicSyncService:
         )
     
     def _update_tag(self, operation: UpdateTagBatchRequest) -> Optional[EntityMapping]:
-        tag = self.db.query(Tag).filter(Tag.id == operation.server_id).first()
-        if not tag:
-            raise ValueError(f"Tag not found: {operation.server_id}")
-        
-        tag.tag = operation.name  # Fixed: use 'tag' field, not 'name'
-        tag.monthly_amount = operation.monthly_amount
-        tag.current_month = operation.current_month
-        tag.current_year = operation.current_year
-        tag.updated_at = datetime.utcnow()
-        
+        self._write(Tag, "Tag", operation, {
+            "tag": operation.name,  # Fixed: use 'tag' field, not 'name'
+            "monthly_amount": operation.monthly_amount,
+            "current_month": operation.current_month,
+            "current_year": operation.current_year,
+            "updated_at": datetime.utcnow(),
+        })
         return None
     
     def _delete_tag(self, operation: DeleteTagBatchRequest) -> Optional[EntityMapping]:
-        tag = self.db.query(Tag).filter(Tag.id == operation.server_id).first()
-        if not tag:
-            raise ValueError(f"Tag not found: {operation.server_id}")
-        
-        tag.deleted_at = datetime.utcnow()
+        self._write(Tag, "Tag", operation, {"deleted_at": datetime.utcnow()})
         return None
     
     # ExpenseTag operations
@@ -448,7 +663,7 @@ class AtomicSyncService:
         if existing_id:
             # Verify the entity actually exists
             existing_expense_tag = self.db.query(ExpenseTagsCrossRef).filter(ExpenseTagsCrossRef.id == existing_id).first()
-            if existing_expense_tag:
+            if existing_expense_tag or ArchiveService(self.db).restore_expense_of_link(existing_id):
                 logger.info(f"[CREATE_EXPENSE_TAG] ExpenseTag already exists for client_id {operation.client_id}, returning existing server_id {existing_id}")
                 return EntityMapping(
                     entity_type="expense_tag",
@@ -471,6 +686,9 @@ class AtomicSyncService:
         logger.debug(f"[CREATE_EXPENSE_TAG] Resolving tag_id={operation.tag_id}")
         tag_id = self._resolve_id(operation.tag_id, "tag")
         logger.debug(f"[CREATE_EXPENSE_TAG] Resolved tag_id to {tag_id}")
+        # Identity-map hit when the expense was created in this group
+        if self.db.get(Expense, expense_id) is None:
+            ArchiveService(self.db).restore_expense(expense_id)
         
         logger.debug(f"[CREATE_EXPENSE_TAG] Creating expense_tag with expense_id={expense_id}, tag_id={tag_id}")
         new_expense_tag = ExpenseTagsCrossRef(
@@ -495,13 +713,11 @@ class AtomicSyncService:
         )
     
     def _delete_expense_tag(self, operation: DeleteExpenseTagBatchRequest) -> Optional[EntityMapping]:
-        expense_tag = self.db.query(ExpenseTagsCrossRef).filter(
-            ExpenseTagsCrossRef.id == operation.server_id
-        ).first()
-        if not expense_tag:
+        deleted = delete_versioned(self.db, ExpenseTagsCrossRef, operation.server_id)
+        if not deleted and ArchiveService(self.db).restore_expense_of_link(operation.server_id):
+            deleted = delete_versioned(self.db, ExpenseTagsCrossRef, operation.server_id)
+        if not deleted:
             raise ValueError(f"ExpenseTag not found: {operation.server_id}")
-        
-        self.db.delete(expense_tag)
         return None
     
     # Target operations
@@ -541,22 +757,15 @@ class AtomicSyncService:
         )
     
     def _update_target(self, operation: UpdateTargetBatchRequest) -> Optional[EntityMapping]:
-        target = self.db.query(Target).filter(Target.id == operation.server_id).first()
-        if not target:
-            raise ValueError(f"Target not found: {operation.server_id}")
-        
-        target.amount = operation.amount
-        target.spent = operation.spent
-        target.updated_at = datetime.utcnow()
-        
+        self._write(Target, "Target", operation, {
+            "amount": operation.amount,
+            "spent": operation.spent,
+            "updated_at": datetime.utcnow(),
+        })
         return None
     
     def _delete_target(self, operation: DeleteTargetBatchRequest) -> Optional[EntityMapping]:
-        target = self.db.query(Target).filter(Target.id == operation.server_id).first()
-        if not target:
-            raise ValueError(f"Target not found: {operation.server_id}")
-        
-        target.deleted_at = datetime.utcnow()
+        self._write(Target, "Target", operation, {"deleted_at": datetime.utcnow()})
         return None
     
     # GraphEdge operations
@@ -595,21 +804,15 @@ class AtomicSyncService:
         )
     
     def _update_graph_edge(self, operation: UpdateGraphEdgeBatchRequest) -> Optional[EntityMapping]:
-        edge = self.db.query(GraphEdge).filter(GraphEdge.id == operation.server_id).first()
-        if not edge:
-            raise ValueError(f"GraphEdge not found: {operation.server_id}")
-        
-        edge.weight = operation.weight
-        edge.updated_at = datetime.utcnow()
-        
+        self._write(GraphEdge, "GraphEdge", operation, {
+            "weight": operation.weight,
+            "updated_at": datetime.utcnow(),
+        })
         return None
     
     def _delete_graph_edge(self, operation: DeleteGraphEdgeBatchRequest) -> Optional[EntityMapping]:
-        edge = self.db.query(GraphEdge).filter(GraphEdge.id == operation.server_id).first()
-        if not edge:
+        if not delete_versioned(self.db, GraphEdge, operation.server_id, operation.expected_version):
             raise ValueError(f"GraphEdge not found: {operation.server_id}")
-        
-        self.db.delete(edge)
         return None
     
     # Wishlist operations
@@ -649,23 +852,16 @@ class AtomicSyncService:
         )
     
     def _update_wishlist(self, operation: UpdateWishlistBatchRequest) -> Optional[EntityMapping]:
-        wishlist = self.db.query(WishlistItem).filter(WishlistItem.id == operation.server_id).first()
-        if not wishlist:
-            raise ValueError(f"Wishlist not found: {operation.server_id}")
-        
-        wishlist.name = operation.name
-        wishlist.min_price = operation.min_price
-        wishlist.max_price = operation.max_price
-        wishlist.updated_at = datetime.utcnow()
-        
+        self._write(WishlistItem, "Wishlist", operation, {
+            "name": operation.name,
+            "min_price": operation.min_price,
+            "max_price": operation.max_price,
+            "updated_at": datetime.utcnow(),
+        })
         return None
     
     def _delete_wishlist(self, operation: DeleteWishlistBatchRequest) -> Optional[EntityMapping]:
-        wishlist = self.db.query(WishlistItem).filter(WishlistItem.id == operation.server_id).first()
-        if not wishlist:
-            raise ValueError(f"Wishlist not found: {operation.server_id}")
-        
-        wishlist.deleted_at = datetime.utcnow()
+        self._write(WishlistItem, "Wishlist", operation, {"deleted_at": datetime.utcnow()})
         return None
     
     # WishlistTag operations
@@ -703,13 +899,8 @@ class AtomicSyncService:
         )
     
     def _delete_wishlist_tag(self, operation: DeleteWishlistTagBatchRequest) -> Optional[EntityMapping]:
-        wishlist_tag = self.db.query(WishlistTagsCrossRef).filter(
-            WishlistTagsCrossRef.id == operation.server_id
-        ).first()
-        if not wishlist_tag:
+        if not delete_versioned(self.db, WishlistTagsCrossRef, operation.server_id):
             raise ValueError(f"WishlistTag not found: {operation.server_id}")
-        
-        self.db.delete(wishlist_tag)
         return None
     
     def _resolve_id(self, client_id: str, entity_type: str) -> str:
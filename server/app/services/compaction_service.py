@@ -0,0 +1,237 @@
+"""
+Compaction Service
+Hard-deletes tombstones (soft-deleted rows) once they are past the purge
+horizon, together with the rows that depend on them (cross-refs, targets,
+graph edges, entity mappings), and drops entity mappings whose entity no
+longer exists. Works in small batches, each in its own short transaction,
+so no lock is held for long.
+
+Horizon: deleted_at older than TOMBSTONE_RETENTION_DAYS and, unless
+COMPACTION_RESPECT_DEVICES is off, older than the lowest watermark
+acknowledged by an active device (see device_sync_service.py).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from sqlalchemy import and_, delete, exists, or_, select, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import (
+    Expense, Tag, Target, ExpenseTagsCrossRef,
+    GraphEdge, WishlistItem, WishlistTagsCrossRef,
+    EntityMapping, ArchivedExpense, ArchivedExpenseTag
+)
+from .archive_service import ArchiveService
+from .device_sync_service import DeviceSyncService
+from .partition_service import ensure_expense_partitions
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_try_advisory_lock: one compaction at a time across workers
+_ADVISORY_LOCK_KEY = 0x46484350
+
+# Tombstoned model -> dependents as (model, referencing columns) deleted with it
+_CASCADES: List[Tuple[Any, List[Tuple[Any, Tuple[Any, ...]]]]] = [
+    (Expense, [(ExpenseTagsCrossRef, (ExpenseTagsCrossRef.expense_id,))]),
+    (WishlistTagsCrossRef, []),
+    (WishlistItem, [(WishlistTagsCrossRef, (WishlistTagsCrossRef.wishlist_id,))]),
+    (Target, []),
+    (Tag, [
+        (ExpenseTagsCrossRef, (ExpenseTagsCrossRef.tag_id,)),
+        (Target, (Target.tag_id,)),
+        (GraphEdge, (GraphEdge.from_tag_id, GraphEdge.to_tag_id)),
+        (WishlistTagsCrossRef, (WishlistTagsCrossRef.tag_id,)),
+    ]),
+]
+
+# entity_mappings.entity_type -> models its server_id may point at
+_MAPPED_MODELS = {
+    "expense": (Expense, ArchivedExpense),
+    "tag": (Tag,),
+    "target": (Target,),
+    "expense_tag": (ExpenseTagsCrossRef, ArchivedExpenseTag),
+    "graph_edge": (GraphEdge,),
+    "wishlist": (WishlistItem,),
+    "wishlist_tag": (WishlistTagsCrossRef,),
+}
+
+
+class CompactionService:
+    def __init__(self, db: Session, batch_size: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size or settings.compaction_batch_size
+        self.deleted: Dict[str, int] = {}
+        self.batches = 0
+        self._lock_connection = None
+
+    def purge_horizon(self) -> datetime:
+        """Tombstones deleted before this (UTC) are purged."""
+        horizon = datetime.utcnow() - timedelta(days=settings.tombstone_retention_days)
+        if settings.compaction_respect_devices:
+            watermark = DeviceSyncService(self.db).min_active_watermark()
+            if watermark is not None:
+                horizon = min(horizon, datetime.utcfromtimestamp(watermark / 1000.0))
+        return horizon
+
+    def run(self, horizon: Optional[datetime] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Purge everything past the horizon; returns what was reclaimed per table.
+        With dry_run nothing is deleted and the counts are an upper bound.
+        """
+        start = time.time()
+        if not self._acquire_lock():
+            logger.info("[COMPACTION] Another worker is compacting, skipping")
+            return {"skipped": True}
+
+        try:
+            horizon = horizon or self.purge_horizon()
+            logger.info(f"[COMPACTION] Purging tombstones deleted before {horizon.isoformat()} (dry_run={dry_run})")
+
+            for model, cascades in _CASCADES:
+                self._purge_tombstones(model, cascades, horizon, dry_run)
+            self._purge_orphaned_mappings(dry_run)
+        finally:
+            self._release_lock()
+
+        report = {
+            "horizon": horizon.isoformat(),
+            "dry_run": dry_run,
+            "deleted": {table: count for table, count in self.deleted.items() if count},
+            "batches": self.batches,
+            "duration_ms": round((time.time() - start) * 1000, 2),
+        }
+        logger.info(f"[COMPACTION] Reclaimed {sum(report['deleted'].values())} rows: {report['deleted']} "
+                    f"in {self.batches} batches ({report['duration_ms']}ms)")
+        return report
+
+    def _purge_tombstones(self, model, cascades, horizon: datetime, dry_run: bool) -> None:
+        condition = and_(model.deleted_at.isnot(None), model.deleted_at < horizon)
+        if dry_run:
+            self._count(model, condition)
+            for child, columns in cascades:
+                tombstones = select(model.id).where(condition)
+                self._count(child, or_(*(column.in_(tombstones) for column in columns)))
+            return
+
+        def purge_batch(ids: List[str]) -> None:
+            for child, columns in cascades:
+                child_ids = self.db.scalars(
+                    select(child.id).where(or_(*(column.in_(ids) for column in columns)))
+                ).all()
+                self._delete_ids(child, child_ids)
+            self._delete_ids(model, ids)
+
+        self._in_batches(select(model.id).where(condition), purge_batch)
+
+    def _purge_orphaned_mappings(self, dry_run: bool) -> None:
+        """Mappings left behind by hard deletes or rolled-back creates."""
+        for entity_type, models in _MAPPED_MODELS.items():
+            condition = and_(
+                EntityMapping.entity_type == entity_type,
+                *(~exists().where(model.id == EntityMapping.server_id) for model in models)
+            )
+            if dry_run:
+                self._count(EntityMapping, condition)
+                continue
+
+            def purge_batch(client_ids: List[str], entity_type=entity_type) -> None:
+                deleted = self.db.execute(delete(EntityMapping).where(
+                    EntityMapping.entity_type == entity_type,
+                    EntityMapping.client_id.in_(client_ids)
+                )).rowcount
+                self._add(EntityMapping, deleted)
+
+            self._in_batches(select(EntityMapping.client_id).where(condition), purge_batch)
+
+    def _in_batches(self, id_query, purge_batch: Callable[[List[str]], None]) -> None:
+        """Run purge_batch over the ids matched by id_query, one commit per batch."""
+        while True:
+            ids = self.db.scalars(id_query.limit(self.batch_size)).all()
+            if not ids:
+                break
+            try:
+                purge_batch(ids)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                raise
+            self.batches += 1
+            if len(ids) < self.batch_size:
+                break
+
+    def _delete_ids(self, model, ids: List[str]) -> None:
+        if not ids:
+            return
+        mappings = self.db.execute(delete(EntityMapping).where(EntityMapping.server_id.in_(ids))).rowcount
+        self._add(EntityMapping, mappings)
+        deleted = self.db.execute(delete(model).where(model.id.in_(ids))).rowcount
+        self._add(model, deleted)
+
+    def _count(self, model, condition) -> None:
+        count = self.db.query(model).filter(condition).count()
+        self._add(model, count)
+
+    def _add(self, model, count: int) -> None:
+        table = model.__tablename__
+        self.deleted[table] = self.deleted.get(table, 0) + max(count, 0)
+
+    def _acquire_lock(self) -> bool:
+        engine = self.db.get_bind()
+        if engine.dialect.name != "postgresql":
+            return True
+        # Session-level lock on a connection of its own: the batches commit
+        # and hand their connection back to the pool in between
+        self._lock_connection = engine.connect()
+        locked = self._lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            self._release_lock()
+        return bool(locked)
+
+    def _release_lock(self) -> None:
+        connection, self._lock_connection = self._lock_connection, None
+        if connection is not None:
+            # Pooled connections outlive close(), so unlock explicitly
+            connection.execute(text("SELECT pg_advisory_unlock_all()"))
+            connection.close()
+
+
+def compact(session_factory: Callable[[], Session], dry_run: bool = False) -> Dict[str, Any]:
+    """One compaction run on a fresh session."""
+    db = session_factory()
+    try:
+        return CompactionService(db).run(dry_run=dry_run)
+    finally:
+        db.close()
+
+
+def archive(session_factory: Callable[[], Session]) -> Optional[Dict[str, Any]]:
+    """One archiving run on a fresh session, if ARCHIVE_AFTER_DAYS is set."""
+    db = session_factory()
+    try:
+        service = ArchiveService(db)
+        horizon = service.archive_horizon()
+        return service.archive(horizon) if horizon else None
+    finally:
+        db.close()
+
+
+async def compaction_loop(session_factory: Callable[[], Session]) -> None:
+    """
+    Run compaction, archiving and partition upkeep every
+    COMPACTION_INTERVAL_HOURS, off the event loop.
+    """
+    interval = settings.compaction_interval_hours * 3600
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        for job in (compact, archive, ensure_expense_partitions):
+            try:
+                await loop.run_in_executor(None, job, session_factory)
+            except Exception as e:
+                logger.error(f"[COMPACTION] Scheduled {job.__name__} failed: {e}", exc_info=True)
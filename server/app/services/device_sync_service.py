@@ -0,0 +1,91 @@
+"""
+Device Sync Service
+Tracks each device's sync watermark in device_sync_state: the server
+timestamp (epoch ms) up to which it has acknowledged pulled changes, and
+when it was last seen. Pulls without `since` resume from the stored
+watermark, /sync/devices reports how far behind every device is, and
+min_active_watermark() is the horizon below which tombstones have reached
+every active device.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+import logging
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..change_tracking import ignore_tables
+from ..config import settings
+from ..models import DeviceSyncState
+
+logger = logging.getLogger(__name__)
+
+# Watermark/heartbeat writes are bookkeeping, not data changes: they must not
+# invalidate ETags or wake long-polling clients
+ignore_tables(DeviceSyncState.__tablename__)
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class DeviceSyncService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_state(self, device_id: str) -> Optional[DeviceSyncState]:
+        return self.db.get(DeviceSyncState, device_id)
+
+    def get_watermark(self, device_id: str) -> int:
+        """Last acknowledged watermark of the device, 0 if it never synced."""
+        state = self.get_state(device_id)
+        return state.acknowledged_until if state else 0
+
+    def record(self, device_id: str, watermark: Optional[int] = None) -> DeviceSyncState:
+        """
+        Mark the device as seen and, if given, advance its acknowledged
+        watermark (never moves backwards). Skips the write when nothing moved
+        and the device was seen recently. Does not commit.
+        """
+        now = datetime.utcnow()
+        state = self.get_state(device_id)
+        if state is None:
+            state = DeviceSyncState(device_id=device_id, acknowledged_until=watermark or 0, last_seen_at=now)
+            self.db.add(state)
+            logger.info(f"[DEVICE] First contact from device {device_id}")
+            return state
+
+        if watermark is not None and watermark > state.acknowledged_until:
+            state.acknowledged_until = watermark
+            state.last_seen_at = now
+        elif _naive(state.last_seen_at) < now - timedelta(seconds=settings.device_seen_resolution):
+            state.last_seen_at = now
+        return state
+
+    def list_states(self) -> List[DeviceSyncState]:
+        return self.db.query(DeviceSyncState).order_by(DeviceSyncState.acknowledged_until).all()
+
+    def is_active(self, state: DeviceSyncState) -> bool:
+        return _naive(state.last_seen_at) >= _active_cutoff()
+
+    def min_active_watermark(self) -> Optional[int]:
+        """
+        Lowest watermark acknowledged by the devices seen within
+        DEVICE_ACTIVE_DAYS, or None if there are none. Changes older than
+        this have reached every active device. Devices that never
+        acknowledged a pull (push-only clients) are not counted.
+        """
+        return self.db.query(func.min(DeviceSyncState.acknowledged_until)).filter(
+            DeviceSyncState.last_seen_at >= _active_cutoff(),
+            DeviceSyncState.acknowledged_until > 0
+        ).scalar()
+
+
+def _active_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.device_active_days)
+
+
+def _naive(value: datetime) -> datetime:
+    # SQLite returns naive values, PostgreSQL aware ones (all stored as UTC)
+    return value.replace(tzinfo=None) if value.tzinfo else value
@@ -0,0 +1,163 @@
+"""
+Idempotency Service
+Request-level idempotency for /sync/atomic. The response of a fully
+successful request is stored under its idempotency key (the Idempotency-Key
+header, or device_id + client timestamp) in the same transaction as its
+writes; an exact retry gets the stored response back without touching any
+entity table. An in-memory LRU sits in front of the table.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import exc
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import IdempotencyRecord
+from ..schemas_atomic import AtomicSyncRequest
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL = 600  # Seconds between purges of expired rows
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request body."""
+
+
+class _ResponseCache:
+    """Thread-safe LRU of key -> (request hash, response, expiry timestamp)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: str, request_hash: str, response: Dict[str, Any], expires_at: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (request_hash, response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = _ResponseCache(settings.idempotency_cache_size)
+_last_purge = 0.0
+
+
+def idempotency_key(http_request: Request, request: AtomicSyncRequest) -> Tuple[Optional[str], bool]:
+    """
+    (key, explicit): the Idempotency-Key header if sent, else device_id +
+    client timestamp, else (None, False).
+    """
+    key = http_request.headers.get(IDEMPOTENCY_HEADER)
+    if key:
+        return key[:MAX_KEY_LENGTH], True
+    if request.device_id:
+        return f"{request.device_id}:{request.client_timestamp}"[:MAX_KEY_LENGTH], False
+    return None, False
+
+
+def request_fingerprint(request: AtomicSyncRequest) -> str:
+    """Hash of the parsed request, so JSON and MessagePack retries match."""
+    return hashlib.sha256(request.model_dump_json(by_alias=True).encode("utf-8")).hexdigest()
+
+
+class IdempotencyService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lookup(self, key: str, request_hash: str, explicit: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Stored response for `key`, or None if there is none (or it expired).
+        Raises IdempotencyConflict if an explicit key was used for another
+        request; a derived key that matches a different body is just a miss.
+        """
+        cached = response_cache.get(key)
+        if cached is None:
+            record = self.db.query(IdempotencyRecord).filter(
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.expires_at > datetime.utcnow()
+            ).first()
+            if record is None:
+                return None
+            cached = (record.request_hash, json.loads(record.response))
+            response_cache.put(key, record.request_hash, cached[1], _timestamp(record.expires_at))
+
+        stored_hash, response = cached
+        if stored_hash != request_hash:
+            if not explicit:
+                return None
+            raise IdempotencyConflict(f"Idempotency key {key} was already used for a different request")
+        logger.info(f"[IDEMPOTENCY] Replaying stored response for key {key}")
+        return response
+
+    def store(self, key: str, request_hash: str, response: Dict[str, Any]) -> None:
+        """
+        Add the response to the current transaction; it becomes visible with
+        the request's own writes. Call remember() after the commit.
+        """
+        self._purge_expired()
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl_seconds)
+        savepoint = self.db.begin_nested()
+        try:
+            self.db.merge(IdempotencyRecord(
+                key=key,
+                request_hash=request_hash,
+                response=json.dumps(response),
+                expires_at=expires_at
+            ))
+            self.db.flush()
+            savepoint.commit()
+        except exc.IntegrityError:
+            # A concurrent retry stored the same key first; its response wins
+            savepoint.rollback()
+            logger.info(f"[IDEMPOTENCY] Key {key} stored concurrently, keeping existing response")
+
+    def remember(self, key: str, request_hash: str, response: Dict[str, Any]) -> None:
+        """Put a committed response in the in-memory cache."""
+        response_cache.put(key, request_hash, response, time.time() + settings.idempotency_ttl_seconds)
+
+    def _purge_expired(self) -> None:
+        global _last_purge
+        now = time.time()
+        if now - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = now
+        deleted = self.db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        if deleted:
+            logger.info(f"[IDEMPOTENCY] Purged {deleted} expired keys")
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return value.timestamp()
@@ -0,0 +1,149 @@
+"""
+In-memory indexes over database tables.
+
+A MemoryIndex is built from the database once and then kept current from the
+change tracker: a commit touching one of its `tables` wakes a background
+thread, which waits MEMORY_INDEX_REFRESH_DELAY seconds to coalesce a burst of
+writes and then calls `refresh()` with the tables changed meanwhile. Reads
+only look at the current in-memory state, never at the database.
+
+Every MEMORY_INDEX_REBUILD_SECONDS the index is rebuilt from scratch, which
+also picks up writes this process was never told about (other workers
+without CHANGE_NOTIFIER_BACKEND=postgres, manual SQL).
+"""
+from datetime import datetime, timezone
+from typing import Callable, FrozenSet, List, Optional, Set
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..change_tracking import change_tracker
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def normalize(value: str) -> str:
+    """Case- and accent-insensitive form of a name, single-spaced."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+def tokenize(value: str) -> List[str]:
+    """Normalized word tokens of a title or name."""
+    return _TOKEN.findall(normalize(value))
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class MemoryIndex:
+    """Base class: subclasses set `name` and `tables` and implement build() and refresh()."""
+
+    name = "memory-index"
+    tables: FrozenSet[str] = frozenset()
+
+    def __init__(self):
+        self.built_at: Optional[float] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._build_lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Subclass interface
+
+    def build(self, db: Session) -> None:
+        """Load the whole index from the database."""
+        raise NotImplementedError
+
+    def refresh(self, db: Session, tables: Set[str]) -> None:
+        """Apply changes to `tables` since the last build/refresh."""
+        self.build(db)
+
+    # Lifecycle
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """Build in the background and follow committed changes."""
+        self._session_factory = session_factory
+        self._stop.clear()
+        change_tracker.add_listener(self._on_change)
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        change_tracker.remove_listener(self._on_change)
+        self._stop.set()
+        self._wake.set()
+
+    def ensure_built(self, session_factory: Optional[Callable[[], Session]] = None) -> None:
+        """Build synchronously if no build has finished yet (first request racing startup)."""
+        if self.built_at is not None:
+            return
+        factory = session_factory or self._session_factory
+        if factory is None:
+            from ..database import SessionLocal
+            factory = SessionLocal
+        self._apply(factory, None, if_unbuilt=True)
+
+    def _on_change(self, tables: Set[str]) -> None:
+        touched = tables & self.tables
+        if touched:
+            with self._pending_lock:
+                self._pending |= touched
+            self._wake.set()
+
+    def _run(self) -> None:
+        self._apply(self._session_factory, None)
+        last_build = time.time()
+        while not self._stop.is_set():
+            # A steady stream of writes keeps waking the thread, so the rebuild is due
+            # by the clock rather than after a quiet spell of rebuild_seconds
+            rebuild_seconds = settings.memory_index_rebuild_seconds
+            timeout = max(0.0, last_build + rebuild_seconds - time.time()) if rebuild_seconds else None
+            woke = self._wake.wait(timeout=timeout)
+            if self._stop.is_set():
+                break
+            if woke:
+                self._wake.clear()
+                self._stop.wait(settings.memory_index_refresh_delay)
+                with self._pending_lock:
+                    tables, self._pending = self._pending, set()
+            if rebuild_seconds and time.time() - last_build >= rebuild_seconds:
+                self._apply(self._session_factory, None)
+                last_build = time.time()
+            elif woke:
+                self._apply(self._session_factory, tables)
+
+    def _apply(self, session_factory: Callable[[], Session], tables: Optional[Set[str]],
+               if_unbuilt: bool = False) -> None:
+        """Full build when `tables` is None, else an incremental refresh."""
+        start = time.time()
+        with self._build_lock:
+            if if_unbuilt and self.built_at is not None:
+                return
+            db = session_factory()
+            try:
+                if tables is None or self.built_at is None:
+                    self.build(db)
+                    self.built_at = time.time()
+                    logger.info(f"[{self.name.upper()}] Built in {(time.time() - start) * 1000:.1f}ms")
+                elif tables:
+                    self.refresh(db, tables)
+                    logger.debug(f"[{self.name.upper()}] Refreshed {sorted(tables)} in {(time.time() - start) * 1000:.1f}ms")
+            except Exception as e:
+                logger.error(f"[{self.name.upper()}] Refresh failed: {e}", exc_info=True)
+            finally:
+                db.close()
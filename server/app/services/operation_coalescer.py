@@ -0,0 +1,164 @@
+"""
+Operation Coalescer
+Folds redundant operation chains on the same entity inside one atomic group
+before they are replayed, so an offline queue like create -> update ->
+update -> delete costs one write instead of four SELECT + write pairs.
+
+Rules, for an operation directly following one on the same entity:
+- create -> update:   the update's fields are merged into the create
+- update -> update:   the later fields are merged into the earlier update
+                      (keeping its expected_version)
+- update -> delete:   the update is dropped, its expected_version moves to
+                      the delete
+- create -> delete:   becomes a single tombstone create (row inserted already
+                      soft-deleted, mapping still recorded) for soft-deletable
+                      entities, unless another operation in the group refers
+                      to the created entity
+
+Only adjacent operations fold. Merging across an operation on another entity
+would move a write before or after it, which changes the outcome under unique
+constraints: T1 -> "tmp", T2 -> "a", T1 -> "b" swaps two tag names, but either
+merged order of T1's renames collides with T2.
+
+Updates and deletes address entities by server ID; an entity created earlier
+in the group is matched when the client uses its client ID as the server ID,
+as AtomicSyncService resolves it on replay.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CREATE = "create"
+UPDATE = "update"
+DELETE = "delete"
+
+# Operation `type` -> (entity type, kind); subclasses (coded MessagePack
+# operations) carry the same literal
+_OPERATION_KINDS: Dict[str, Tuple[str, str]] = {
+    "create_expense": ("expense", CREATE),
+    "update_expense": ("expense", UPDATE),
+    "delete_expense": ("expense", DELETE),
+    "create_tag": ("tag", CREATE),
+    "update_tag": ("tag", UPDATE),
+    "delete_tag": ("tag", DELETE),
+    "create_target": ("target", CREATE),
+    "update_target": ("target", UPDATE),
+    "delete_target": ("target", DELETE),
+    "create_expense_tag": ("expense_tag", CREATE),
+    "delete_expense_tag": ("expense_tag", DELETE),
+    "create_graph_edge": ("graph_edge", CREATE),
+    "update_graph_edge": ("graph_edge", UPDATE),
+    "delete_graph_edge": ("graph_edge", DELETE),
+    "create_wishlist": ("wishlist", CREATE),
+    "update_wishlist": ("wishlist", UPDATE),
+    "delete_wishlist": ("wishlist", DELETE),
+    "create_wishlist_tag": ("wishlist_tag", CREATE),
+    "delete_wishlist_tag": ("wishlist_tag", DELETE),
+}
+
+# Fields an update carries, i.e. what it overwrites on a create or earlier update
+_UPDATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "expense": ("title", "amount", "year", "month", "date"),
+    "tag": ("name", "monthly_amount", "current_month", "current_year"),
+    "target": ("amount", "spent"),
+    "graph_edge": ("weight",),
+    "wishlist": ("name", "min_price", "max_price"),
+}
+
+# Entities deleted by setting deleted_at (others are hard-deleted and not folded)
+_SOFT_DELETED = {"expense", "tag", "target", "wishlist"}
+
+# Fields through which an operation refers to another entity
+_REFERENCE_FIELDS = ("expense_id", "tag_id", "from_tag_id", "to_tag_id", "wishlist_id")
+
+
+class TombstoneCreate:
+    """A create immediately followed by a delete: insert the row already deleted."""
+
+    def __init__(self, operation: Any):
+        self.operation = operation
+
+    def __repr__(self):
+        return f"<TombstoneCreate({type(self.operation).__name__}, client_id={self.operation.client_id})>"
+
+
+def _referenced_ids(operations: List[Any]) -> Set[str]:
+    ids = set()
+    for op in operations:
+        for field in _REFERENCE_FIELDS:
+            value = getattr(op, field, None)
+            if value:
+                ids.add(value)
+    return ids
+
+
+def _merge(target: Any, update: Any, entity_type: str) -> Any:
+    return target.model_copy(update={field: getattr(update, field) for field in _UPDATE_FIELDS[entity_type]})
+
+
+def _kind_of(operation: Any) -> Optional[Tuple[str, str]]:
+    return _OPERATION_KINDS.get(getattr(operation, "type", None))
+
+
+def entity_type_of(operation: Any) -> Optional[str]:
+    """Entity type ("expense", "tag", ...) an operation writes, or None."""
+    kind_info = _kind_of(operation)
+    return kind_info[0] if kind_info else None
+
+
+def coalesce_operations(operations: List[Any]) -> Tuple[List[Any], int]:
+    """
+    Fold redundant operations of one group.
+    Returns (operations to replay, number of operations folded away).
+    """
+    referenced = _referenced_ids(operations)
+    output: List[Any] = []
+    # (entity type, id) of output[-1] while the next operation may fold into it
+    last_key: Optional[Tuple[str, str]] = None
+    folded = 0
+
+    for op in operations:
+        kind_info = _kind_of(op)
+        if kind_info is None:
+            output.append(op)
+            last_key = None
+            continue
+        entity_type, kind = kind_info
+
+        if kind == CREATE:
+            output.append(op)
+            last_key = (entity_type, op.client_id)
+            continue
+
+        key = (entity_type, op.server_id)
+        if not op.server_id or key != last_key:
+            output.append(op)
+            last_key = key if kind == UPDATE else None
+            continue
+
+        previous = output[-1]
+        previous_kind = _kind_of(previous)[1]
+
+        if kind == UPDATE:
+            output[-1] = _merge(previous, op, entity_type)
+            folded += 1
+            continue
+
+        last_key = None
+        if previous_kind == UPDATE:
+            # update -> delete: the delete wins, checked against the version the update expected
+            if previous.expected_version is not None:
+                op = op.model_copy(update={"expected_version": previous.expected_version})
+            output[-1] = op
+            folded += 1
+        elif entity_type in _SOFT_DELETED and previous.client_id not in referenced:
+            # create -> delete: one tombstone insert, mapping still recorded
+            output[-1] = TombstoneCreate(previous)
+            folded += 1
+        else:
+            output.append(op)
+
+    if folded:
+        logger.debug(f"[COALESCE] Folded {folded} of {len(operations)} operations")
+    return output, folded
@@ -0,0 +1,83 @@
+"""
+Partition Service
+Maintenance for the optional year-partitioned `expenses` table
+(migrations/optional/001_partition_expenses_by_year.sql): keeps partitions
+for the coming years in place, lists them, and detaches old years.
+Everything is a no-op unless the database is PostgreSQL and the table has
+actually been partitioned.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "expenses"
+
+
+class PartitionService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def is_partitioned(self) -> bool:
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+        return bool(self.db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)"
+        ), {"table": PARENT_TABLE}).scalar())
+
+    def ensure_partitions(self, years_ahead: int = None) -> List[str]:
+        """Make sure this year's and the next `years_ahead` years' partitions exist."""
+        if not self.is_partitioned():
+            return []
+        years_ahead = settings.expense_partition_years_ahead if years_ahead is None else years_ahead
+        current = datetime.utcnow().year
+        created = [
+            self.db.execute(text("SELECT ensure_expense_partition(:year)"), {"year": year}).scalar()
+            for year in range(current, current + years_ahead + 1)
+        ]
+        self.db.commit()
+        logger.info(f"[PARTITIONS] Ensured expense partitions: {created}")
+        return created
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        """Partitions of `expenses` with their bounds and estimated row counts."""
+        if not self.is_partitioned():
+            return []
+        rows = self.db.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::BIGINT "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table ORDER BY c.relname"
+        ), {"table": PARENT_TABLE}).all()
+        return [{"name": name, "bounds": bounds, "estimated_rows": max(estimate, 0)} for name, bounds, estimate in rows]
+
+    def detach_year(self, year: int) -> str:
+        """
+        Detach a year's partition. The rows stay in the standalone table
+        expenses_y<year> (drop or dump it separately); they disappear from
+        every query on `expenses`.
+        """
+        if not self.is_partitioned():
+            raise ValueError("expenses is not partitioned")
+        name = f"expenses_y{int(year)}"
+        self.db.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+        self.db.commit()
+        logger.info(f"[PARTITIONS] Detached {name}")
+        return name
+
+
+def ensure_expense_partitions(session_factory: Callable[[], Session]) -> List[str]:
+    """Create upcoming partitions on a fresh session (startup and maintenance loop)."""
+    db = session_factory()
+    try:
+        return PartitionService(db).ensure_partitions()
+    finally:
+        db.close()
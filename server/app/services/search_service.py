@@ -0,0 +1,145 @@
+"""
+Search Service
+Index-backed substring search over tag names and expense titles.
+
+PostgreSQL: pg_trgm GIN indexes; matches are `ILIKE '%q%'` or trigram
+similar (`%`), ranked by similarity(). Without the extension (it is a contrib
+module some installs lack) search falls back to an unindexed ILIKE.
+SQLite: FTS5 tables with the trigram tokenizer, kept in sync with the base
+tables by triggers and ranked by bm25. Queries shorter than three
+characters have no trigram and fall back to a plain LIKE.
+
+Archived expenses are not searched.
+"""
+from typing import Any, Callable, Dict, List
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# (table, searched column, extra columns returned)
+_TAGS = ("tags", "tag", ())
+_EXPENSES = ("expenses", "title", ("amount", "year", "month", "date"))
+
+# Whether pg_trgm is installed, per database URL
+_trigram_installed: Dict[str, bool] = {}
+
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(q: str) -> str:
+    return '"' + q.replace('"', '""') + '"'
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    # Index setup
+
+    def ensure_index(self) -> None:
+        """Create the search indexes if missing (idempotent)."""
+        if self.dialect == "postgresql":
+            self._ensure_trigram_indexes()
+        elif self.dialect == "sqlite":
+            for table, column, _ in (_TAGS, _EXPENSES):
+                self._ensure_fts_table(table, column)
+        self.db.commit()
+
+    def _ensure_trigram_indexes(self) -> None:
+        self.db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table, column, _ in (_TAGS, _EXPENSES):
+            self.db.execute(text(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{column}_trgm "
+                f"ON {table} USING gin ({column} gin_trgm_ops)"
+            ))
+        _trigram_installed[str(self.db.get_bind().url)] = True
+
+    def _has_trigram(self) -> bool:
+        url = str(self.db.get_bind().url)
+        if url not in _trigram_installed:
+            _trigram_installed[url] = self.db.execute(text(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )).scalar() is not None
+        return _trigram_installed[url]
+
+    def _ensure_fts_table(self, table: str, column: str) -> None:
+        fts = f"{table}_fts"
+        exists = self.db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {"name": fts}).scalar()
+        if exists:
+            return
+        self.db.execute(text(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5("
+            f"{column}, content='{table}', content_rowid='rowid', tokenize='trigram')"
+        ))
+        self.db.execute(text(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END"
+        ))
+        self.db.execute(text(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.rowid, old.{column}); END"
+        ))
+        self.db.execute(text(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.rowid, old.{column}); "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END"
+        ))
+        self.db.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        logger.info(f"[SEARCH] Built {fts}")
+
+    # Queries
+
+    def search_tags(self, q: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        rows = self._search(_TAGS, q, limit, offset)
+        return [{"id": row["id"], "name": row["tag"], "score": row["score"]} for row in rows]
+
+    def search_expenses(self, q: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        return self._search(_EXPENSES, q, limit, offset)
+
+    def _search(self, spec, q: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        table, column, extra = spec
+        columns = ", ".join(f"t.{c}" for c in ("id", column) + extra)
+        params = {"q": q, "pattern": _like_pattern(q), "limit": limit, "offset": offset}
+
+        if self.dialect == "postgresql" and self._has_trigram():
+            sql = (
+                f"SELECT {columns}, similarity(t.{column}, :q) AS score FROM {table} t "
+                f"WHERE t.deleted_at IS NULL AND (t.{column} ILIKE :pattern OR t.{column} % :q) "
+                f"ORDER BY score DESC, t.id LIMIT :limit OFFSET :offset"
+            )
+        elif self.dialect == "sqlite" and len(q) >= 3:
+            # bm25() is lower for better matches; negate it so higher is better everywhere
+            params["q"] = _fts_phrase(q)
+            sql = (
+                f"SELECT {columns}, -bm25({table}_fts) AS score FROM {table}_fts "
+                f"JOIN {table} t ON t.rowid = {table}_fts.rowid "
+                f"WHERE {table}_fts MATCH :q AND t.deleted_at IS NULL "
+                f"ORDER BY score DESC, t.id LIMIT :limit OFFSET :offset"
+            )
+        else:
+            like = "ILIKE" if self.dialect == "postgresql" else "LIKE"
+            sql = (
+                f"SELECT {columns}, 0.0 AS score FROM {table} t "
+                f"WHERE t.deleted_at IS NULL AND t.{column} {like} :pattern ESCAPE '\\' "
+                f"ORDER BY length(t.{column}), t.id LIMIT :limit OFFSET :offset"
+            )
+        # Raw SQL skips the GUID type: native uuid ids come back as uuid.UUID
+        return [{**row, "id": str(row["id"])} for row in self.db.execute(text(sql), params).mappings()]
+
+
+def ensure_search_index(session_factory: Callable[[], Session]) -> None:
+    """Create the search indexes on a fresh session (startup)."""
+    db = session_factory()
+    try:
+        SearchService(db).ensure_index()
+    finally:
+        db.close()
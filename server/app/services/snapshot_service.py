@@ -0,0 +1,194 @@
+"""
+Snapshot Service
+Precomputed bootstrap snapshots for devices syncing for the first time.
+
+Instead of having /sync/full read and serialize the whole dataset for every
+new device, the server keeps one artifact on disk: a gzip-compressed NDJSON
+file in the /sync/updated-data payload format, tagged with the watermark it
+covers. A new device downloads it from /sync/snapshot (resumable with Range
+requests; sent by nginx with sendfile when SNAPSHOT_ACCEL_REDIRECT_PREFIX is
+set), then pulls /sync/updated-data?since=<watermark> for the small delta.
+
+File layout, one JSON object per line:
+
+    {"type": "meta", "format": 1, "watermark": <ms>, "createdAt": <ms>}
+    {"type": "expenses", "data": {...ApiExpense...}}
+    ...
+    {"type": "end", "counts": {"expenses": <n>, ...}}
+
+The watermark is taken before the rows are read (like X-Sync-Watermark), so a
+write racing the build is at worst sent again in the delta. Rows are streamed
+from one read snapshot straight into the file; a finished file is renamed into
+place, so readers never see a partial one.
+"""
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import asyncio
+import gzip
+import logging
+import os
+import re
+import threading
+import time
+
+import orjson
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import begin_read_snapshot
+from ..models import Expense, Tag
+from ..sync_payloads import (
+    EXPENSE_SPEC, TAG_SPEC, TARGET_SPEC, EXPENSE_TAG_SPEC,
+    GRAPH_EDGE_SPEC, WISHLIST_SPEC, WISHLIST_TAG_SPEC,
+    ARCHIVED_EXPENSE_SPEC, ARCHIVED_EXPENSE_TAG_SPEC
+)
+from .device_sync_service import now_ms
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/gzip"
+
+# Rows fetched and written per round
+_CHUNK_ROWS = 2000
+# Finished snapshots kept: the previous one may still be downloading
+_KEEP = 2
+_FILE_PATTERN = re.compile(r"^snapshot-(\d+)\.ndjson\.gz$")
+
+# (spec, filters) of each entity list: /updated-data without the `since` bound
+# (archived expenses and links included)
+SNAPSHOT_PARTS = (
+    (EXPENSE_SPEC, (Expense.deleted_at.is_(None),)),
+    (ARCHIVED_EXPENSE_SPEC, ()),
+    (TAG_SPEC, (Tag.deleted_at.is_(None),)),
+    (TARGET_SPEC, ()),
+    (EXPENSE_TAG_SPEC, ()),
+    (ARCHIVED_EXPENSE_TAG_SPEC, ()),
+    (GRAPH_EDGE_SPEC, ()),
+    (WISHLIST_SPEC, ()),
+    (WISHLIST_TAG_SPEC, ()),
+)
+
+
+class Snapshot:
+    """A finished snapshot file."""
+
+    def __init__(self, path: Path, watermark: int):
+        self.path = path
+        self.watermark = watermark
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def etag(self) -> str:
+        return f'"snapshot-{self.watermark}"'
+
+    def age_seconds(self) -> float:
+        return time.time() - self.watermark / 1000
+
+
+class SnapshotService:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or settings.snapshot_dir)
+        # One build at a time per process; concurrent callers wait and reuse it
+        self._lock = threading.Lock()
+
+    def latest(self) -> Optional[Snapshot]:
+        """The newest finished snapshot, or None."""
+        if not self.directory.is_dir():
+            return None
+        best: Optional[Snapshot] = None
+        for path in self.directory.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if match and (best is None or int(match.group(1)) > best.watermark):
+                best = Snapshot(path, int(match.group(1)))
+        return best
+
+    def ensure(self, session_factory: Callable[[], Session], max_age_seconds: float) -> Snapshot:
+        """The latest snapshot, rebuilt first if missing or older than `max_age_seconds`."""
+        snapshot = self.latest()
+        if snapshot is not None and snapshot.age_seconds() <= max_age_seconds:
+            return snapshot
+        with self._lock:
+            # Another request may have finished a build while this one waited
+            snapshot = self.latest()
+            if snapshot is not None and snapshot.age_seconds() <= max_age_seconds:
+                return snapshot
+            return self._build(session_factory)
+
+    def build(self, session_factory: Callable[[], Session]) -> Snapshot:
+        """Write a new snapshot and drop old ones."""
+        with self._lock:
+            return self._build(session_factory)
+
+    def _build(self, session_factory: Callable[[], Session]) -> Snapshot:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        watermark = now_ms()
+        tmp_path = self.directory / f".snapshot-{watermark}.{os.getpid()}.tmp"
+        path = self.directory / f"snapshot-{watermark}.ndjson.gz"
+
+        db = session_factory()
+        try:
+            begin_read_snapshot(db)
+            with gzip.open(tmp_path, "wb", compresslevel=settings.snapshot_compression_level) as out:
+                out.write(orjson.dumps({
+                    "type": "meta", "format": FORMAT_VERSION,
+                    "watermark": watermark, "createdAt": now_ms()
+                }) + b"\n")
+                counts = self._write_rows(db, out)
+                out.write(orjson.dumps({"type": "end", "counts": counts}) + b"\n")
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        finally:
+            db.close()
+
+        self._prune()
+        logger.info(
+            f"[SNAPSHOT] Built {path.name}: {sum(counts.values())} rows, "
+            f"{path.stat().st_size} bytes in {time.perf_counter() - started:.1f}s"
+        )
+        return Snapshot(path, watermark)
+
+    def _write_rows(self, db: Session, out) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for spec, filters in SNAPSHOT_PARTS:
+            stmt = spec.select().where(*filters).execution_options(yield_per=_CHUNK_ROWS)
+            count = 0
+            prefix = b'{"type":"' + spec.response_key.encode() + b'","data":'
+            for rows in db.execute(stmt).partitions():
+                out.write(b"".join(prefix + orjson.dumps(item) + b"}\n" for item in spec.serialize(rows)))
+                count += len(rows)
+            counts[spec.response_key] = counts.get(spec.response_key, 0) + count
+        return counts
+
+    def _prune(self) -> None:
+        snapshots = sorted(
+            (int(match.group(1)), path)
+            for path in self.directory.iterdir()
+            if (match := _FILE_PATTERN.match(path.name))
+        )
+        for _, path in snapshots[:-_KEEP]:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass  # Pruned by another worker
+
+
+snapshot_service = SnapshotService()
+
+
+async def snapshot_loop(session_factory: Callable[[], Session]) -> None:
+    """Rebuild the bootstrap snapshot every SNAPSHOT_INTERVAL_MINUTES, off the event loop."""
+    interval = settings.snapshot_interval_minutes * 60
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, snapshot_service.build, session_factory)
+        except Exception as e:
+            logger.error(f"[SNAPSHOT] Scheduled build failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,113 @@
+"""
+Tag Autocomplete
+Per-process prefix index over tag names, ranked by recency-weighted usage.
+
+Every tag is indexed under its normalized name and under each later word
+("grocery run" is also found by "ru"), in one sorted array searched with
+bisect. A tag's score is its number of expense links, halved for every
+TAG_AUTOCOMPLETE_HALF_LIFE_DAYS since it was last used.
+
+Refreshes (see memory_index.py) reload only the tags updated since the
+previous one; usage is recounted with one grouped query over expense_tags
+whenever links changed, since hard-deleted links leave no trace to diff.
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from heapq import nsmallest
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Tag, ExpenseTagsCrossRef
+from .memory_index import MemoryIndex, naive_utc, normalize
+
+# Re-read tags updated this long before the last mark: second-resolution
+# timestamps and transactions committing late can land just behind it
+_MARK_SLACK = timedelta(seconds=5)
+
+
+class TagAutocompleteIndex(MemoryIndex):
+    name = "autocomplete"
+    tables = frozenset({Tag.__tablename__, ExpenseTagsCrossRef.__tablename__})
+
+    def __init__(self):
+        super().__init__()
+        self._names: Dict[str, str] = {}  # tag id -> display name
+        self._usage: Dict[str, Tuple[int, Optional[datetime]]] = {}  # tag id -> (links, last used)
+        self._keys: List[Tuple[str, str]] = []  # sorted (normalized key, tag id)
+        self._scores: Dict[str, float] = {}
+        self._tags_mark: Optional[datetime] = None  # max tags.updated_at seen
+
+    # Loading
+
+    def build(self, db: Session) -> None:
+        self._names = {}
+        self._tags_mark = None
+        self._load_tags(db, since=None)
+        self._load_usage(db)
+        self._publish()
+
+    def refresh(self, db: Session, tables: Set[str]) -> None:
+        if Tag.__tablename__ in tables:
+            self._load_tags(db, since=self._tags_mark)
+        if ExpenseTagsCrossRef.__tablename__ in tables:
+            self._load_usage(db)
+        self._publish()
+
+    def _load_tags(self, db: Session, since: Optional[datetime]) -> None:
+        stmt = select(Tag.id, Tag.tag, Tag.deleted_at, Tag.updated_at)
+        if since is not None:
+            # Reloading a tag is idempotent, so overlapping the previous refresh is harmless
+            stmt = stmt.where(Tag.updated_at >= since - _MARK_SLACK)
+        names = dict(self._names)
+        for tag_id, name, deleted_at, updated_at in db.execute(stmt):
+            if deleted_at is None:
+                names[tag_id] = name
+            else:
+                names.pop(tag_id, None)
+            if updated_at is not None and (self._tags_mark is None or updated_at > self._tags_mark):
+                self._tags_mark = updated_at
+        self._names = names
+
+    def _load_usage(self, db: Session) -> None:
+        rows = db.execute(
+            select(ExpenseTagsCrossRef.tag_id, func.count(), func.max(ExpenseTagsCrossRef.created_at))
+            .group_by(ExpenseTagsCrossRef.tag_id)
+        )
+        self._usage = {tag_id: (count, naive_utc(last_used)) for tag_id, count, last_used in rows}
+
+    def _publish(self) -> None:
+        """Recompute keys and scores and swap them in for readers."""
+        now = datetime.utcnow()
+        half_life = settings.tag_autocomplete_half_life_days
+        scores = {}
+        keys = []
+        for tag_id, name in self._names.items():
+            count, last_used = self._usage.get(tag_id, (0, None))
+            age_days = max((now - last_used).total_seconds() / 86400, 0) if last_used else 0
+            scores[tag_id] = count * 0.5 ** (age_days / half_life) if half_life > 0 else float(count)
+            words = normalize(name).split(" ")
+            keys.extend((" ".join(words[i:]), tag_id) for i in range(len(words)))
+        keys.sort()
+        self._keys, self._scores = keys, scores
+
+    # Lookup
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, object]]:
+        """Best-scored tags with a word starting with `prefix`."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        keys, scores, names = self._keys, self._scores, self._names
+        matches = set()
+        i = bisect_left(keys, (key,))
+        while i < len(keys) and keys[i][0].startswith(key):
+            matches.add(keys[i][1])
+            i += 1
+        best = nsmallest(limit, (m for m in matches if m in names), key=lambda m: (-scores.get(m, 0.0), names[m]))
+        return [{"id": tag_id, "name": names[tag_id], "score": round(scores.get(tag_id, 0.0), 4)} for tag_id in best]
+
+
+tag_autocomplete = TagAutocompleteIndex()
@@ -0,0 +1,159 @@
+"""
+Title Tag Index
+Suggests tags for an expense from its title alone, before any tag is picked.
+
+An in-memory inverted index maps each normalized title token to the tags of
+the expenses whose title contains it, with counts. A title's tags score
+    sum over its tokens of  idf(token) * count(token, tag) / df(token)
+where df is the number of tagged expenses with the token and idf discounts
+tokens that appear everywhere ("the", "payment").
+
+Refreshes (see memory_index.py) re-read only the expenses updated, or given
+new links, since the previous one, subtracting what each contributed before.
+Hard-deleted links leave no trace to diff, so whenever links changed one
+grouped count over expense_tags picks out the expenses that lost some, and
+those are re-read too.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from heapq import nlargest
+from math import log
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from ..models import Expense, Tag, ExpenseTagsCrossRef
+from .memory_index import MemoryIndex, tokenize
+
+# See tag_autocomplete._MARK_SLACK
+_MARK_SLACK = timedelta(seconds=5)
+
+# Expense ids per IN (...) when re-reading expenses that lost links
+_RELOAD_CHUNK = 500
+
+
+class _Postings:
+    """Token -> tag counts, plus what each expense contributed (to subtract on change)."""
+
+    def __init__(self):
+        self.tags: Dict[str, Counter] = defaultdict(Counter)  # token -> Counter(tag id -> expenses)
+        self.df: Counter = Counter()  # token -> tagged expenses containing it
+        self.expenses: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}  # expense id -> (tokens, tag ids)
+        self.mark: Optional[datetime] = None  # max expenses/expense_tags updated_at seen
+
+    def add(self, expense_id: str, tokens: Tuple[str, ...], tag_ids: Tuple[str, ...]) -> None:
+        self.expenses[expense_id] = (tokens, tag_ids)
+        for token in tokens:
+            self.df[token] += 1
+            self.tags[token].update(tag_ids)
+
+    def remove(self, expense_id: str) -> None:
+        previous = self.expenses.pop(expense_id, None)
+        if previous is None:
+            return
+        tokens, tag_ids = previous
+        for token in tokens:
+            self.df[token] -= 1
+            counts = self.tags[token]
+            counts.subtract(tag_ids)
+            for tag_id in tag_ids:
+                if counts[tag_id] <= 0:
+                    del counts[tag_id]
+            if self.df[token] <= 0:
+                del self.df[token]
+                del self.tags[token]
+
+
+class TitleTagIndex(MemoryIndex):
+    name = "title-tags"
+    tables = frozenset({Expense.__tablename__, ExpenseTagsCrossRef.__tablename__, Tag.__tablename__})
+
+    def __init__(self):
+        super().__init__()
+        self._postings = _Postings()
+        self._tag_names: Dict[str, str] = {}
+
+    # Loading
+
+    def build(self, db: Session) -> None:
+        postings = _Postings()
+        self._load_expenses(db, postings, since=None)
+        self._postings = postings
+        self._load_tag_names(db)
+
+    def refresh(self, db: Session, tables: Set[str]) -> None:
+        if tables & {Expense.__tablename__, ExpenseTagsCrossRef.__tablename__}:
+            self._load_expenses(db, self._postings, since=self._postings.mark)
+        if ExpenseTagsCrossRef.__tablename__ in tables:
+            self._reload_unlinked(db, self._postings)
+        if Tag.__tablename__ in tables:
+            self._load_tag_names(db)
+
+    def _reload_unlinked(self, db: Session, postings: _Postings) -> None:
+        """Re-read indexed expenses with fewer links than the index holds."""
+        links = dict(db.execute(
+            select(ExpenseTagsCrossRef.expense_id, func.count()).group_by(ExpenseTagsCrossRef.expense_id)
+        ).all())
+        stale = [expense_id for expense_id, (_, tag_ids) in postings.expenses.items()
+                 if links.get(expense_id, 0) < len(tag_ids)]
+        for start in range(0, len(stale), _RELOAD_CHUNK):
+            self._load_expenses(db, postings, since=None, expense_ids=stale[start:start + _RELOAD_CHUNK])
+
+    def _load_expenses(self, db: Session, postings: _Postings, since: Optional[datetime],
+                       expense_ids: Optional[List[str]] = None) -> None:
+        stmt = (
+            select(Expense.id, Expense.title, Expense.deleted_at, Expense.updated_at,
+                   ExpenseTagsCrossRef.tag_id, ExpenseTagsCrossRef.updated_at)
+            .outerjoin(ExpenseTagsCrossRef, ExpenseTagsCrossRef.expense_id == Expense.id)
+        )
+        if since is not None:
+            since = since - _MARK_SLACK
+            changed = select(ExpenseTagsCrossRef.expense_id).where(ExpenseTagsCrossRef.updated_at >= since)
+            stmt = stmt.where(or_(Expense.updated_at >= since, Expense.id.in_(changed)))
+        if expense_ids is not None:
+            stmt = stmt.where(Expense.id.in_(expense_ids))
+
+        current: Dict[str, Tuple[str, List[str]]] = {}
+        for expense_id, title, deleted_at, updated_at, tag_id, link_updated_at in db.execute(stmt):
+            for stamp in (updated_at, link_updated_at):
+                if stamp is not None and (postings.mark is None or stamp > postings.mark):
+                    postings.mark = stamp
+            entry = current.setdefault(expense_id, (title if deleted_at is None else "", []))
+            if tag_id is not None and deleted_at is None:
+                entry[1].append(tag_id)
+
+        for expense_id in expense_ids or ():
+            if expense_id not in current:  # Archived, or purged by compaction
+                postings.remove(expense_id)
+        for expense_id, (title, tag_ids) in current.items():
+            postings.remove(expense_id)
+            if tag_ids:
+                postings.add(expense_id, tuple(set(tokenize(title))), tuple(set(tag_ids)))
+
+    def _load_tag_names(self, db: Session) -> None:
+        self._tag_names = dict(db.execute(select(Tag.id, Tag.tag).where(Tag.deleted_at.is_(None))).all())
+
+    # Lookup
+
+    def suggest(self, title: str, limit: int = 5) -> List[Dict[str, object]]:
+        """Tags ranked for `title`, best first, scores scaled so the best is 1."""
+        postings, names = self._postings, self._tag_names
+        total = len(postings.expenses)
+        scores: Counter = Counter()
+        for token in set(tokenize(title)):
+            df = postings.df.get(token)
+            counts = postings.tags.get(token)
+            if not df or not counts:
+                continue
+            weight = log(1 + total / df) / df
+            for tag_id, count in list(counts.items()):
+                scores[tag_id] += weight * count
+        best = nlargest(limit, ((score, tag_id) for tag_id, score in scores.items() if tag_id in names))
+        if not best:
+            return []
+        top = best[0][0]
+        return [{"tag_id": tag_id, "tag_name": names[tag_id], "score": round(score / top, 4)} for score, tag_id in best]
+
+
+title_tag_index = TitleTagIndex()
@@ -0,0 +1,78 @@
+"""
+Versioned Writes
+Single-statement updates and deletes of synced rows by id.
+
+Expense, Tag, Target, GraphEdge and WishlistItem carry a `version` column
+(the mapper's version_id_col, so ORM flushes bump and check it as well).
+Sync operations write with one statement instead of SELECT + flush:
+
+    UPDATE t SET ..., version = version + 1
+    WHERE id = :id [AND version = :expected] RETURNING version
+
+A client that sends the version it last saw (expectedVersion) gets a
+VersionConflictError when another device wrote the row in between. Only that
+failure path costs a second query, to tell a conflict from a missing row.
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+
+class VersionConflictError(ValueError):
+    """The row exists but is no longer at the version the client edited."""
+
+    def __init__(self, entity: str, entity_id: str, expected: int, current: int):
+        super().__init__(f"{entity} version conflict: {entity_id} (expected {expected}, current {current})")
+        self.entity_id = entity_id
+        self.expected = expected
+        self.current = current
+
+
+def _check_conflict(db: Session, model: Any, entity_id: str, expected_version: Optional[int]) -> None:
+    """After a write matched no row: raise if the row exists at another version."""
+    if expected_version is None:
+        return
+    current = db.execute(select(model.version).where(model.id == entity_id)).scalar_one_or_none()
+    if current is not None:
+        raise VersionConflictError(model.__name__, entity_id, expected_version, current)
+
+
+def update_versioned(
+    db: Session,
+    model: Any,
+    entity_id: str,
+    values: Dict[str, Any],
+    expected_version: Optional[int] = None
+) -> Optional[int]:
+    """
+    Apply `values` to one row and bump its version.
+    Returns the new version, or None if no row has this id.
+    """
+    stmt = update(model).where(model.id == entity_id)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    stmt = stmt.values(**values, version=model.version + 1).returning(model.version)
+    version = db.execute(stmt).scalar_one_or_none()
+    if version is None:
+        _check_conflict(db, model, entity_id, expected_version)
+    return version
+
+
+def delete_versioned(
+    db: Session,
+    model: Any,
+    entity_id: str,
+    expected_version: Optional[int] = None
+) -> bool:
+    """
+    Hard-delete one row. Returns False if no row has this id.
+    Models without a version column (link tables) take no expected_version.
+    """
+    stmt = delete(model).where(model.id == entity_id)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    deleted = db.execute(stmt.execution_options(synchronize_session="fetch")).rowcount > 0
+    if not deleted:
+        _check_conflict(db, model, entity_id, expected_version)
+    return deleted
@@ -0,0 +1,207 @@
+"""
+Per-request SQL profiling.
+
+When a request is profiled, every statement executed through the engine is
+recorded (normalized SQL, parameter count, duration, row count) and a summary
+is attached to the response and kept in a small in-memory history so it can
+be fetched later from /debug/profiles/{request_id}.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-SQL"
+SUMMARY_HEADER = "X-SQL-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_PARAM_PATTERN = re.compile(r"%\(\w+\)s|(?<![:\w]):\w+|\$\d+")
+_STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_SAVEPOINT_PATTERN = re.compile(r"(SAVEPOINT \w+?)_\d+\b")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Normalize a statement so that executions differing only in bound values
+    or IN-list length are grouped together.
+    """
+    sql = _WHITESPACE_PATTERN.sub(" ", statement).strip()
+    sql = _SAVEPOINT_PATTERN.sub(r"\1_?", sql)
+    sql = _STRING_LITERAL_PATTERN.sub("?", sql)
+    sql = _PARAM_PATTERN.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _NUMBER_LITERAL_PATTERN.sub("?", sql)
+    return _IN_LIST_PATTERN.sub("(?...)", sql)
+
+
+def _count_parameters(parameters: Any, executemany: bool) -> int:
+    if not parameters:
+        return 0
+    if executemany:
+        first = parameters[0] if len(parameters) else ()
+        return len(parameters) * len(first)
+    return len(parameters)
+
+
+class StatementStats:
+    """Aggregated timings for one normalized statement."""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.parameters = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "parameters": self.parameters,
+        }
+
+
+class RequestProfile:
+    """All statements executed while handling one request."""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.statements: Dict[str, StatementStats] = {}
+        self.statement_count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, parameter_count: int, duration_ms: float, row_count: int) -> None:
+        sql = normalize_sql(statement)
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = StatementStats(sql)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.parameters += parameter_count
+            if row_count > 0:
+                stats.rows += row_count
+            self.statement_count += 1
+            self.total_ms += duration_ms
+
+    @property
+    def duplicate_count(self) -> int:
+        """Executions of a statement beyond its first (N+1 indicator)."""
+        return self.statement_count - len(self.statements)
+
+    def summary(self, top_n: Optional[int] = None) -> Dict[str, Any]:
+        top_n = top_n or settings.sql_profile_top_n
+        with self._lock:
+            ranked = sorted(self.statements.values(), key=lambda s: s.total_ms, reverse=True)
+            return {
+                "request_id": self.request_id,
+                "method": self.method,
+                "path": self.path,
+                "started_at": int(self.started_at * 1000),
+                "statement_count": self.statement_count,
+                "unique_statements": len(self.statements),
+                "duplicate_statements": self.duplicate_count,
+                "total_ms": round(self.total_ms, 3),
+                "top_statements": [s.to_dict() for s in ranked[:top_n]],
+            }
+
+    def header_value(self) -> str:
+        return (
+            f"id={self.request_id}; statements={self.statement_count}; "
+            f"duplicates={self.duplicate_count}; total_ms={self.total_ms:.2f}"
+        )
+
+
+class ProfileStore:
+    """Bounded history of recent profile summaries, newest last."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.request_id] = profile.summary()
+            self._profiles.move_to_end(profile.request_id)
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(request_id)
+
+    def list_ids(self) -> List[str]:
+        with self._lock:
+            return list(reversed(self._profiles.keys()))
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+profile_store = ProfileStore(settings.sql_profile_history_size)
+
+
+def should_profile(headers: Any) -> bool:
+    """Profile when explicitly requested by header or picked by the sample rate."""
+    if settings.sql_profile_header_enabled and headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    rate = settings.sql_profile_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+def start_profile(request_id: str, method: str, path: str):
+    """Activate a profile for the current context. Returns (profile, reset token)."""
+    profile = RequestProfile(request_id, method, path)
+    return profile, _current_profile.set(profile)
+
+
+def finish_profile(profile: RequestProfile, token) -> None:
+    _current_profile.reset(token)
+    profile_store.add(profile)
+    logger.info(f"[SQL PROFILE] {profile.method} {profile.path}: {profile.header_value()}")
+
+
+def install(engine: Engine) -> None:
+    """Attach cursor event listeners to the engine. Cheap when no profile is active."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_profile.get() is not None:
+            conn.info.setdefault("sql_profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is None:
+            return
+        starts = conn.info.get("sql_profile_start")
+        if not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        try:
+            row_count = cursor.rowcount
+        except Exception:
+            row_count = -1
+        profile.record(statement, _count_parameters(parameters, executemany), duration_ms, row_count)
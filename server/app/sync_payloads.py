@@ -0,0 +1,359 @@
+"""
+Sync payload building.
+
+Converts rows straight into the camelCase dicts described by the Api* schemas
+in schemas.py, without creating a Pydantic object per row. The resulting
+payloads are built by the server from trusted data, so routes return them
+through ORJSONResponse and skip response_model validation.
+
+Reads are column-projected: `EntitySpec.select()` selects exactly the columns
+of the payload, so rows come back as lightweight tuples instead of ORM
+entities (no identity map, no attribute instrumentation). `select_many()`
+reads several entity types in one UNION ALL round trip.
+
+On PostgreSQL with SYNC_SQL_JSON, `json_document()` goes one step further:
+the database builds each payload list itself (json_agg(json_build_object(...)))
+and the route only concatenates the resulting text fragments, so no Python
+work is done per row.
+"""
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy import (
+    BigInteger, DateTime, Integer, String, Text,
+    cast, func, literal, literal_column, null, select, union_all
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, Select
+
+from .config import settings
+from .models import (
+    Expense, Tag, Target, ExpenseTagsCrossRef,
+    GraphEdge, WishlistItem, WishlistTagsCrossRef,
+    ArchivedExpense, ArchivedExpenseTag
+)
+
+# Field kinds
+VALUE = "value"
+MILLIS = "millis"  # datetime -> epoch milliseconds (0 when missing)
+ISO = "iso"  # datetime -> ISO 8601 string (null when missing)
+
+
+class EntitySpec:
+    """
+    Describes how one synced table maps onto its Api* payload.
+    `fields` is a sequence of (payload key, model attribute, kind).
+    """
+
+    def __init__(self, response_key: str, model: Any, fields: Tuple[Tuple[str, str, str], ...]):
+        self.response_key = response_key
+        self.model = model
+        self.fields = fields
+        self.keys = tuple(key for key, _, _ in fields)
+        self.attributes = tuple(attr for _, attr, _ in fields)
+        self.millis_positions = tuple(i for i, (_, _, kind) in enumerate(fields) if kind == MILLIS)
+        self.iso_positions = tuple(i for i, (_, _, kind) in enumerate(fields) if kind == ISO)
+        self.columns = tuple(getattr(model, attr) for attr in self.attributes)
+
+    def over(self, model: Any) -> "EntitySpec":
+        """The same payload read from another table with these columns (the archive)."""
+        return EntitySpec(self.response_key, model, self.fields)
+
+    def select(self) -> Select:
+        """SELECT of exactly the payload columns, in field order."""
+        return select(*self.columns)
+
+    def serialize(self, rows: Iterable[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """Serialize rows from `select()` to payload dicts."""
+        keys = self.keys
+        millis_positions = self.millis_positions
+        iso_positions = self.iso_positions
+        payload = []
+        for row in rows:
+            values = list(row)
+            for i in millis_positions:
+                value = values[i]
+                values[i] = int(value.timestamp() * 1000) if value else 0
+            for i in iso_positions:
+                value = values[i]
+                if value:
+                    # Same text as Pydantic's datetime JSON ("Z" for UTC)
+                    value = value.isoformat()
+                    values[i] = value[:-6] + "Z" if value.endswith("+00:00") else value
+                else:
+                    values[i] = None
+            payload.append(dict(zip(keys, values)))
+        return payload
+
+    def json_array(self, *where: ColumnElement) -> ColumnElement:
+        """
+        PostgreSQL: the payload list of the rows matching `where`, built by
+        the database as one JSON text value ('[]' when nothing matches).
+        """
+        pairs = []
+        for (key, _, kind), column in zip(self.fields, self.columns):
+            if kind == MILLIS:
+                column = func.coalesce(cast(func.floor(func.extract("epoch", column) * 1000), BigInteger), 0)
+            elif kind == ISO:
+                # JSON text of the timestamp, with serialize()'s "Z" for UTC
+                iso = func.to_json(column).op("#>>")(literal_column("'{}'"))
+                column = func.regexp_replace(iso, literal_column(r"'\+00:00$'"), literal_column("'Z'"))
+            # Keys are constants of this module; inlined so PostgreSQL knows their type
+            pairs.extend((literal_column(f"'{key}'"), column))
+        rows = func.json_agg(func.json_build_object(*pairs))
+        return cast(
+            select(func.coalesce(rows, literal_column("'[]'::json"))).where(*where).scalar_subquery(),
+            Text
+        )
+
+
+EXPENSE_SPEC = EntitySpec("expenses", Expense, (
+    ("id", "id", VALUE),
+    ("title", "title", VALUE),
+    ("amount", "amount", VALUE),
+    ("year", "year", VALUE),
+    ("month", "month", VALUE),
+    ("date", "date", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+    ("version", "version", VALUE),
+))
+
+TAG_SPEC = EntitySpec("tags", Tag, (
+    ("id", "id", VALUE),
+    ("name", "tag", VALUE),
+    ("monthlyAmount", "monthly_amount", VALUE),
+    ("currentMonth", "current_month", VALUE),
+    ("currentYear", "current_year", VALUE),
+    ("createdDay", "created_day", VALUE),
+    ("createdMonth", "created_month", VALUE),
+    ("createdYear", "created_year", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+    ("version", "version", VALUE),
+))
+
+TARGET_SPEC = EntitySpec("targets", Target, (
+    ("id", "id", VALUE),
+    ("month", "month", VALUE),
+    ("year", "year", VALUE),
+    ("tagId", "tag_id", VALUE),
+    ("amount", "amount", VALUE),
+    ("spent", "spent", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+    ("version", "version", VALUE),
+))
+
+EXPENSE_TAG_SPEC = EntitySpec("expenseTags", ExpenseTagsCrossRef, (
+    ("id", "id", VALUE),
+    ("expenseId", "expense_id", VALUE),
+    ("tagId", "tag_id", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+))
+
+GRAPH_EDGE_SPEC = EntitySpec("graphEdges", GraphEdge, (
+    ("id", "id", VALUE),
+    ("fromTagId", "from_tag_id", VALUE),
+    ("toTagId", "to_tag_id", VALUE),
+    ("weight", "weight", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+    ("version", "version", VALUE),
+))
+
+WISHLIST_SPEC = EntitySpec("wishlist", WishlistItem, (
+    ("id", "id", VALUE),
+    ("name", "name", VALUE),
+    ("minPrice", "min_price", VALUE),
+    ("maxPrice", "max_price", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+    ("version", "version", VALUE),
+))
+
+WISHLIST_TAG_SPEC = EntitySpec("wishlistTags", WishlistTagsCrossRef, (
+    ("id", "id", VALUE),
+    ("wishlistId", "wishlist_id", VALUE),
+    ("tagId", "tag_id", VALUE),
+    ("createdAt", "created_at", MILLIS),
+    ("updatedAt", "updated_at", MILLIS),
+))
+
+# Archived expenses and links (services/archive_service.py): still synced, read
+# from the archive tables into the same payload lists
+ARCHIVED_EXPENSE_SPEC = EXPENSE_SPEC.over(ArchivedExpense)
+ARCHIVED_EXPENSE_TAG_SPEC = EXPENSE_TAG_SPEC.over(ArchivedExpenseTag)
+
+# Order matches UpdatedDataResponse
+SYNC_ENTITY_SPECS = (
+    EXPENSE_SPEC,
+    TAG_SPEC,
+    TARGET_SPEC,
+    EXPENSE_TAG_SPEC,
+    GRAPH_EDGE_SPEC,
+    WISHLIST_SPEC,
+    WISHLIST_TAG_SPEC,
+)
+
+
+# /sync/full and /sync/delta (SyncDeltaResponse in models/schemas.py): snake_case keys, ISO timestamps
+FULL_EXPENSE_SPEC = EntitySpec("expenses", Expense, (
+    ("id", "id", VALUE),
+    ("local_id", "local_id", VALUE),
+    ("title", "title", VALUE),
+    ("amount", "amount", VALUE),
+    ("year", "year", VALUE),
+    ("month", "month", VALUE),
+    ("date", "date", VALUE),
+    ("created_at", "created_at", ISO),
+    ("updated_at", "updated_at", ISO),
+))
+
+FULL_ARCHIVED_EXPENSE_SPEC = FULL_EXPENSE_SPEC.over(ArchivedExpense)
+
+FULL_TAG_SPEC = EntitySpec("tags", Tag, (
+    ("id", "id", VALUE),
+    ("local_id", "local_id", VALUE),
+    ("tag", "tag", VALUE),
+    ("monthly_amount", "monthly_amount", VALUE),
+    ("current_month", "current_month", VALUE),
+    ("current_year", "current_year", VALUE),
+    ("created_day", "created_day", VALUE),
+    ("created_month", "created_month", VALUE),
+    ("created_year", "created_year", VALUE),
+    ("created_at", "created_at", ISO),
+    ("updated_at", "updated_at", ISO),
+))
+
+FULL_TARGET_SPEC = EntitySpec("targets", Target, (
+    ("tag_id", "tag_id", VALUE),
+    ("month", "month", VALUE),
+    ("year", "year", VALUE),
+    ("amount", "amount", VALUE),
+    ("spent", "spent", VALUE),
+    ("created_at", "created_at", ISO),
+    ("updated_at", "updated_at", ISO),
+))
+
+FULL_GRAPH_EDGE_SPEC = EntitySpec("graph_edges", GraphEdge, (
+    ("from_tag_id", "from_tag_id", VALUE),
+    ("to_tag_id", "to_tag_id", VALUE),
+    ("weight", "weight", VALUE),
+    ("created_at", "created_at", ISO),
+    ("updated_at", "updated_at", ISO),
+))
+
+
+# Typed slots of select_many(): payload values are read as text, integer or
+# timestamp columns, so every branch of the UNION ALL has the same column types
+_SLOT_TYPES = {"text": String(), "int": Integer(), "time": DateTime(timezone=True)}
+
+
+def _slot(kind: str, column: Any) -> str:
+    if kind != VALUE:
+        return "time"
+    # Hybrid link ids (compact link tables) have no .type and are text
+    return "int" if isinstance(getattr(column, "type", None), Integer) else "text"
+
+
+def select_many(
+    db: Session,
+    parts: Sequence[Tuple[EntitySpec, Sequence[ColumnElement]]]
+) -> Dict[str, List[Tuple[Any, ...]]]:
+    """
+    Rows of each (spec, where) in `parts`, read with a single statement.
+
+    One UNION ALL branch per spec: the first column tags the spec, the others
+    are typed slots that each spec fills with its columns (NULL where it has
+    none). Returns response_key -> rows in the spec's field order, as
+    `select()` would, ready for serialize().
+    """
+    layouts = []
+    counts = dict.fromkeys(_SLOT_TYPES, 0)
+    for spec, _ in parts:
+        used = dict.fromkeys(_SLOT_TYPES, 0)
+        layout = []
+        for (_, _, kind), column in zip(spec.fields, spec.columns):
+            slot = _slot(kind, column)
+            layout.append((slot, used[slot]))
+            used[slot] += 1
+        layouts.append(layout)
+        counts = {slot: max(counts[slot], used[slot]) for slot in counts}
+
+    slots = [(slot, i) for slot in _SLOT_TYPES for i in range(counts[slot])]
+    branches = []
+    for tag, ((spec, where), layout) in enumerate(zip(parts, layouts)):
+        filled = dict(zip(layout, spec.columns))
+        columns = [literal_column(str(tag)).label("entity")]
+        for slot, i in slots:
+            column = filled.get((slot, i))
+            if column is None:
+                column = cast(null(), _SLOT_TYPES[slot])
+            elif slot == "text":
+                column = cast(column, String)  # uuid and varchar ids share a slot on PostgreSQL
+            columns.append(column.label(f"{slot}_{i}"))
+        branches.append(select(*columns).where(*where))
+
+    position = {slot: i + 1 for i, slot in enumerate(slots)}
+    getters = [itemgetter(*(position[slot] for slot in layout)) for layout in layouts]
+    keys = [spec.response_key for spec, _ in parts]
+    rows: Dict[str, List[Tuple[Any, ...]]] = {key: [] for key in keys}
+    for row in db.execute(union_all(*branches)):
+        tag = row[0]
+        rows[keys[tag]].append(getters[tag](row))
+    return rows
+
+
+def serialize_many(
+    parts: Sequence[Tuple[EntitySpec, Sequence[ColumnElement]]],
+    rows: Dict[str, List[Tuple[Any, ...]]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    response_key -> payload list of `select_many()` rows. Parts sharing a key
+    (a table and its archive) have the same fields and fill one list.
+    """
+    payload: Dict[str, List[Dict[str, Any]]] = {}
+    for spec, _ in parts:
+        if spec.response_key not in payload:
+            payload[spec.response_key] = spec.serialize(rows[spec.response_key])
+    return payload
+
+
+def sql_json_enabled(db: Session) -> bool:
+    """True when json_document() can be used (SYNC_SQL_JSON on PostgreSQL)."""
+    return settings.sync_sql_json and db.get_bind().dialect.name == "postgresql"
+
+
+def json_document(
+    db: Session,
+    parts: Sequence[Tuple[EntitySpec, Sequence[ColumnElement]]],
+    extra: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """
+    A JSON object with one payload list per (spec, where) in `parts`, keyed
+    by response_key, plus the `extra` members. The lists are built by
+    PostgreSQL in a single statement (one (key, json text) row per spec,
+    combined with UNION ALL) and spliced in unparsed; lists of parts sharing
+    a key are joined.
+    """
+    stmt = union_all(*(
+        select(literal(spec.response_key).label("key"), spec.json_array(*where).label("payload"))
+        for spec, where in parts
+    ))
+    fragments: Dict[str, List[str]] = {spec.response_key: [] for spec, _ in parts}
+    for key, payload in db.execute(stmt):
+        fragments[key].append(payload)
+    members = [orjson.dumps(key) + b":" + _join_arrays(arrays).encode("utf-8") for key, arrays in fragments.items()]
+    members.extend(orjson.dumps(key) + b":" + orjson.dumps(value) for key, value in (extra or {}).items())
+    return b"{" + b",".join(members) + b"}"
+
+
+def _join_arrays(arrays: List[str]) -> str:
+    """Concatenate JSON array texts without parsing them."""
+    if len(arrays) == 1:
+        return arrays[0]
+    items = [inner for inner in (array.strip()[1:-1].strip() for array in arrays) if inner]
+    return "[" + ",".join(items) + "]"
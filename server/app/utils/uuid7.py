@@ -0,0 +1,40 @@
+"""
+Time-ordered UUIDs (version 7, RFC 9562).
+
+The first 48 bits are the Unix time in milliseconds, so ids generated later
+sort later and new rows land on the right edge of a primary-key B-tree
+instead of at random pages. Ids from one process are strictly increasing:
+within a millisecond the 12-bit rand_a field is used as a counter.
+"""
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF  # Leave headroom to count up
+        else:
+            _counter += 1
+            if _counter > 0xFFF:  # Counter exhausted: borrow the next millisecond
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms & ((1 << 48) - 1)) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    """Default for server-assigned primary keys."""
+    return str(uuid7())
@@ -0,0 +1,281 @@
+"""
+Binary MessagePack wire format for sync.
+
+Clients that send `Content-Type: application/msgpack` to /sync/atomic encode
+operations as maps keyed by short codes instead of camelCase strings: each
+field's code below written as a decimal string, with the operation `type` sent
+as its integer code:
+
+    {"0": 2, "2": "<serverId>", "3": "Coffee", "4": 450, "5": 2025, "6": 1, "7": 14}
+    == {"type": "update_expense", "serverId": ..., "title": "Coffee", ...}
+
+The unpacked maps are validated as they are, in a single pydantic-core call:
+every schemas.py operation class has a coded twin (a subclass) whose fields
+read their code key first and the camelCase alias otherwise, and operations
+are picked by a tagged union on the type code (or the type name). No Python
+code runs per operation, so parsing costs the same as the JSON path (validation
+is most of it); the body is about half the size.
+
+Maps keyed by plain integers (the first version of this format) are still
+accepted; their keys are rewritten in Python first, which is slower.
+
+Responses are MessagePack when the client sends `Accept: application/msgpack`.
+Codes below are part of the protocol: never renumber, only append.
+"""
+from typing import Any, Dict, List, Type
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import AliasChoices, BaseModel, ValidationError, create_model
+from pydantic.fields import FieldInfo
+from pydantic_core import core_schema
+
+from .schemas import (
+    CreateExpenseBatchRequest, UpdateExpenseBatchRequest, DeleteExpenseBatchRequest,
+    CreateTagBatchRequest, UpdateTagBatchRequest, DeleteTagBatchRequest,
+    CreateTargetBatchRequest, UpdateTargetBatchRequest, DeleteTargetBatchRequest,
+    CreateExpenseTagBatchRequest, DeleteExpenseTagBatchRequest,
+    CreateGraphEdgeBatchRequest, UpdateGraphEdgeBatchRequest, DeleteGraphEdgeBatchRequest,
+    CreateWishlistBatchRequest, UpdateWishlistBatchRequest, DeleteWishlistBatchRequest,
+    CreateWishlistTagBatchRequest, DeleteWishlistTagBatchRequest
+)
+from .schemas_atomic import AtomicSyncGroup, AtomicSyncRequest
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+# Operation type code -> operation class
+OPERATION_TYPES: Dict[int, Type[BaseModel]] = {
+    1: CreateExpenseBatchRequest,
+    2: UpdateExpenseBatchRequest,
+    3: DeleteExpenseBatchRequest,
+    4: CreateTagBatchRequest,
+    5: UpdateTagBatchRequest,
+    6: DeleteTagBatchRequest,
+    7: CreateTargetBatchRequest,
+    8: UpdateTargetBatchRequest,
+    9: DeleteTargetBatchRequest,
+    10: CreateExpenseTagBatchRequest,
+    11: DeleteExpenseTagBatchRequest,
+    12: CreateGraphEdgeBatchRequest,
+    13: UpdateGraphEdgeBatchRequest,
+    14: DeleteGraphEdgeBatchRequest,
+    15: CreateWishlistBatchRequest,
+    16: UpdateWishlistBatchRequest,
+    17: DeleteWishlistBatchRequest,
+    18: CreateWishlistTagBatchRequest,
+    19: DeleteWishlistTagBatchRequest,
+}
+
+# Field code -> JSON alias (operation fields and the request envelope)
+FIELD_NAMES: Dict[int, str] = {
+    0: "type",
+    1: "clientId",
+    2: "serverId",
+    3: "title",
+    4: "amount",
+    5: "year",
+    6: "month",
+    7: "date",
+    8: "name",
+    9: "monthlyAmount",
+    10: "currentMonth",
+    11: "currentYear",
+    12: "createdDay",
+    13: "createdMonth",
+    14: "createdYear",
+    15: "tagId",
+    16: "spent",
+    17: "expenseId",
+    18: "fromTagId",
+    19: "toTagId",
+    20: "weight",
+    21: "minPrice",
+    22: "maxPrice",
+    23: "wishlistId",
+    24: "expectedVersion",
+    # Envelope
+    64: "groups",
+    65: "groupId",
+    66: "groupType",
+    67: "operations",
+    68: "clientTimestamp",
+    69: "deviceId",
+}
+
+# Operation type code -> `type` literal of its class
+OPERATION_TYPE_NAMES: Dict[int, str] = {
+    code: cls.model_fields["type"].annotation.__args__[0] for code, cls in OPERATION_TYPES.items()
+}
+
+
+def is_msgpack(media_type: str) -> bool:
+    return media_type.split(";", 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(request: Request) -> bool:
+    """True when the Accept header lists a MessagePack media type."""
+    accept = request.headers.get("accept", "")
+    return any(is_msgpack(part) for part in accept.split(","))
+
+
+# JSON alias -> code key of the MessagePack format ("2")
+FIELD_KEYS: Dict[str, str] = {name: str(code) for code, name in FIELD_NAMES.items()}
+
+
+def _coded_model(cls: Type[BaseModel], **annotations: Any) -> Type[BaseModel]:
+    """
+    Subclass of `cls` whose fields are read from their code key, then from
+    their alias; `annotations` replaces field types (nested coded models).
+    `type` is left to its default: the tagged union already picked the class.
+    """
+    fields = {}
+    for name, info in cls.model_fields.items():
+        alias = info.alias or name
+        if name == "type":
+            fields[name] = (info.annotation, FieldInfo.merge_field_infos(info, default=info.annotation.__args__[0]))
+        else:
+            fields[name] = (annotations.get(name, info.annotation), FieldInfo.merge_field_infos(
+                info, validation_alias=AliasChoices(FIELD_KEYS[alias], alias)
+            ))
+    return create_model(cls.__name__, __base__=cls, **fields)
+
+
+CODED_OPERATION_TYPES: Dict[int, Type[BaseModel]] = {
+    code: _coded_model(cls) for code, cls in OPERATION_TYPES.items()
+}
+
+
+class _CodedOperation:
+    """Operation chosen by its type code ("0") or name ("type"), in pydantic-core."""
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: Any) -> core_schema.CoreSchema:
+        choices = {}
+        for code, model in CODED_OPERATION_TYPES.items():
+            choices[code] = choices[OPERATION_TYPE_NAMES[code]] = handler.generate_schema(model)
+        return core_schema.tagged_union_schema(
+            choices, discriminator=[[FIELD_KEYS["type"]], ["type"]],
+            custom_error_type="operation_type_invalid",
+            custom_error_message="Unknown or missing operation type",
+        )
+
+
+_CodedGroup = _coded_model(AtomicSyncGroup, operations=List[_CodedOperation])
+_CodedRequest = _coded_model(AtomicSyncRequest, groups=List[_CodedGroup])
+
+
+def _decode_keys(data: Dict[Any, Any]) -> Dict[Any, Any]:
+    # map(dict.get, keys, keys) keeps unknown/string keys as they are, all in C
+    return dict(zip(map(FIELD_NAMES.get, data, data), data.values()))
+
+
+def _decode_operation(data: Dict[Any, Any]) -> Dict[Any, Any]:
+    operation = _decode_keys(data)
+    op_type = operation.get("type")
+    if op_type.__class__ is int:
+        operation["type"] = OPERATION_TYPE_NAMES.get(op_type, op_type)
+    return operation
+
+
+def _decode_group(data: Dict[Any, Any]) -> Dict[Any, Any]:
+    group = _decode_keys(data)
+    operations = group.get("operations")
+    if isinstance(operations, list):
+        group["operations"] = [_decode_operation(op) for op in operations]
+    return group
+
+
+def _decode_integer_keys(envelope: Dict[Any, Any]) -> Dict[Any, Any]:
+    """Rewrite a request keyed by plain integers into JSON aliases."""
+    envelope = _decode_keys(envelope)
+    groups = envelope.get("groups")
+    if isinstance(groups, list):
+        envelope["groups"] = [_decode_group(group) for group in groups]
+    return envelope
+
+
+def _readable_loc(loc: tuple) -> tuple:
+    # Error locations of coded bodies name the code key and the type code of
+    # the union member ("operations", 1, 1, "3"); show the JSON names instead
+    readable = []
+    for i, item in enumerate(loc):
+        if isinstance(item, str) and item.isdigit():
+            item = FIELD_NAMES.get(int(item), item)
+        elif isinstance(item, int) and i >= 2 and readable[i - 2] == "operations":
+            item = OPERATION_TYPE_NAMES.get(item, item)
+        readable.append(item)
+    return tuple(readable)
+
+
+def _prefixed_errors(error: ValidationError, loc: tuple) -> List[Dict[str, Any]]:
+    return [
+        {**err, "loc": loc + _readable_loc(err["loc"])}
+        for err in error.errors(include_url=False)
+    ]
+
+
+def decode_atomic_request(body: bytes) -> AtomicSyncRequest:
+    """Decode a MessagePack body into an AtomicSyncRequest."""
+    try:
+        envelope = msgpack.unpackb(body, raw=False, strict_map_key=False)
+        model: Type[BaseModel] = _CodedRequest
+        if isinstance(envelope, dict) and any(key.__class__ is int for key in envelope):
+            envelope, model = _decode_integer_keys(envelope), AtomicSyncRequest
+    except Exception as e:
+        raise RequestValidationError([{
+            "type": "msgpack_invalid",
+            "loc": ("body",),
+            "msg": f"Invalid MessagePack sync request: {e}",
+            "input": None,
+        }])
+
+    try:
+        return model.model_validate(envelope)
+    except ValidationError as e:
+        raise RequestValidationError(_prefixed_errors(e, ("body",)))
+
+
+async def read_atomic_request(request: Request) -> AtomicSyncRequest:
+    """Parse the /sync/atomic body as JSON or MessagePack depending on Content-Type."""
+    body = await request.body()
+    if is_msgpack(request.headers.get("content-type", "")):
+        return decode_atomic_request(body)
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error", "input": {}}])
+    try:
+        return AtomicSyncRequest.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(_prefixed_errors(e, ("body",)))
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def negotiated_response(request: Request, content: Any) -> Response:
+    """MessagePack if the client asked for it, JSON otherwise."""
+    if accepts_msgpack(request):
+        return MsgPackResponse(content)
+    return ORJSONResponse(content)
+
+
+# OpenAPI description of the request body, since it is parsed manually
+ATOMIC_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "description": "AtomicSyncRequest as JSON, or MessagePack with coded types/fields (see app/wire_format.py)",
+        "content": {
+            "application/json": {"schema": {"type": "object"}},
+            MSGPACK_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
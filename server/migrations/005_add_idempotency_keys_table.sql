@@ -0,0 +1,16 @@
+-- Migration: Add idempotency_keys table for request-level sync idempotency
+-- Date: 2026-10-19
+-- Description: Stores /sync/atomic responses by Idempotency-Key so exact retries are replayed without re-running operations
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key VARCHAR(255) PRIMARY KEY,
+    request_hash VARCHAR(64) NOT NULL,
+    response TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Expired rows are purged by range on expires_at
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at);
+
+COMMENT ON TABLE idempotency_keys IS 'Stored atomic sync responses keyed by request idempotency key (TTL via expires_at)';
@@ -0,0 +1,16 @@
+-- Migration: Add device_sync_state table for per-device sync watermarks
+-- Date: 2026-10-19
+-- Description: Tracks the change watermark each device has acknowledged and when it was last seen
+
+CREATE TABLE IF NOT EXISTS device_sync_state (
+    device_id VARCHAR(255) PRIMARY KEY,
+    acknowledged_until BIGINT NOT NULL DEFAULT 0,
+    last_seen_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Active-device scans (lag report, tombstone purge horizon)
+CREATE INDEX IF NOT EXISTS idx_device_sync_state_last_seen ON device_sync_state(last_seen_at);
+
+COMMENT ON TABLE device_sync_state IS 'Per-device acknowledged sync watermark (epoch ms) and last contact time';
+COMMENT ON COLUMN device_sync_state.acknowledged_until IS 'Server timestamp (ms) up to which the device has applied pulled changes';
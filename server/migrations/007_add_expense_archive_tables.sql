@@ -0,0 +1,43 @@
+-- Migration: Add expense archive and monthly rollup tables
+-- Date: 2026-10-19
+-- Description: Cold storage for old expenses and their tag links, plus per-month rollups of archived data
+
+CREATE TABLE IF NOT EXISTS expenses_archive (
+    id VARCHAR PRIMARY KEY,
+    local_id INTEGER,
+    title VARCHAR NOT NULL,
+    amount INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    date INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_expenses_archive_created ON expenses_archive(created_at);
+
+CREATE TABLE IF NOT EXISTS expense_tags_archive (
+    id VARCHAR PRIMARY KEY,
+    expense_id VARCHAR NOT NULL,
+    tag_id VARCHAR NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_expense_tags_archive_expense ON expense_tags_archive(expense_id);
+CREATE INDEX IF NOT EXISTS idx_expense_tags_archive_tag ON expense_tags_archive(tag_id);
+
+-- tag_id '' holds the month total over all expenses
+CREATE TABLE IF NOT EXISTS expense_monthly_rollups (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    tag_id VARCHAR NOT NULL DEFAULT '',
+    total_amount BIGINT NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (year, month, tag_id)
+);
+
+COMMENT ON TABLE expenses_archive IS 'Append-only cold storage for expenses older than the archive horizon';
+COMMENT ON TABLE expense_monthly_rollups IS 'Per-month (and per-tag) totals of archived expenses';
@@ -0,0 +1,32 @@
+-- Migration: Add indexes matching the hot query shapes
+-- Date: 2026-10-19
+-- Description: Partial/covering indexes for monthly totals, delta sync (updated_at > since),
+-- expense listing and tag-side joins. Check coverage with scripts/index_advisor.py.
+--
+-- Plain CREATE INDEX (run_migrations.py sends the file as one statement batch, where
+-- CONCURRENTLY is not allowed). On a large live database create them one by one with
+-- CREATE INDEX CONCURRENTLY instead.
+
+-- Expenses: year/month totals over live rows, amount covered (index-only sum)
+CREATE INDEX IF NOT EXISTS idx_expenses_year_month_live
+    ON expenses (year, month) INCLUDE (amount) WHERE deleted_at IS NULL;
+
+-- Delta sync and listing on live rows
+CREATE INDEX IF NOT EXISTS idx_expenses_updated_live ON expenses (updated_at) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_expenses_created_live ON expenses (created_at) WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_tags_updated_live ON tags (updated_at) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_targets_updated ON targets (updated_at);
+CREATE INDEX IF NOT EXISTS idx_graph_edges_updated ON graph_edges (updated_at);
+CREATE INDEX IF NOT EXISTS idx_wishlist_updated ON wishlist (updated_at);
+
+-- Cross-refs: tag-side lookups (unique indexes lead with expense_id / wishlist_id)
+CREATE INDEX IF NOT EXISTS idx_expense_tags_tag_expense ON expense_tags (tag_id, expense_id);
+CREATE INDEX IF NOT EXISTS idx_expense_tags_updated ON expense_tags (updated_at);
+CREATE INDEX IF NOT EXISTS idx_wishlist_tags_tag ON wishlist_tags (tag_id, wishlist_id);
+CREATE INDEX IF NOT EXISTS idx_wishlist_tags_updated ON wishlist_tags (updated_at);
+
+ANALYZE expenses;
+ANALYZE tags;
+ANALYZE expense_tags;
+ANALYZE wishlist_tags;
@@ -0,0 +1,9 @@
+-- Migration: Add trigram indexes for tag and expense title search
+-- Date: 2026-10-19
+-- Description: pg_trgm GIN indexes backing GET /api/v1/search and the ILIKE filter of
+-- GET /api/v1/tags?search=. The API also creates them at startup (SearchService.ensure_index).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_tags_tag_trgm ON tags USING gin (tag gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_expenses_title_trgm ON expenses USING gin (title gin_trgm_ops);
@@ -0,0 +1,16 @@
+-- Migration: Add row version columns to synced tables
+-- Date: 2026-10-19
+-- Description: Optimistic concurrency for sync writes. Updates and deletes run as one
+-- UPDATE ... WHERE id = :id [AND version = :expected] RETURNING version
+-- (see app/services/versioned_writes.py); existing rows start at version 1.
+
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE tags ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE graph_edges ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE wishlist ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+-- Archived expenses keep their version so a restored row continues from it
+ALTER TABLE expenses_archive ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+COMMENT ON COLUMN expenses.version IS 'Row version, incremented by every update (sync clients send it back as expectedVersion)';
@@ -0,0 +1,7 @@
+-- Migration: Add updated_at indexes on the archive tables
+-- Date: 2026-10-19
+-- Description: /sync/updated-data reads archived expenses and links too (updated_at > since);
+-- without these every poll would scan the archive.
+
+CREATE INDEX IF NOT EXISTS idx_expenses_archive_updated ON expenses_archive (updated_at);
+CREATE INDEX IF NOT EXISTS idx_expense_tags_archive_updated ON expense_tags_archive (updated_at);
@@ -0,0 +1,115 @@
+-- Optional migration: Range-partition expenses by year (PostgreSQL 13+)
+-- Date: 2026-10-19
+-- Description: Rebuilds `expenses` as a table partitioned by RANGE (year), one partition
+-- per year (expenses_y<year>) plus a default partition. Queries filtering on year
+-- (monthly stats, targets, year/month lookups) then scan a single partition, and old
+-- years can be detached with ALTER TABLE ... DETACH PARTITION.
+--
+-- Not applied by run_migrations.py. Run it explicitly, in a maintenance window:
+--     psql "$DATABASE_URL" -f migrations/optional/001_partition_expenses_by_year.sql
+-- and verify with scripts/verify_partitioning.py.
+--
+-- Notes:
+-- * The primary key becomes (id, year): PostgreSQL requires the partition key in every
+--   unique constraint. IDs are UUIDs, so they stay unique in practice.
+-- * expense_tags.expense_id can no longer reference expenses(id) (not unique on its own),
+--   so that foreign key is dropped. The sync services already verify expenses exist.
+-- * Changing an expense's year moves the row to the other partition automatically.
+-- * Future partitions are created by ensure_expense_partition(), which the API calls at
+--   startup and in the maintenance loop (app/services/partition_service.py).
+
+BEGIN;
+
+-- Function: create the partition for one year, moving any rows that landed in the
+-- default partition meanwhile (a partition can't be added while default holds its rows)
+CREATE OR REPLACE FUNCTION ensure_expense_partition(p_year INTEGER) RETURNS TEXT AS $$
+DECLARE
+    partition_name TEXT := format('expenses_y%s', p_year);
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM expenses_default WHERE year = p_year) THEN
+        EXECUTE format('CREATE TABLE %I (LIKE expenses INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM expenses_default WHERE year = %s RETURNING *) INSERT INTO %I SELECT * FROM moved',
+            p_year, partition_name
+        );
+        EXECUTE format('ALTER TABLE expenses ATTACH PARTITION %I FOR VALUES FROM (%s) TO (%s)',
+                       partition_name, p_year, p_year + 1);
+    ELSE
+        EXECUTE format('CREATE TABLE %I PARTITION OF expenses FOR VALUES FROM (%s) TO (%s)',
+                       partition_name, p_year, p_year + 1);
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keep the old table aside until the copy is verified
+ALTER TABLE expense_tags DROP CONSTRAINT IF EXISTS expense_tags_expense_id_fkey;
+ALTER TABLE expenses RENAME TO expenses_unpartitioned;
+
+-- Index names are schema-wide and stay with the renamed table: rename them all
+-- (expenses_pkey -> expenses_unpartitioned_pkey, idx_expenses_title_trgm ->
+-- idx_expenses_unpartitioned_title_trgm, ...) so the parent below, and
+-- SearchService.ensure_index's CREATE INDEX IF NOT EXISTS, get the original names
+DO $$
+DECLARE
+    old_name TEXT;
+BEGIN
+    FOR old_name IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'expenses_unpartitioned'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', old_name,
+                       replace(old_name, 'expenses', 'expenses_unpartitioned'));
+    END LOOP;
+END $$;
+
+CREATE TABLE expenses (LIKE expenses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (year);
+ALTER TABLE expenses ADD PRIMARY KEY (id, year);
+
+-- Indexes declared on the parent are created on every partition
+CREATE INDEX IF NOT EXISTS idx_expenses_part_year_month ON expenses (year, month);
+CREATE INDEX IF NOT EXISTS idx_expenses_part_updated_at ON expenses (updated_at);
+CREATE INDEX IF NOT EXISTS idx_expenses_part_created_at ON expenses (created_at);
+
+-- Live-row partial/covering indexes (migration 008)
+CREATE INDEX IF NOT EXISTS idx_expenses_year_month_live
+    ON expenses (year, month) INCLUDE (amount) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_expenses_updated_live ON expenses (updated_at) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_expenses_created_live ON expenses (created_at) WHERE deleted_at IS NULL;
+
+-- Title search (migration 009), where pg_trgm is installed
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS idx_expenses_title_trgm ON expenses USING gin (title gin_trgm_ops);
+    END IF;
+END $$;
+
+-- Catches years without a partition yet (e.g. typos like year 20025)
+CREATE TABLE expenses_default PARTITION OF expenses DEFAULT;
+
+-- One partition per existing year, plus this year and next
+DO $$
+DECLARE
+    y INTEGER;
+BEGIN
+    FOR y IN
+        SELECT DISTINCT year FROM expenses_unpartitioned WHERE year BETWEEN 1900 AND 9999
+        UNION SELECT extract(year FROM now())::INTEGER
+        UNION SELECT extract(year FROM now())::INTEGER + 1
+    LOOP
+        PERFORM ensure_expense_partition(y);
+    END LOOP;
+END $$;
+
+INSERT INTO expenses SELECT * FROM expenses_unpartitioned;
+
+COMMIT;
+
+-- After verifying row counts (scripts/verify_partitioning.py), drop the old copy:
+--     DROP TABLE expenses_unpartitioned;
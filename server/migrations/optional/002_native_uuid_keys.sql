@@ -0,0 +1,80 @@
+-- Optional migration: Store entity ids as native UUID (PostgreSQL)
+-- Date: 2026-10-19
+-- Description: Converts every id / foreign-key column from text (36 bytes + header) to
+-- uuid (16 bytes), which shrinks the primary-key and foreign-key indexes and makes joins
+-- compare fixed-width values. New ids are time-ordered UUIDv7 (app/utils/uuid7.py), so
+-- inserts append to the right edge of the primary-key index.
+--
+-- Not applied by run_migrations.py. Run it explicitly, in a maintenance window (every
+-- table touched is rewritten under an exclusive lock), then set NATIVE_UUID_KEYS=true:
+--     psql "$DATABASE_URL" -f migrations/optional/002_native_uuid_keys.sql
+-- Measure the effect with scripts/bench_uuid_keys.py.
+--
+-- The whole migration is one transaction: if any stored id is not a valid UUID the cast
+-- fails and nothing changes. Find offenders first with e.g.
+--     SELECT id FROM expenses WHERE id !~* '^[0-9a-f]{8}-?([0-9a-f]{4}-?){3}[0-9a-f]{12}$';
+
+BEGIN;
+
+-- Foreign keys must be dropped while both sides change type, then restored as they were
+CREATE TEMP TABLE uuid_migration_fks ON COMMIT DROP AS
+SELECT conrelid::regclass AS table_name, conname, pg_get_constraintdef(oid) AS definition
+FROM pg_constraint
+WHERE contype = 'f'
+  AND connamespace = 'public'::regnamespace
+  AND conparentid = 0;  -- Partition-level copies follow their parent
+
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN SELECT * FROM uuid_migration_fks LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.table_name, fk.conname);
+    END LOOP;
+END $$;
+
+ALTER TABLE expenses ALTER COLUMN id TYPE uuid USING id::uuid;
+ALTER TABLE tags ALTER COLUMN id TYPE uuid USING id::uuid;
+
+ALTER TABLE expense_tags
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN expense_id TYPE uuid USING expense_id::uuid,
+    ALTER COLUMN tag_id TYPE uuid USING tag_id::uuid;
+
+ALTER TABLE targets
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN tag_id TYPE uuid USING tag_id::uuid;
+
+ALTER TABLE graph_edges
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN from_tag_id TYPE uuid USING from_tag_id::uuid,
+    ALTER COLUMN to_tag_id TYPE uuid USING to_tag_id::uuid;
+
+ALTER TABLE wishlist ALTER COLUMN id TYPE uuid USING id::uuid;
+
+ALTER TABLE wishlist_tags
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN wishlist_id TYPE uuid USING wishlist_id::uuid,
+    ALTER COLUMN tag_id TYPE uuid USING tag_id::uuid;
+
+ALTER TABLE entity_mappings ALTER COLUMN server_id TYPE uuid USING server_id::uuid;
+
+ALTER TABLE expenses_archive ALTER COLUMN id TYPE uuid USING id::uuid;
+
+ALTER TABLE expense_tags_archive
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN expense_id TYPE uuid USING expense_id::uuid,
+    ALTER COLUMN tag_id TYPE uuid USING tag_id::uuid;
+
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN SELECT * FROM uuid_migration_fks LOOP
+        EXECUTE format('ALTER TABLE %s ADD CONSTRAINT %I %s', fk.table_name, fk.conname, fk.definition);
+    END LOOP;
+END $$;
+
+COMMIT;
+
+ANALYZE;
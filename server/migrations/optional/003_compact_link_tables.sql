@@ -0,0 +1,38 @@
+-- Optional migration: Key expense_tags / wishlist_tags by their pair (PostgreSQL)
+-- Date: 2026-10-19
+-- Description: Drops the surrogate id from the link tables. The primary key becomes
+-- (expense_id, tag_id) / (wishlist_id, tag_id), replacing both the old id primary key
+-- and the unique pair index; (tag_id, ...) stays as the reverse index. Links created
+-- afterwards are identified by the derived id "<parent id>:<tag id>", which is never
+-- stored. Existing links keep their id in legacy_id (partial unique index) so clients
+-- holding them keep working. See app/models/link_ids.py.
+--
+-- Not applied by run_migrations.py. Run it explicitly, then set COMPACT_LINK_TABLES=true:
+--     psql "$DATABASE_URL" -f migrations/optional/003_compact_link_tables.sql
+-- Incompatible with NATIVE_UUID_KEYS (derived ids are not UUIDs). Fresh databases
+-- (including local SQLite) get the compact layout from create_all with the setting on.
+
+BEGIN;
+
+-- expense_tags
+ALTER TABLE expense_tags RENAME COLUMN id TO legacy_id;
+ALTER TABLE expense_tags DROP CONSTRAINT expense_tags_pkey;
+ALTER TABLE expense_tags ALTER COLUMN legacy_id DROP NOT NULL;
+ALTER TABLE expense_tags ADD CONSTRAINT expense_tags_pkey PRIMARY KEY USING INDEX idx_expense_tag_unique;
+CREATE UNIQUE INDEX idx_expense_tags_legacy ON expense_tags (legacy_id) WHERE legacy_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_expense_tags_tag_expense ON expense_tags (tag_id, expense_id);
+
+-- wishlist_tags
+ALTER TABLE wishlist_tags RENAME COLUMN id TO legacy_id;
+ALTER TABLE wishlist_tags DROP CONSTRAINT wishlist_tags_pkey;
+ALTER TABLE wishlist_tags ALTER COLUMN legacy_id DROP NOT NULL;
+ALTER TABLE wishlist_tags ADD CONSTRAINT wishlist_tags_pkey PRIMARY KEY USING INDEX idx_wishlist_tag_unique;
+CREATE UNIQUE INDEX idx_wishlist_tags_legacy ON wishlist_tags (legacy_id) WHERE legacy_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_wishlist_tags_tag ON wishlist_tags (tag_id, wishlist_id);
+
+COMMIT;
+
+-- The old id primary-key index is gone with its constraint; refresh planner statistics.
+-- ANALYZE rather than VACUUM, so the file also runs when sent as one batch
+ANALYZE expense_tags;
+ANALYZE wishlist_tags;
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Move old expenses into expenses_archive (see app/services/archive_service.py).
+
+Usage:
+    python scripts/archive_expenses.py --older-than-days 365
+    python scripts/archive_expenses.py            # uses ARCHIVE_AFTER_DAYS
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from app.database import SessionLocal  # noqa: E402
+from app.services.archive_service import ArchiveService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive expenses older than a horizon")
+    parser.add_argument("--older-than-days", type=int, help="Override ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--batch-size", type=int, help="Override ARCHIVE_BATCH_SIZE")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = ArchiveService(db)
+        if args.older_than_days is not None:
+            horizon = datetime.utcnow() - timedelta(days=args.older_than_days)
+        else:
+            horizon = service.archive_horizon()
+        if horizon is None:
+            parser.error("Archiving is disabled: set ARCHIVE_AFTER_DAYS or pass --older-than-days")
+        report = service.archive(horizon, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark sync payload serialization on a large delta.
+
+Compares the previous path (full ORM entities, one Api* Pydantic object per
+row, response_model re-validation, stdlib json) with the sync_payloads fast
+path (column-projected tuples -> dicts, orjson). Seeds a throwaway SQLite
+database with the synthetic dataset.
+
+Usage:
+    python scripts/bench_sync_serialization.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+import orjson  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import Expense, ExpenseTagsCrossRef  # noqa: E402
+from app.schemas import ApiExpense, ApiExpenseTag, UpdatedDataResponse  # noqa: E402
+from app.sync_payloads import EXPENSE_SPEC, EXPENSE_TAG_SPEC  # noqa: E402
+from synthetic_data import seed_dataset  # noqa: E402
+
+
+def _millis(value):
+    return int(value.timestamp() * 1000) if value else 0
+
+
+def legacy_payload(expenses, expense_tags) -> bytes:
+    response = UpdatedDataResponse(
+        expenses=[
+            ApiExpense(
+                id=str(e.id), title=e.title, amount=e.amount, year=e.year, month=e.month, date=e.date,
+                created_at=_millis(e.created_at), updated_at=_millis(e.updated_at)
+            )
+            for e in expenses
+        ],
+        expense_tags=[
+            ApiExpenseTag(
+                id=str(et.id), expenseId=str(et.expense_id), tagId=str(et.tag_id),
+                createdAt=_millis(et.created_at), updatedAt=_millis(et.updated_at)
+            )
+            for et in expense_tags
+        ],
+    )
+    # What FastAPI does with response_model: dump, validate again, dump for JSON
+    validated = UpdatedDataResponse.model_validate(response.model_dump(by_alias=True))
+    return json.dumps(validated.model_dump(mode="json", by_alias=True)).encode("utf-8")
+
+
+def load_entities(session_factory):
+    session = session_factory()
+    try:
+        return session.query(Expense).all(), session.query(ExpenseTagsCrossRef).all()
+    finally:
+        session.close()
+
+
+def load_rows(session_factory):
+    session = session_factory()
+    try:
+        return (
+            session.execute(EXPENSE_SPEC.select()).all(),
+            session.execute(EXPENSE_TAG_SPEC.select()).all(),
+        )
+    finally:
+        session.close()
+
+
+def fast_payload(expenses, expense_tags) -> bytes:
+    return orjson.dumps({
+        EXPENSE_SPEC.response_key: EXPENSE_SPEC.serialize(expenses),
+        EXPENSE_TAG_SPEC.response_key: EXPENSE_TAG_SPEC.serialize(expense_tags),
+    })
+
+
+def _size(result) -> str:
+    if isinstance(result, bytes):
+        return f"{len(result) / 1024 / 1024:>7.2f} MiB"
+    return f"{sum(len(part) for part in result):>7} rows"
+
+
+def timed(label, fn, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best * 1000:>10.1f} ms   {_size(result)}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync payload serialization")
+    parser.add_argument("--rows", type=int, default=100_000, help="Total payload rows (expenses + expense tags)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        counts = seed_dataset(engine, expenses=args.rows // 2, tags=200, tags_per_expense=1)
+        print(f"Seeded {counts}")
+
+        session_factory = sessionmaker(bind=engine)
+
+        print("\nLoading")
+        load_legacy = timed("ORM entities (legacy)", load_entities, session_factory)
+        load_fast = timed("projected tuples", load_rows, session_factory)
+
+        expenses, expense_tags = load_entities(session_factory)
+        expense_rows, expense_tag_rows = load_rows(session_factory)
+
+        print("\nSerializing")
+        legacy = timed("pydantic + json (legacy)", legacy_payload, expenses, expense_tags)
+        fast = timed("sync_payloads + orjson", fast_payload, expense_rows, expense_tag_rows)
+
+        print(f"\nLoad speedup: {load_legacy / load_fast:.1f}x")
+        print(f"Serialize speedup: {legacy / fast:.1f}x")
+        print(f"End-to-end speedup: {(load_legacy + legacy) / (load_fast + fast):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
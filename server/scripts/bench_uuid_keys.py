@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark id layouts: text vs native UUID columns, random (v4) vs time-ordered (v7) ids.
+
+For each variant, inserts synthetic link rows shaped like expense_tags
+(id primary key, expense_id, tag_id, a (tag_id, expense_id) index) into a
+scratch table, in batches of one transaction each, and reports insert
+throughput and table/index sizes. Native UUID variants need PostgreSQL.
+Scratch tables are dropped afterwards unless --keep is given.
+
+Usage:
+    DATABASE_URL=sqlite:///./bench.db python scripts/bench_uuid_keys.py --rows 200000
+    DATABASE_URL=postgresql://... python scripts/bench_uuid_keys.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from sqlalchemy import Column, Index, MetaData, String, Table, insert, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import UUID  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.utils.uuid7 import uuid7  # noqa: E402
+
+BATCH_SIZE = 5000
+GENERATORS = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+def variants(dialect: str):
+    column_types = {"text": String}
+    if dialect == "postgresql":
+        column_types["uuid"] = lambda: UUID(as_uuid=False)
+    return [(f"{kind}_{gen}", column_type, GENERATORS[gen])
+            for kind, column_type in column_types.items() for gen in GENERATORS]
+
+
+def scratch_table(metadata: MetaData, name: str, column_type) -> Table:
+    table_name = f"bench_keys_{name}"
+    return Table(
+        table_name, metadata,
+        Column("id", column_type(), primary_key=True),
+        Column("expense_id", column_type(), nullable=False),
+        Column("tag_id", column_type(), nullable=False),
+        Index(f"idx_{table_name}_tag", "tag_id", "expense_id"),
+    )
+
+
+def sizes(conn, table: Table) -> dict:
+    """Bytes used by the table, its primary key index and its secondary index."""
+    if conn.dialect.name == "postgresql":
+        row = conn.execute(text(
+            "SELECT pg_relation_size(c.oid), pg_relation_size(i.indexrelid), pg_indexes_size(c.oid) "
+            "FROM pg_class c JOIN pg_index i ON i.indrelid = c.oid AND i.indisprimary "
+            "WHERE c.relname = :name"
+        ), {"name": table.name}).one()
+        return {"table": row[0], "pk_index": row[1], "other_indexes": row[2] - row[1]}
+    pages = dict(conn.execute(text(
+        "SELECT s.name, sum(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+        "WHERE m.tbl_name = :name GROUP BY s.name"
+    ), {"name": table.name}).all())
+    pk = sum(size for name, size in pages.items() if name.startswith("sqlite_autoindex"))
+    return {
+        "table": pages.get(table.name, 0),
+        "pk_index": pk,
+        "other_indexes": sum(pages.values()) - pages.get(table.name, 0) - pk,
+    }
+
+
+def run_variant(name: str, column_type, generate, rows: int, keep: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    metadata = MetaData()
+    table = scratch_table(metadata, name, column_type)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    tag_ids = [str(generate()) for _ in range(200)]
+    expense_id = None
+    elapsed = 0.0
+    for start in range(0, rows, BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + BATCH_SIZE, rows)):
+            if i % 2 == 0:  # Two tags per expense, like the synthetic dataset
+                expense_id = str(generate())
+            batch.append({"id": str(generate()), "expense_id": expense_id, "tag_id": rng.choice(tag_ids)})
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+        elapsed += time.perf_counter() - t0
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {table.name}"))
+        result = {"variant": name, "rows_per_s": round(rows / elapsed), **sizes(conn, table)}
+    if not keep:
+        metadata.drop_all(engine)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text/UUID and v4/v7 primary keys")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch tables for inspection")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Database: {engine.dialect.name}, {args.rows} rows per variant\n")
+    print(f"{'variant':<10} {'rows/s':>10} {'table':>10} {'pk index':>10} {'other idx':>10}")
+    for name, column_type, generate in variants(engine.dialect.name):
+        result = run_variant(name, column_type, generate, args.rows, args.keep, args.seed)
+        print(f"{result['variant']:<10} {result['rows_per_s']:>10} "
+              + " ".join(f"{result[k] / 1024 / 1024:>8.1f}MB" for k in ("table", "pk_index", "other_indexes")))
+
+
+if __name__ == "__main__":
+    main()
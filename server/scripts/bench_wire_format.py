@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /sync/atomic request wire formats.
+
+Builds a large push (add-expense groups: tag + expense + link, plus updates
+and deletes) and compares JSON parsed the way the route does it (orjson +
+discriminated-union validation) with the coded MessagePack format decoded by
+app.wire_format (string code keys, validated without a Python pass), and with
+the older plain-integer keys (rewritten in Python first). Reports body size
+and parse time.
+
+Usage:
+    python scripts/bench_wire_format.py --operations 3000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+import msgpack  # noqa: E402
+import orjson  # noqa: E402
+
+from app.schemas_atomic import AtomicSyncRequest  # noqa: E402
+from app.wire_format import FIELD_NAMES, OPERATION_TYPE_NAMES, decode_atomic_request  # noqa: E402
+
+FIELD_CODES = {name: code for code, name in FIELD_NAMES.items()}
+TYPE_CODES = {name: code for code, name in OPERATION_TYPE_NAMES.items()}
+
+
+def build_payload(operations: int) -> dict:
+    groups = []
+    for i in range(operations // 5):
+        tag_id, expense_id = uuid.uuid4().hex, uuid.uuid4().hex
+        groups.append({"groupId": f"g{i}", "groupType": "expense", "operations": [
+            {"type": "create_tag", "name": f"tag-{i}", "monthlyAmount": 0, "currentMonth": 1,
+             "currentYear": 2025, "createdDay": 1, "createdMonth": 1, "createdYear": 2025, "clientId": tag_id},
+            {"type": "create_expense", "title": f"Expense {i}", "amount": 1000 + i, "year": 2025,
+             "month": 1, "date": 15, "clientId": expense_id},
+            {"type": "create_expense_tag", "expenseId": expense_id, "tagId": tag_id, "clientId": uuid.uuid4().hex},
+            {"type": "update_expense", "serverId": str(uuid.uuid4()), "title": f"Edited {i}", "amount": 2000,
+             "year": 2025, "month": 2, "date": 1},
+            {"type": "delete_target", "serverId": str(uuid.uuid4())},
+        ]})
+    return {"groups": groups, "clientTimestamp": int(time.time() * 1000), "deviceId": "bench"}
+
+
+def encode_msgpack(payload: dict, integer_keys: bool = False) -> bytes:
+    def encode(mapping):
+        encoded = {}
+        for key, value in mapping.items():
+            if key == "type":
+                value = TYPE_CODES[value]
+            elif key in ("groups", "operations"):
+                value = [encode(item) for item in value]
+            code = FIELD_CODES[key]
+            encoded[code if integer_keys else str(code)] = value
+        return encoded
+    return msgpack.packb(encode(payload), use_bin_type=True)
+
+
+def parse_json(body: bytes) -> AtomicSyncRequest:
+    return AtomicSyncRequest.model_validate(orjson.loads(body))
+
+
+def timed(label, fn, *args, repeat=20):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {best * 1000:>10.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark atomic sync wire formats")
+    parser.add_argument("--operations", type=int, default=3000, help="Operations in the push")
+    args = parser.parse_args()
+
+    payload = build_payload(args.operations)
+    json_body = json.dumps(payload).encode("utf-8")
+    msgpack_body = encode_msgpack(payload)
+    integer_body = encode_msgpack(payload, integer_keys=True)
+
+    print(f"JSON body:                  {len(json_body) / 1024:>8.1f} KiB")
+    for label, body in (("MessagePack body:", msgpack_body), ("MessagePack, integer keys:", integer_body)):
+        print(f"{label:<27} {len(body) / 1024:>8.1f} KiB ({len(body) / len(json_body):.0%})")
+
+    print("\nParsing")
+    json_time = timed("orjson + union validation", parse_json, json_body)
+    msgpack_time = timed("msgpack, coded keys", decode_atomic_request, msgpack_body)
+    integer_time = timed("msgpack, integer keys", decode_atomic_request, integer_body)
+
+    print(f"\nParse time vs JSON: {msgpack_time / json_time:.0%} (integer keys: {integer_time / json_time:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Build a bootstrap snapshot for /sync/snapshot (see app/services/snapshot_service.py).
+
+Usage:
+    python scripts/build_snapshot.py
+    python scripts/build_snapshot.py --dir ./data/snapshots
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from app.database import SessionLocal  # noqa: E402
+from app.services.snapshot_service import SnapshotService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a new bootstrap snapshot and prune old ones")
+    parser.add_argument("--dir", help="Override SNAPSHOT_DIR")
+    args = parser.parse_args()
+
+    snapshot = SnapshotService(args.dir).build(SessionLocal)
+    print(json.dumps({
+        "path": str(snapshot.path),
+        "watermark": snapshot.watermark,
+        "bytes": snapshot.path.stat().st_size,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
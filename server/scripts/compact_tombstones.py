@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Hard-delete tombstones past the purge horizon (see app/services/compaction_service.py).
+
+Usage:
+    python scripts/compact_tombstones.py --dry-run
+    python scripts/compact_tombstones.py --retention-days 30 --batch-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from app.database import SessionLocal  # noqa: E402
+from app.services.compaction_service import CompactionService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge old tombstones and orphaned entity mappings")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted")
+    parser.add_argument("--retention-days", type=int, help="Override TOMBSTONE_RETENTION_DAYS (ignores device watermarks)")
+    parser.add_argument("--batch-size", type=int, help="Override COMPACTION_BATCH_SIZE")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = CompactionService(db, batch_size=args.batch_size)
+        horizon = None
+        if args.retention_days is not None:
+            horizon = datetime.utcnow() - timedelta(days=args.retention_days)
+        report = service.run(horizon=horizon, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Explain the app's hot queries against a seeded database and flag full scans.
+
+Runs a catalogue of the query shapes the API issues (monthly totals, delta
+sync per table, expense listing, tag-side joins, idempotency lookups) with
+EXPLAIN (ANALYZE, BUFFERS) on PostgreSQL, or EXPLAIN QUERY PLAN on SQLite,
+and reports every sequential scan. Exits non-zero if any were found.
+Planners legitimately scan tiny tables (a handful of targets), so seed a
+realistic volume before reading too much into a flag.
+
+Usage:
+    DATABASE_URL=sqlite:///./bench.db python scripts/index_advisor.py --seed 100000
+    DATABASE_URL=postgresql://... python scripts/index_advisor.py
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from sqlalchemy import desc, func, select  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.models import (  # noqa: E402
+    Expense, Tag, Target, ExpenseTagsCrossRef, GraphEdge, EntityMapping, IdempotencyRecord
+)
+from app.sync_payloads import (  # noqa: E402
+    SYNC_ENTITY_SPECS, EXPENSE_SPEC, ARCHIVED_EXPENSE_SPEC, ARCHIVED_EXPENSE_TAG_SPEC
+)
+
+
+def catalogue(conn):
+    """(name, statement) for each query shape worth an index."""
+    now = datetime.utcnow()
+    since = now - timedelta(days=1)
+    some_tags = [row[0] for row in conn.execute(select(Tag.id).limit(3))] or ["missing"]
+    some_tag_name = conn.execute(select(Tag.tag).limit(1)).scalar() or "missing"
+
+    queries = [
+        ("stats: month total", select(func.sum(Expense.amount)).where(
+            Expense.year == now.year, Expense.month == now.month, Expense.deleted_at.is_(None))),
+        ("stats: live expense count", select(func.count(Expense.id)).where(Expense.deleted_at.is_(None))),
+        ("expenses: newest page", EXPENSE_SPEC.select().where(
+            Expense.deleted_at.is_(None)).order_by(desc(Expense.created_at)).limit(50)),
+        ("expenses: by tag", EXPENSE_SPEC.select().join(
+            ExpenseTagsCrossRef, ExpenseTagsCrossRef.expense_id == Expense.id).where(
+            Expense.deleted_at.is_(None), ExpenseTagsCrossRef.tag_id.in_(some_tags)
+        ).order_by(desc(Expense.created_at)).limit(50)),
+        ("tags: by name", select(Tag.id).where(Tag.tag == some_tag_name)),
+        ("targets: month", select(Target.id).where(Target.year == now.year, Target.month == now.month)),
+        ("graph: edges from tag", select(GraphEdge.id).where(GraphEdge.from_tag_id == some_tags[0])),
+        ("mappings: lookup", select(EntityMapping.server_id).where(
+            EntityMapping.entity_type == "expense", EntityMapping.client_id == "missing")),
+        ("idempotency: expired purge", select(IdempotencyRecord.key).where(IdempotencyRecord.expires_at < now)),
+    ]
+    for spec in SYNC_ENTITY_SPECS + (ARCHIVED_EXPENSE_SPEC, ARCHIVED_EXPENSE_TAG_SPEC):
+        model = spec.model
+        stmt = spec.select().where(model.updated_at > since)
+        if model in (Expense, Tag):
+            stmt = stmt.where(model.deleted_at.is_(None))
+        queries.append((f"delta sync: {model.__tablename__}", stmt))
+    return queries
+
+
+def compile_statement(stmt):
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return compiled.string, params
+
+
+def explain_postgres(conn, sql, params):
+    """Seq Scan nodes plus totals from EXPLAIN (ANALYZE, BUFFERS)."""
+    raw = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(f"Seq Scan on {node.get('Relation Name')} ({node.get('Actual Rows')} rows)")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    buffers = plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0)
+    return scans, f"{plan.get('Execution Time', 0):.2f}ms, {buffers} buffers"
+
+
+def explain_sqlite(conn, sql, params):
+    """Full table scans from EXPLAIN QUERY PLAN."""
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+    details = [row[-1] for row in rows]
+    scans = [d for d in details if d.startswith("SCAN ") and " USING " not in d]
+    return scans, "; ".join(details)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag sequential scans in the app's hot queries")
+    parser.add_argument("--seed", type=int, default=0, help="Seed this many synthetic expenses first")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not just the flagged ones")
+    args = parser.parse_args()
+
+    if args.seed:
+        from synthetic_data import seed_dataset
+        print(f"Seeded {seed_dataset(engine, args.seed)}")
+
+    dialect = engine.dialect.name
+    explain = explain_postgres if dialect == "postgresql" else explain_sqlite
+    flagged = 0
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")  # Fresh statistics, or the planner guesses
+        queries = catalogue(conn)
+        for name, stmt in queries:
+            sql, params = compile_statement(stmt)
+            scans, summary = explain(conn, sql, params)
+            if scans:
+                flagged += 1
+            print(f"{'SEQ SCAN' if scans else 'ok':<9} {name}")
+            for scan in scans:
+                print(f"          {scan}")
+            if args.verbose:
+                print(f"          {summary}")
+        conn.rollback()
+
+    print(f"\n{flagged} of {len(queries)} queries use a sequential scan" if flagged else "\nNo sequential scans")
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Seed a database with a synthetic FinanceHub dataset.
+
+Used by the benchmark and index-advisor scripts. Rows are written with Core
+executemany inserts so that 100k+ rows seed in a few seconds.
+
+Usage:
+    DATABASE_URL=sqlite:///./bench.db python scripts/synthetic_data.py --expenses 100000
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models import Expense, Tag, ExpenseTagsCrossRef, Target  # noqa: E402
+from app.utils.uuid7 import new_id  # noqa: E402
+
+WORDS = [
+    "coffee", "lunch", "dinner", "groceries", "fuel", "taxi", "bus", "rent",
+    "electricity", "water", "internet", "phone", "movie", "books", "gym",
+    "pharmacy", "doctor", "gift", "shoes", "shirt", "snacks", "bakery",
+    "market", "parking", "insurance", "repair", "subscription", "hotel",
+]
+
+BATCH_SIZE = 5000
+
+
+def _insert_batches(conn, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def seed_dataset(engine, expenses: int = 100_000, tags: int = 200, tags_per_expense: int = 2,
+                 years: int = 3, deleted_ratio: float = 0.05, seed: int = 42) -> dict:
+    """
+    Create tables and insert a synthetic dataset.
+    Returns the row counts that were written.
+    """
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=365 * years)
+    span_seconds = int((now - start).total_seconds())
+
+    tag_rows = []
+    for i in range(tags):
+        created = start + timedelta(seconds=rng.randrange(span_seconds))
+        tag_rows.append({
+            "id": new_id(),
+            "tag": f"{rng.choice(WORDS)}-{i}",
+            "monthly_amount": 0,
+            "current_month": created.month,
+            "current_year": created.year,
+            "created_day": created.day,
+            "created_month": created.month,
+            "created_year": created.year,
+            "created_at": created,
+            "updated_at": created,
+        })
+    tag_ids = [row["id"] for row in tag_rows]
+
+    expense_rows = []
+    link_rows = []
+    for _ in range(expenses):
+        created = start + timedelta(seconds=rng.randrange(span_seconds))
+        expense_id = new_id()
+        expense_rows.append({
+            "id": expense_id,
+            "title": " ".join(rng.sample(WORDS, rng.randint(1, 3))),
+            "amount": rng.randint(50, 50_000),
+            "year": created.year,
+            "month": created.month,
+            "date": created.day,
+            "created_at": created,
+            "updated_at": created,
+            "deleted_at": created if rng.random() < deleted_ratio else None,
+        })
+        for tag_id in rng.sample(tag_ids, min(tags_per_expense, len(tag_ids))):
+            link_rows.append({
+                **({} if settings.compact_link_tables else {"id": new_id()}),
+                "expense_id": expense_id,
+                "tag_id": tag_id,
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    target_rows = []
+    for tag_id in tag_ids[: max(1, tags // 10)]:
+        target_rows.append({
+            "id": new_id(),
+            "month": now.month,
+            "year": now.year,
+            "tag_id": tag_id,
+            "amount": rng.randint(1_000, 100_000),
+            "spent": 0,
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    with engine.begin() as conn:
+        _insert_batches(conn, Tag.__table__, tag_rows)
+        _insert_batches(conn, Expense.__table__, expense_rows)
+        _insert_batches(conn, ExpenseTagsCrossRef.__table__, link_rows)
+        _insert_batches(conn, Target.__table__, target_rows)
+
+    return {
+        "tags": len(tag_rows),
+        "expenses": len(expense_rows),
+        "expense_tags": len(link_rows),
+        "targets": len(target_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic FinanceHub dataset")
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--tags-per-expense", type=int, default=2)
+    args = parser.parse_args()
+
+    from app.database import engine
+    counts = seed_dataset(engine, args.expenses, args.tags, args.tags_per_expense)
+    print(f"✅ Seeded {counts}")
+
+
+if __name__ == "__main__":
+    main()
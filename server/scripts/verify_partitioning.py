@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Verify the year-partitioned expenses table on PostgreSQL.
+
+Checks that `expenses` is partitioned, that row counts match the
+pre-migration copy (if still present), that a monthly query is pruned to a
+single partition, and that changing an expense's year moves the row
+(inside a rolled-back transaction).
+
+Against a throwaway container:
+    docker run -d --name fh-pg -e POSTGRES_PASSWORD=pg -p 5433:5432 postgres:15-alpine
+    export DATABASE_URL=postgresql://postgres:pg@localhost:5433/postgres
+    python -c "from app.database import create_tables; create_tables()"
+    DATABASE_URL=$DATABASE_URL python scripts/synthetic_data.py --expenses 20000
+    psql "$DATABASE_URL" -f migrations/optional/001_partition_expenses_by_year.sql
+    python scripts/verify_partitioning.py
+"""
+import json
+import os
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.services.partition_service import PartitionService  # noqa: E402
+
+
+def scanned_relations(plan: dict) -> set:
+    names = set()
+    if "Relation Name" in plan:
+        names.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        names |= scanned_relations(child)
+    return names
+
+
+def check(label: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'PASS' if ok else 'FAIL'}  {label}{f' - {detail}' if detail else ''}")
+    return ok
+
+
+def main() -> int:
+    if not os.environ.get("DATABASE_URL", "").startswith("postgresql"):
+        print("DATABASE_URL must point at PostgreSQL")
+        return 2
+
+    db = SessionLocal()
+    service = PartitionService(db)
+    results = []
+    try:
+        results.append(check("expenses is partitioned", service.is_partitioned()))
+        if not results[-1]:
+            return 1
+
+        partitions = service.list_partitions()
+        for partition in partitions:
+            print(f"      {partition['name']:<24} {partition['bounds']:<40} ~{partition['estimated_rows']} rows")
+
+        if db.execute(text("SELECT to_regclass('expenses_unpartitioned')")).scalar():
+            before = db.execute(text("SELECT count(*) FROM expenses_unpartitioned")).scalar()
+            after = db.execute(text("SELECT count(*) FROM expenses")).scalar()
+            results.append(check("row counts match", before == after, f"{before} before, {after} after"))
+
+        year, month = db.execute(text(
+            "SELECT year, month FROM expenses GROUP BY year, month ORDER BY count(*) DESC LIMIT 1"
+        )).first() or (2025, 1)
+        plan = db.execute(text(
+            "EXPLAIN (FORMAT JSON) SELECT sum(amount) FROM expenses "
+            "WHERE year = :year AND month = :month AND deleted_at IS NULL"
+        ), {"year": year, "month": month}).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scanned = scanned_relations(plan[0]["Plan"])
+        results.append(check("monthly query prunes to one partition", len(scanned) == 1, ", ".join(sorted(scanned))))
+
+        # Row movement across partitions, rolled back
+        db.execute(text("SELECT ensure_expense_partition(:year)"), {"year": year + 1})
+        expense_id = str(uuid.uuid4())
+        db.execute(text(
+            "INSERT INTO expenses (id, title, amount, year, month, date) "
+            "VALUES (:id, 'partition check', 1, :year, 1, 1)"
+        ), {"id": expense_id, "year": year})
+        db.execute(text("UPDATE expenses SET year = :year WHERE id = :id"), {"id": expense_id, "year": year + 1})
+        moved_to = db.execute(text(
+            "SELECT tableoid::regclass::text FROM expenses WHERE id = :id"
+        ), {"id": expense_id}).scalar()
+        results.append(check("year change moves the row", moved_to == f"expenses_y{year + 1}", moved_to or "missing"))
+        db.rollback()
+    finally:
+        db.close()
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Shared fixtures.
+
+The app runs against a scratch database: a temporary SQLite file by default,
+or the (empty, disposable) database in TEST_DATABASE_URL, e.g.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/financehub_test python -m pytest
+
+Tests marked `postgres` are skipped on SQLite. Every table is emptied after
+each test.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_SCRATCH = tempfile.mkdtemp(prefix="financehub-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_SCRATCH}/test.db"
+os.environ["SNAPSHOT_DIR"] = f"{_SCRATCH}/snapshots"
+os.environ.setdefault("DEBUG", "true")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import (  # noqa: E402
+    Expense, Tag, Target, ExpenseTagsCrossRef,
+    GraphEdge, WishlistItem, WishlistTagsCrossRef
+)
+
+IS_POSTGRES = engine.dialect.name == "postgresql"
+
+
+def pytest_collection_modifyitems(config, items):
+    if IS_POSTGRES:
+        return
+    skip = pytest.mark.skip(reason="needs TEST_DATABASE_URL pointing at PostgreSQL")
+    for item in items:
+        if "postgres" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(autouse=True)
+def _empty_tables(request):
+    yield
+    if "client" not in request.fixturenames and "db" not in request.fixturenames:
+        return
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+
+
+@pytest.fixture
+def seeded(db):
+    """One row of every synced entity type; returns their ids."""
+    groceries = Tag(tag="groceries", monthly_amount=500, current_month=3, current_year=2025,
+                    created_day=1, created_month=3, created_year=2025)
+    rent = Tag(tag="rent", monthly_amount=1000, current_month=3, current_year=2025)
+    expense = Expense(title="Weekly shop", amount=42, year=2025, month=3, date=14)
+    wish = WishlistItem(name="Blender", min_price=50, max_price=80)
+    db.add_all([groceries, rent, expense, wish])
+    db.flush()
+    link = ExpenseTagsCrossRef(expense_id=expense.id, tag_id=groceries.id)
+    target = Target(tag_id=groceries.id, month=3, year=2025, amount=400, spent=42)
+    edge = GraphEdge(from_tag_id=groceries.id, to_tag_id=rent.id, weight=2)
+    wish_link = WishlistTagsCrossRef(wishlist_id=wish.id, tag_id=groceries.id)
+    db.add_all([link, target, edge, wish_link])
+    db.commit()
+    return {
+        "expense": expense.id, "tag": groceries.id, "other_tag": rent.id, "expense_tag": link.id,
+        "target": target.id, "graph_edge": edge.id, "wishlist": wish.id, "wishlist_tag": wish_link.id,
+    }
@@ -0,0 +1,75 @@
+"""Builders for /sync/atomic request bodies (camelCase, as the app sends them)."""
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+
+def new_client_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_tag(name: str, client_id: Optional[str] = None, **fields) -> Dict[str, Any]:
+    return {
+        "type": "create_tag", "name": name, "monthlyAmount": 0, "currentMonth": 1, "currentYear": 2025,
+        "createdDay": 1, "createdMonth": 1, "createdYear": 2025,
+        "clientId": client_id or new_client_id(), **fields,
+    }
+
+
+def update_tag(server_id: str, name: str, **fields) -> Dict[str, Any]:
+    return {
+        "type": "update_tag", "serverId": server_id, "name": name,
+        "monthlyAmount": 0, "currentMonth": 1, "currentYear": 2025, **fields,
+    }
+
+
+def delete_tag(server_id: str, **fields) -> Dict[str, Any]:
+    return {"type": "delete_tag", "serverId": server_id, **fields}
+
+
+def create_expense(title: str = "Coffee", client_id: Optional[str] = None, **fields) -> Dict[str, Any]:
+    return {
+        "type": "create_expense", "title": title, "amount": 100, "year": 2025, "month": 1, "date": 2,
+        "clientId": client_id or new_client_id(), **fields,
+    }
+
+
+def update_expense(server_id: str, title: str = "Coffee", **fields) -> Dict[str, Any]:
+    return {
+        "type": "update_expense", "serverId": server_id, "title": title,
+        "amount": 100, "year": 2025, "month": 1, "date": 2, **fields,
+    }
+
+
+def delete_expense(server_id: str, **fields) -> Dict[str, Any]:
+    return {"type": "delete_expense", "serverId": server_id, **fields}
+
+
+def create_expense_tag(expense_id: str, tag_id: str, client_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "type": "create_expense_tag", "expenseId": expense_id, "tagId": tag_id,
+        "clientId": client_id or new_client_id(),
+    }
+
+
+def delete_expense_tag(server_id: str) -> Dict[str, Any]:
+    return {"type": "delete_expense_tag", "serverId": server_id}
+
+
+def group(*operations, group_type: str = "expense", group_id: Optional[str] = None) -> Dict[str, Any]:
+    return {"groupId": group_id or new_client_id(), "groupType": group_type, "operations": list(operations)}
+
+
+def atomic_request(*groups, device_id: Optional[str] = None) -> Dict[str, Any]:
+    body = {"groups": list(groups), "clientTimestamp": int(time.time() * 1000)}
+    if device_id is not None:
+        body["deviceId"] = device_id
+    return body
+
+
+def mapping(result: Dict[str, Any], entity_type: str, client_id: str) -> str:
+    """Server id given to `client_id` in one group result."""
+    for item in result["entityMappings"]:
+        if item["entityType"] == entity_type and item["clientId"] == client_id:
+            return item["serverId"]
+    raise KeyError(f"{entity_type} {client_id} not in {result['entityMappings']}")
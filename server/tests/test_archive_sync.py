@@ -0,0 +1,71 @@
+import gzip
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ArchivedExpense, Expense
+from app.services.archive_service import ArchiveService
+from app.services.snapshot_service import SnapshotService
+from factories import atomic_request, group, update_expense
+
+
+@pytest.fixture
+def archived(db, seeded):
+    report = ArchiveService(db).archive(datetime.utcnow() + timedelta(days=1))
+    assert report["expenses"] == 1 and report["expense_tags"] == 1
+    assert db.query(Expense).count() == 0
+    return seeded
+
+
+def ids(items):
+    return [item["id"] for item in items]
+
+
+def test_updated_data_includes_archive(client, archived):
+    payload = client.get("/api/v1/sync/updated-data?since=0").json()
+    assert ids(payload["expenses"]) == [archived["expense"]]
+    assert ids(payload["expenseTags"]) == [archived["expense_tag"]]
+    assert payload["expenses"][0]["title"] == "Weekly shop" and payload["expenses"][0]["version"] == 1
+
+    # Archived rows did not change after `since`
+    later = client.get(f"/api/v1/sync/updated-data?since={int(datetime.utcnow().timestamp() * 1000) + 60_000}").json()
+    assert later["expenses"] == [] and later["expenseTags"] == []
+
+
+@pytest.mark.postgres
+def test_sql_built_updated_data_joins_archive_lists(client, archived, monkeypatch):
+    monkeypatch.setattr(settings, "sync_sql_json", True)
+    payload = client.get("/api/v1/sync/updated-data?since=0").json()
+    assert ids(payload["expenses"]) == [archived["expense"]]
+    assert ids(payload["expenseTags"]) == [archived["expense_tag"]]
+    assert client.post("/api/v1/sync/full").json()["expenses"][0]["id"] == archived["expense"]
+
+
+def test_full_and_delta_include_archive(client, archived):
+    assert ids(client.post("/api/v1/sync/full").json()["expenses"]) == [archived["expense"]]
+    assert ids(client.get("/api/v1/sync/delta").json()["expenses"]) == [archived["expense"]]
+
+
+def test_snapshot_includes_archive(archived, tmp_path):
+    snapshot = SnapshotService(str(tmp_path)).build(SessionLocal)
+    with gzip.open(snapshot.path) as lines:
+        records = [orjson.loads(line) for line in lines]
+    rows = {}
+    for record in records[1:-1]:
+        rows.setdefault(record["type"], []).append(record["data"]["id"])
+    assert rows["expenses"] == [archived["expense"]]
+    assert rows["expenseTags"] == [archived["expense_tag"]]
+    assert records[-1]["counts"]["expenses"] == records[-1]["counts"]["expenseTags"] == 1
+
+
+def test_restored_expense_is_sent_once(client, db, archived):
+    result = client.post("/api/v1/sync/atomic", json=atomic_request(group(update_expense(archived["expense"], "Edited"))))
+    assert result.json()["groupResults"][0]["success"]
+    assert db.query(ArchivedExpense).count() == 0
+
+    payload = client.get("/api/v1/sync/updated-data?since=0").json()
+    assert [(e["id"], e["title"]) for e in payload["expenses"]] == [(archived["expense"], "Edited")]
+    assert ids(payload["expenseTags"]) == [archived["expense_tag"]]
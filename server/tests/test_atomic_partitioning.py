@@ -0,0 +1,72 @@
+import pytest
+
+from app.config import settings
+from app.models import Expense
+from app.schemas_atomic import AtomicSyncRequest
+from app.services.atomic_sync_service import AtomicSyncService, partition_groups
+from app.services.idempotency_service import IdempotencyService
+from factories import (
+    atomic_request, create_expense, create_expense_tag, create_tag, group, mapping,
+    new_client_id, update_expense, update_tag
+)
+
+
+def groups_of(*groups):
+    return AtomicSyncRequest.model_validate(atomic_request(*groups)).groups
+
+
+def test_groups_sharing_an_entity_or_tag_name_share_a_partition():
+    expense = new_client_id()
+    groups = groups_of(
+        group(create_expense(client_id=expense)),
+        group(create_tag("travel")),
+        group(create_expense_tag(expense, new_client_id())),
+        group(update_tag("server-tag", "travel")),
+        group(create_expense()),
+    )
+    assert partition_groups(groups) == [[0, 2], [1, 3], [4]]
+
+
+def test_mapped_client_id_joins_the_server_id_partition():
+    client_id, server_id = new_client_id(), "server-expense"
+    groups = groups_of(
+        group(update_expense(server_id, "Edited")),
+        group(create_expense_tag(client_id, new_client_id())),
+    )
+    assert partition_groups(groups) == [[0], [1]]
+    assert partition_groups(groups, {client_id: server_id}) == [[0, 1]]
+
+
+def test_mappings_are_read_from_earlier_requests(client, db):
+    expense = create_expense()
+    result = client.post("/api/v1/sync/atomic", json=atomic_request(group(expense))).json()["groupResults"][0]
+    server_id = mapping(result, "expense", expense["clientId"])
+
+    groups = groups_of(
+        group(update_expense(server_id, "Edited")),
+        group(create_expense_tag(expense["clientId"], new_client_id())),
+    )
+    aliases = AtomicSyncService(db)._mapped_server_ids(groups)
+    assert aliases == {expense["clientId"]: server_id}
+    assert partition_groups(groups, aliases) == [[0, 1]]
+
+
+@pytest.mark.postgres
+def test_parallel_retry_after_failed_idempotency_commit_does_not_duplicate(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "atomic_sync_parallel_workers", 4)
+    body = atomic_request(*(group(create_expense(f"Expense {i}")) for i in range(4)), device_id="phone")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("idempotency store failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(IdempotencyService, "store", fail)
+        assert client.post("/api/v1/sync/atomic", json=body).status_code == 500
+    # Documented limitation: the workers already committed their groups
+    assert db.query(Expense).count() == 4
+
+    retry = client.post("/api/v1/sync/atomic", json=body)
+    assert retry.status_code == 200 and "Idempotent-Replayed" not in retry.headers
+    assert all(result["success"] for result in retry.json()["groupResults"])
+    assert db.query(Expense).count() == 4
+    assert client.post("/api/v1/sync/atomic", json=body).headers["Idempotent-Replayed"] == "true"
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from app.change_notifier import ChangeNotifier, notifier
+from app.routes.notifications import stream_changes
+from factories import atomic_request, create_tag, group
+
+
+def test_wait_returns_at_once_when_token_is_newer():
+    waiting = ChangeNotifier()
+    assert asyncio.run(waiting.wait(waiting.token - 1, timeout=5)) == waiting.token
+
+
+def test_notify_from_another_thread_wakes_waiter():
+    waiting = ChangeNotifier()
+    since = waiting.token
+
+    async def wait():
+        threading.Timer(0.05, waiting.notify, args=({"tags"},)).start()
+        return await waiting.wait(since, timeout=5)
+
+    assert asyncio.run(wait()) > since
+
+
+def test_wait_times_out_without_changes():
+    waiting = ChangeNotifier()
+    assert asyncio.run(waiting.wait(waiting.token, timeout=0.05)) == waiting.token
+
+
+def test_long_poll_reports_committed_writes(client):
+    token = client.get(f"/api/v1/sync/wait?since={notifier.token}&timeout=0").json()["token"]
+    assert client.get(f"/api/v1/sync/wait?since={token}&timeout=0").json() == {"token": token, "changed": False}
+
+    client.post("/api/v1/sync/atomic", json=atomic_request(group(create_tag("travel"), group_type="tag")))
+    after = client.get(f"/api/v1/sync/wait?since={token}&timeout=0").json()
+    assert after["changed"] and after["token"] > token
+
+
+class _Client:
+    """Stands in for the Request of an SSE client that stays connected."""
+    headers = {}
+
+    async def is_disconnected(self):
+        return False
+
+
+def test_event_stream_sends_one_event_per_change():
+    async def read():
+        since = notifier.token
+        response = await stream_changes(_Client(), since=since)
+        events = response.body_iterator
+        assert await events.__anext__() == "retry: 5000\n\n"
+        threading.Timer(0.05, notifier.notify, args=({"tags"},)).start()
+        event = await events.__anext__()
+        await events.aclose()
+        return since, event
+
+    since, event = asyncio.run(read())
+    assert event.startswith(f"id: {notifier.token}\nevent: change\n") and notifier.token > since
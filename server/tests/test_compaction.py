@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from app.models import EntityMapping, Expense, ExpenseTagsCrossRef, GraphEdge, Tag, Target
+from app.services.compaction_service import CompactionService
+from app.services.device_sync_service import DeviceSyncService
+
+LONG_AGO = datetime.utcnow() - timedelta(days=365)
+
+
+def tombstone(db, model, entity_id, when=LONG_AGO):
+    db.get(model, entity_id).deleted_at = when
+    db.commit()
+
+
+def test_purges_old_tombstones_with_their_dependents(db, seeded):
+    tombstone(db, Tag, seeded["tag"])
+    db.add(EntityMapping(entity_type="tag", client_id="client-groceries", server_id=seeded["tag"]))
+    db.add(EntityMapping(entity_type="expense", client_id="client-gone", server_id="no-such-expense"))
+    db.commit()
+
+    report = CompactionService(db, batch_size=1).run()
+    db.expire_all()
+
+    assert report["deleted"] == {
+        "tags": 1, "expense_tags": 1, "targets": 1, "graph_edges": 1,
+        "wishlist_tags": 1, "entity_mappings": 2,
+    }
+    assert db.get(Tag, seeded["tag"]) is None
+    assert db.get(Expense, seeded["expense"]) is not None
+    assert db.query(ExpenseTagsCrossRef).count() == db.query(Target).count() == db.query(GraphEdge).count() == 0
+    assert db.query(EntityMapping).count() == 0
+
+
+def test_dry_run_and_recent_tombstones_keep_rows(db, seeded):
+    tombstone(db, Expense, seeded["expense"])
+    tombstone(db, Tag, seeded["other_tag"], when=datetime.utcnow())
+
+    report = CompactionService(db).run(dry_run=True)
+    assert report["dry_run"] and report["deleted"] == {"expenses": 1, "expense_tags": 1}
+    assert db.get(Expense, seeded["expense"]) is not None
+
+    CompactionService(db).run()
+    db.expire_all()
+    assert db.get(Expense, seeded["expense"]) is None
+    assert db.get(Tag, seeded["other_tag"]) is not None
+
+
+def test_active_device_holds_back_the_horizon(db, seeded):
+    tombstone(db, Expense, seeded["expense"])
+    behind = int((LONG_AGO - timedelta(days=1) - datetime(1970, 1, 1)).total_seconds() * 1000)
+    DeviceSyncService(db).record("old-phone", behind)
+    db.commit()
+
+    assert CompactionService(db).run()["deleted"] == {}
+    assert db.get(Expense, seeded["expense"]) is not None
@@ -0,0 +1,132 @@
+import gzip
+import json
+import zlib
+
+import brotli
+import pytest
+import zstandard
+
+from app.compression import RequestTooLarge, _gunzip, _unbrotli, _unzstd, negotiate_encoding
+from app.models import Tag
+from factories import atomic_request, create_tag, group
+
+DECOMPRESS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 26),
+}
+COMPRESS = {
+    "gzip": gzip.compress,
+    "br": brotli.compress,
+    "zstd": lambda data: zstandard.ZstdCompressor().compress(data),
+}
+DECODERS = {"gzip": _gunzip, "br": _unbrotli, "zstd": _unzstd}
+
+# 64 MiB of zeros: a few KiB compressed, far above MAX_DECOMPRESSED_REQUEST_SIZE
+BOMB_SIZE = 64 * 1024 * 1024
+
+
+def _raw_get(client, url, accept_encoding):
+    with client.stream("GET", url, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_negotiation_prefers_the_server_order_among_accepted():
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate_encoding("gzip, br", supported) == "br"
+    assert negotiate_encoding("gzip;q=1, zstd;q=0", supported) == "gzip"
+    assert negotiate_encoding("identity", supported) is None
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_large_responses_are_compressed(client, db, encoding):
+    db.add_all([Tag(tag=f"tag-{i:03}") for i in range(100)])
+    db.commit()
+
+    response, raw = _raw_get(client, "/api/v1/sync/updated-data?since=0", encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(json.loads(DECOMPRESS[encoding](raw))["tags"]) == 100
+
+
+def test_small_responses_are_sent_as_is(client):
+    response, raw = _raw_get(client, "/health", "gzip")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw)["status"] == "healthy"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compressed_upload_is_accepted(client, encoding):
+    body = json.dumps(atomic_request(group(create_tag("compressed"), group_type="tag"))).encode()
+    response = client.post(
+        "/api/v1/sync/atomic", content=COMPRESS[encoding](body),
+        headers={"Content-Type": "application/json", "Content-Encoding": encoding}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["groupResults"][0]["success"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compression_bomb_is_rejected(client, encoding):
+    response = client.post(
+        "/api/v1/sync/atomic", content=COMPRESS[encoding](b"\0" * BOMB_SIZE),
+        headers={"Content-Type": "application/json", "Content-Encoding": encoding}
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_decoders_stop_at_the_limit(encoding):
+    decode = DECODERS[encoding]
+    assert decode(COMPRESS[encoding](b"x" * 1000), 1000) == b"x" * 1000
+    with pytest.raises(RequestTooLarge):
+        decode(COMPRESS[encoding](b"x" * 1001), 1000)
+
+
+def test_brotli_bomb_output_stays_bounded(monkeypatch):
+    # Every process() call must be capped, not only checked afterwards;
+    # brotli may overshoot by one buffer growth step, never by the whole bomb
+    bomb = brotli.compress(b"\0" * BOMB_SIZE, quality=5)
+    largest = 0
+    real = brotli.Decompressor
+
+    class Watched:
+        def __init__(self):
+            self._obj = real()
+
+        def process(self, data, **kwargs):
+            nonlocal largest
+            out = self._obj.process(data, **kwargs)
+            largest = max(largest, len(out))
+            return out
+
+        def can_accept_more_data(self):
+            return self._obj.can_accept_more_data()
+
+        def is_finished(self):
+            return self._obj.is_finished()
+
+    monkeypatch.setattr(brotli, "Decompressor", Watched)
+    with pytest.raises(RequestTooLarge):
+        _unbrotli(bomb, 1024 * 1024)
+    assert largest < 4 * 1024 * 1024
+
+
+def test_corrupt_body_is_a_bad_request(client):
+    response = client.post(
+        "/api/v1/sync/atomic", content=b"not gzip at all",
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 400
+    for truncated in (gzip.compress(b'{"groups": []}' * 100)[:-12], zlib.compress(b'{"groups": []}' * 100)[:-8]):
+        response = client.post(
+            "/api/v1/sync/atomic", content=truncated,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        )
+        assert response.status_code == 400
+    truncated = brotli.compress(b'{"groups": []}' * 100)[:-4]
+    response = client.post(
+        "/api/v1/sync/atomic", content=truncated,
+        headers={"Content-Type": "application/json", "Content-Encoding": "br"}
+    )
+    assert response.status_code == 400
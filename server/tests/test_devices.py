@@ -0,0 +1,38 @@
+import time
+
+from app.services.device_sync_service import now_ms
+
+
+def devices(client):
+    return {state["deviceId"]: state for state in client.get("/api/v1/sync/devices").json()}
+
+
+def test_lag_is_null_until_first_ack(client):
+    client.post("/api/v1/sync/atomic", json={"groups": [], "clientTimestamp": now_ms(), "deviceId": "new-phone"})
+    state = devices(client)["new-phone"]
+    assert state["acknowledgedUntil"] == 0 and state["lagMs"] is None
+
+    watermark = now_ms() - 5000
+    acked = client.post("/api/v1/sync/ack", json={"deviceId": "new-phone", "watermark": watermark}).json()
+    assert acked["acknowledgedUntil"] == watermark
+    assert 5000 <= acked["lagMs"] < 60_000
+
+
+def test_pull_records_and_resumes_from_watermark(client):
+    since = now_ms() - 1000
+    pulled = client.get(f"/api/v1/sync/updated-data?device_id=tablet&since={since}")
+    assert pulled.status_code == 200
+    assert devices(client)["tablet"]["acknowledgedUntil"] == since
+
+    # A watermark never moves backwards, and omitting since resumes from it
+    client.post("/api/v1/sync/ack", json={"deviceId": "tablet", "watermark": since - 500})
+    assert devices(client)["tablet"]["acknowledgedUntil"] == since
+    assert client.get("/api/v1/sync/updated-data?device_id=tablet").status_code == 200
+    assert int(pulled.headers["X-Sync-Watermark"]) <= int(time.time() * 1000)
+
+
+def test_updated_data_without_since_or_device_is_a_validation_error(client):
+    response = client.get("/api/v1/sync/updated-data")
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert error["type"] == "missing" and error["loc"] == ["query", "since"]
@@ -0,0 +1,60 @@
+from app.change_tracking import change_tracker
+from app.config import settings
+from app.models import Tag
+from factories import atomic_request, create_tag, group
+
+
+def revalidate(client, url, etag, **headers):
+    return client.get(url, headers={"If-None-Match": etag, **headers})
+
+
+def test_unchanged_tags_answer_304(client, seeded):
+    first = client.get("/api/v1/tags")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith("W/")
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = revalidate(client, "/api/v1/tags", etag)
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag and cached.content == b""
+    # Strong form and lists match too
+    assert revalidate(client, "/api/v1/tags", f'"x", {etag[2:]}').status_code == 304
+    # The query string and Accept are part of the tag
+    assert revalidate(client, "/api/v1/tags?limit=5", etag).status_code == 200
+    assert revalidate(client, "/api/v1/tags", etag, Accept="application/msgpack").status_code == 200
+
+
+def test_commit_changes_only_the_tables_it_wrote(client, seeded):
+    tags = client.get("/api/v1/tags").headers["ETag"]
+    targets = client.get("/api/v1/targets").headers["ETag"]
+    updated = client.get("/api/v1/sync/updated-data?since=0").headers["ETag"]
+
+    response = client.post("/api/v1/sync/atomic", json=atomic_request(group(create_tag("travel"), group_type="tag")))
+    assert response.json()["groupResults"][0]["success"]
+
+    assert revalidate(client, "/api/v1/tags", tags).status_code == 200
+    assert revalidate(client, "/api/v1/sync/updated-data?since=0", updated).status_code == 200
+    assert revalidate(client, "/api/v1/targets", targets).status_code == 304
+
+
+def test_rollbacks_and_savepoints_do_not_bump(db):
+    before = change_tracker.version(Tag.__tablename__)
+
+    db.add(Tag(tag="discarded", monthly_amount=0, current_month=1, current_year=2025))
+    db.flush()
+    db.rollback()
+    assert change_tracker.version(Tag.__tablename__) == before
+
+    with db.begin_nested():
+        db.add(Tag(tag="kept", monthly_amount=0, current_month=1, current_year=2025))
+    # Savepoint released, outer transaction still open
+    assert change_tracker.version(Tag.__tablename__) == before
+    db.commit()
+    assert change_tracker.version(Tag.__tablename__) == before + 1
+
+
+def test_disabled_etags(client, seeded, monkeypatch):
+    monkeypatch.setattr(settings, "etag_enabled", False)
+    response = client.get("/api/v1/tags", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Expense, ExpenseTagsCrossRef, Tag
+from app.services.archive_service import ArchiveService
+
+START = datetime(2025, 1, 1, 12)
+
+
+@pytest.fixture
+def listed(db):
+    """Seven expenses a day apart (two sharing a timestamp) and their tags."""
+    food = Tag(tag="food", monthly_amount=0, current_month=1, current_year=2025)
+    fuel = Tag(tag="fuel", monthly_amount=0, current_month=1, current_year=2025)
+    db.add_all([food, fuel])
+    db.flush()
+    expenses = []
+    for day in range(7):
+        created = START + timedelta(days=min(day, 5))
+        expense = Expense(title=f"Expense {day}", amount=day + 1, year=2025, month=1, date=created.day,
+                          created_at=created, updated_at=created)
+        db.add(expense)
+        db.flush()
+        tags = [food, fuel] if day % 3 == 0 else [food] if day % 3 == 1 else []
+        db.add_all(ExpenseTagsCrossRef(expense_id=expense.id, tag_id=tag.id) for tag in tags)
+        expenses.append(expense.id)
+    db.commit()
+    return {"expenses": expenses, "food": food.id, "fuel": fuel.id}
+
+
+def walk(client, query=""):
+    """Every page of a listing, following X-Next-Cursor."""
+    pages, url = [], f"/api/v1/expenses?limit=2{query}"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append([expense["id"] for expense in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        url = cursor and f"/api/v1/expenses?limit=2{query}&cursor={cursor}"
+    return pages
+
+
+def newest_first(db, ids):
+    rows = db.query(Expense.id, Expense.created_at).filter(Expense.id.in_(ids)).all()
+    return [row.id for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)]
+
+
+def test_cursor_pages_cover_every_expense_once(client, db, listed):
+    pages = walk(client)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert sum(pages, []) == newest_first(db, listed["expenses"])
+
+
+def test_cursor_continues_into_the_archive(client, db, listed):
+    ordered = newest_first(db, listed["expenses"])  # While every row is still live
+    ArchiveService(db).archive(START + timedelta(days=3))
+    assert db.query(Expense).count() == 4
+    assert sum(walk(client), []) == ordered
+
+
+def test_tag_match_any_and_all(client, listed):
+    ids = listed["expenses"]
+    food_or_fuel = sum(walk(client, f"&tag_ids={listed['food']},{listed['fuel']}"), [])
+    assert sorted(food_or_fuel) == sorted(ids[day] for day in (0, 1, 3, 4, 6))
+    food_and_fuel = sum(walk(client, f"&tag_ids={listed['food']},{listed['fuel']}&tag_match=all"), [])
+    assert sorted(food_and_fuel) == sorted(ids[day] for day in (0, 3, 6))
+
+
+def test_sparse_fields(client, listed):
+    expenses = client.get("/api/v1/expenses?fields=title,amount&limit=1").json()
+    assert expenses == [{"title": "Expense 6", "amount": 7}]
+
+
+def test_bad_cursor_and_fields_are_rejected(client):
+    assert client.get("/api/v1/expenses?cursor=not-a-cursor").status_code == 400
+    assert client.get("/api/v1/expenses?fields=title,password").json()["detail"] == "Unknown fields: password"
@@ -0,0 +1,48 @@
+from app.models import Expense
+from app.services.idempotency_service import response_cache
+from factories import atomic_request, create_expense, group, update_expense
+
+URL = "/api/v1/sync/atomic"
+
+
+def test_explicit_key_replays_stored_response(client, db):
+    body = atomic_request(group(create_expense("Coffee")))
+    headers = {"Idempotency-Key": "push-1"}
+    first = client.post(URL, json=body, headers=headers)
+    assert first.status_code == 200 and "Idempotent-Replayed" not in first.headers
+
+    replay = client.post(URL, json=body, headers=headers)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert db.query(Expense).count() == 1
+
+    # From the table once the in-memory copy is gone
+    response_cache.clear()
+    again = client.post(URL, json=body, headers=headers)
+    assert again.headers["Idempotent-Replayed"] == "true" and again.json() == first.json()
+
+
+def test_explicit_key_with_another_body_is_rejected(client):
+    client.post(URL, json=atomic_request(group(create_expense("Coffee"))), headers={"Idempotency-Key": "push-2"})
+    conflict = client.post(URL, json=atomic_request(group(create_expense("Tea"))), headers={"Idempotency-Key": "push-2"})
+    assert conflict.status_code == 422
+
+
+def test_device_and_timestamp_key(client, db):
+    body = atomic_request(group(create_expense("Coffee")), device_id="phone")
+    client.post(URL, json=body)
+    assert client.post(URL, json=body).headers["Idempotent-Replayed"] == "true"
+
+    # A derived key matching another body is a miss, not a conflict
+    other = {**body, "groups": [group(create_expense("Tea"))]}
+    response = client.post(URL, json=other)
+    assert response.status_code == 200 and "Idempotent-Replayed" not in response.headers
+    assert db.query(Expense).count() == 2
+
+
+def test_failed_groups_are_not_stored(client):
+    body = atomic_request(group(update_expense("missing-expense", "Gone")))
+    headers = {"Idempotency-Key": "push-3"}
+    assert not client.post(URL, json=body, headers=headers).json()["groupResults"][0]["success"]
+    retry = client.post(URL, json=body, headers=headers)
+    assert "Idempotent-Replayed" not in retry.headers
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.database import engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from index_advisor import catalogue, compile_statement, explain_postgres, explain_sqlite  # noqa: E402
+from synthetic_data import seed_dataset  # noqa: E402
+
+
+@pytest.fixture
+def plans(db):
+    """
+    Every catalogued query shape explained against a seeded database.
+
+    A test-sized dataset is small enough that a scan is genuinely cheapest,
+    so the planners are steered towards indexes: PostgreSQL with
+    enable_seqscan off, SQLite by leaving its tables un-ANALYZEd. A scan that
+    survives means no usable index exists.
+    """
+    seed_dataset(engine, expenses=2000, tags=50)
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            explain = explain_postgres
+        else:
+            explain = explain_sqlite
+        result = {}
+        for name, stmt in catalogue(conn):
+            sql, params = compile_statement(stmt)
+            result[name] = explain(conn, sql, params)[0]
+        conn.rollback()
+    return result
+
+
+def test_hot_queries_have_an_index(plans):
+    assert len(plans) == 18
+    # Counting every live expense reads the whole table either way
+    assert plans.pop("stats: live expense count") in ([], ["SCAN expenses"])
+    assert {name: scans for name, scans in plans.items() if scans} == {}
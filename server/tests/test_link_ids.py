@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import Column, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from app.config import settings
+from app.models.link_ids import derive_link_id, link_id_property, parse_link_id
+from factories import atomic_request, create_expense_tag, delete_expense_tag, group, mapping, new_client_id
+
+_Base = declarative_base()
+
+
+class _Link(_Base):
+    """The compact layout's shape, independent of COMPACT_LINK_TABLES."""
+    __tablename__ = "links"
+    expense_id = Column(String, primary_key=True)
+    tag_id = Column(String, primary_key=True)
+    legacy_id = Column(String, unique=True)
+    id = link_id_property("expense_id")
+
+
+@pytest.fixture
+def links():
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        legacy = _Link(expense_id="e1", tag_id="t1")
+        legacy.id = "3f0c9a52-legacy"
+        session.add_all([legacy, _Link(expense_id="e1", tag_id="t2"), _Link(expense_id="e2", tag_id="t1")])
+        session.commit()
+        yield session
+
+
+def test_parse_and_derive():
+    assert parse_link_id(derive_link_id("e1", "t1")) == ("e1", "t1")
+    assert parse_link_id("3f0c9a52-legacy") is None
+    assert parse_link_id(":t1") is None and parse_link_id("e1:") is None
+
+
+def test_ids_are_derived_unless_legacy(links):
+    assert sorted(link.id for link in links.query(_Link)) == ["3f0c9a52-legacy", "e1:t2", "e2:t1"]
+
+
+def test_filters_on_id_become_key_lookups(links):
+    assert links.query(_Link).filter(_Link.id == "e1:t2").one().tag_id == "t2"
+    assert links.query(_Link).filter(_Link.id == "3f0c9a52-legacy").one().tag_id == "t1"
+    assert links.query(_Link).filter(_Link.id == "e1:t1").one().legacy_id == "3f0c9a52-legacy"
+    assert links.query(_Link).filter(_Link.id == "e9:t9").first() is None
+    found = links.query(_Link).filter(_Link.id.in_(["e2:t1", "3f0c9a52-legacy", "missing"])).all()
+    assert sorted(link.expense_id + link.tag_id for link in found) == ["e1t1", "e2t1"]
+    assert links.query(_Link).filter(_Link.id.in_([])).all() == []
+    # Selecting the id itself yields what the instances report
+    assert sorted(links.scalars(links.query(_Link.id).statement)) == ["3f0c9a52-legacy", "e1:t2", "e2:t1"]
+
+
+def test_link_id_round_trips_through_sync(client, seeded):
+    client_id = new_client_id()
+    created = client.post("/api/v1/sync/atomic", json=atomic_request(
+        group(create_expense_tag(seeded["expense"], seeded["other_tag"], client_id=client_id))
+    )).json()["groupResults"][0]
+    link_id = mapping(created, "expense_tag", client_id)
+    if settings.compact_link_tables:
+        assert link_id == derive_link_id(seeded["expense"], seeded["other_tag"])
+
+    synced = client.get("/api/v1/sync/updated-data?since=0").json()["expenseTags"]
+    assert sorted(link["id"] for link in synced) == sorted([link_id, seeded["expense_tag"]])
+
+    for server_id in (link_id, seeded["expense_tag"]):
+        result = client.post("/api/v1/sync/atomic", json=atomic_request(group(delete_expense_tag(server_id))))
+        assert result.json()["groupResults"][0]["success"]
+    assert client.get("/api/v1/sync/updated-data?since=0").json()["expenseTags"] == []
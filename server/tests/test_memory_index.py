@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Tag
+from app.services.memory_index import MemoryIndex
+from app.services.tag_autocomplete import tag_autocomplete
+
+
+class _CountingIndex(MemoryIndex):
+    name = "counting"
+    tables = frozenset({"tags"})
+
+    def __init__(self):
+        super().__init__()
+        self.builds = self.refreshes = 0
+
+    def build(self, db):
+        self.builds += 1
+
+    def refresh(self, db, tables):
+        self.refreshes += 1
+
+
+def test_rebuild_is_not_starved_by_steady_writes(monkeypatch):
+    monkeypatch.setattr(settings, "memory_index_rebuild_seconds", 0.3)
+    monkeypatch.setattr(settings, "memory_index_refresh_delay", 0.01)
+    index = _CountingIndex()
+    index.start(SessionLocal)
+    try:
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            index._on_change({"tags"})
+            time.sleep(0.02)
+    finally:
+        index.stop()
+    assert index.builds >= 3
+    assert index.refreshes > index.builds
+
+
+def suggested(prefix):
+    return [tag["name"] for tag in tag_autocomplete.suggest(prefix)]
+
+
+def test_autocomplete_catches_up_after_the_refresh_delay(db):
+    tag_autocomplete.ensure_built()
+    db.add(Tag(tag="Café visits", monthly_amount=0, current_month=1, current_year=2025))
+    db.commit()
+
+    deadline = time.time() + settings.memory_index_refresh_delay + 5
+    while "Café visits" not in suggested("cafe") and time.time() < deadline:
+        time.sleep(0.05)
+    assert suggested("cafe") == suggested("VIS") == ["Café visits"]
@@ -0,0 +1,106 @@
+import msgpack
+import pytest
+
+from app.config import settings
+from app.models import Expense, Tag
+from app.schemas_atomic import AtomicSyncRequest
+from app.services.operation_coalescer import TombstoneCreate, coalesce_operations
+from app.wire_format import decode_atomic_request
+from factories import (
+    atomic_request, create_expense, create_tag, create_expense_tag, delete_expense, delete_tag, group,
+    mapping, update_expense, update_tag
+)
+
+
+def from_json(body):
+    return AtomicSyncRequest.model_validate(body)
+
+
+def from_msgpack(body):
+    # Coded subclasses of the operation classes, as the MessagePack decoder builds them
+    return decode_atomic_request(msgpack.packb(body, use_bin_type=True))
+
+
+@pytest.fixture(params=[from_json, from_msgpack], ids=["json", "msgpack"])
+def operations(request):
+    return lambda *ops: request.param(atomic_request(group(*ops))).groups[0].operations
+
+
+def push(client, *ops, group_type="expense"):
+    response = client.post("/api/v1/sync/atomic", json=atomic_request(group(*ops, group_type=group_type)))
+    assert response.status_code == 200
+    return response.json()["groupResults"][0]
+
+
+def test_adjacent_chain_folds_into_one_operation(operations):
+    create = create_expense("Draft")
+    ops, folded = coalesce_operations(operations(
+        create,
+        update_expense(create["clientId"], "Lunch", amount=900),
+        update_expense(create["clientId"], "Dinner", amount=1200),
+    ))
+    assert folded == 2
+    assert [(op.type, op.title, op.amount) for op in ops] == [("create_expense", "Dinner", 1200)]
+
+    ops, folded = coalesce_operations(operations(create, delete_expense(create["clientId"])))
+    assert folded == 1 and isinstance(ops[0], TombstoneCreate)
+
+    ops, folded = coalesce_operations(operations(
+        update_expense("server-1", "Lunch", expectedVersion=3),
+        delete_expense("server-1"),
+    ))
+    assert folded == 1
+    assert [(op.type, op.expected_version) for op in ops] == [("delete_expense", 3)]
+
+
+def test_operations_on_another_entity_stop_folding(operations):
+    ops, folded = coalesce_operations(operations(
+        update_tag("t1", "tmp"), update_tag("t2", "a"), update_tag("t1", "b"),
+    ))
+    assert folded == 0
+    assert [(op.server_id, op.name) for op in ops] == [("t1", "tmp"), ("t2", "a"), ("t1", "b")]
+
+
+def test_referenced_create_is_not_tombstoned(operations):
+    create = create_expense()
+    ops, folded = coalesce_operations(operations(
+        create, delete_expense(create["clientId"]), create_expense_tag(create["clientId"], "tag-1"),
+    ))
+    assert folded == 0 and len(ops) == 3
+
+
+def test_rename_swap_under_unique_tag_names(client, db):
+    first, second = create_tag("a"), create_tag("b")
+    created = push(client, first, second, group_type="tag")
+    t1, t2 = mapping(created, "tag", first["clientId"]), mapping(created, "tag", second["clientId"])
+
+    swapped = push(client, update_tag(t1, "tmp"), update_tag(t2, "a"), update_tag(t1, "b"), group_type="tag")
+    assert swapped["success"], swapped["error"]
+    assert {tag.id: tag.tag for tag in db.query(Tag)} == {t1: "b", t2: "a"}
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_client_id_addresses_entity_created_in_group(client, db, monkeypatch, coalesce):
+    monkeypatch.setattr(settings, "atomic_sync_coalesce", coalesce)
+    create = create_expense("Draft")
+    result = push(client, create, create_tag("food"), update_expense(create["clientId"], "Lunch", amount=900))
+    assert result["success"], result["error"]
+    expense = db.get(Expense, mapping(result, "expense", create["clientId"]))
+    assert (expense.title, expense.amount) == ("Lunch", 900)
+
+
+def test_msgpack_group_is_coalesced(client, db):
+    create, tombstoned = create_expense("Draft"), create_tag("tmp")
+    body = atomic_request(
+        group(create, update_expense(create["clientId"], "Lunch", amount=900)),
+        group(tombstoned, delete_tag(tombstoned["clientId"]), group_type="tag"),
+    )
+    response = client.post(
+        "/api/v1/sync/atomic", content=msgpack.packb(body, use_bin_type=True),
+        headers={"Content-Type": "application/msgpack"},
+    )
+    first, second = response.json()["groupResults"]
+    assert first["success"] and first["foldedOperations"] == 1
+    assert second["success"] and second["foldedOperations"] == 1
+    assert db.get(Expense, mapping(first, "expense", create["clientId"])).title == "Lunch"
+    assert db.get(Tag, mapping(second, "tag", tombstoned["clientId"])).deleted_at is not None
@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, engine
+from app.models import Expense, ExpenseTagsCrossRef, Tag
+from app.services.partition_service import PartitionService
+
+MIGRATION = Path(__file__).resolve().parent.parent / "migrations" / "optional" / "001_partition_expenses_by_year.sql"
+
+
+def test_no_op_on_unpartitioned_table(db):
+    service = PartitionService(db)
+    assert not service.is_partitioned()
+    assert service.ensure_partitions() == [] and service.list_partitions() == []
+    with pytest.raises(ValueError):
+        service.detach_year(2024)
+
+
+@pytest.fixture
+def partitioned_db():
+    """A scratch PostgreSQL database with the optional migration applied."""
+    name = f"financehub_part_{uuid.uuid4().hex[:8]}"
+    admin = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    scratch = create_engine(make_url(engine.url).set(database=name))
+    try:
+        Base.metadata.create_all(scratch)
+        session = sessionmaker(bind=scratch)()
+        tag = Tag(tag="groceries", monthly_amount=0, current_month=1, current_year=2024)
+        expense = Expense(title="Old shop", amount=10, year=2024, month=5, date=1)
+        session.add_all([tag, expense])
+        session.flush()
+        session.add(ExpenseTagsCrossRef(expense_id=expense.id, tag_id=tag.id))
+        # Stands in for migration 009's trigram index where pg_trgm is missing
+        session.execute(text("CREATE INDEX IF NOT EXISTS idx_expenses_title_trgm ON expenses (title)"))
+        session.commit()
+        # Sent as one batch on a raw cursor, as run_migrations.py does
+        raw = scratch.raw_connection()
+        try:
+            raw.autocommit = True
+            raw.cursor().execute(MIGRATION.read_text())
+        finally:
+            raw.close()
+        yield session
+        session.close()
+    finally:
+        scratch.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE "{name}"'))
+
+
+@pytest.mark.postgres
+def test_partitioned_expenses(partitioned_db):
+    db = partitioned_db
+    service = PartitionService(db)
+    assert service.is_partitioned()
+    this_year = datetime.utcnow().year
+    assert service.ensure_partitions(years_ahead=2) == [f"expenses_y{y}" for y in range(this_year, this_year + 3)]
+
+    names = {p["name"] for p in service.list_partitions()}
+    assert {"expenses_default", "expenses_y2024", f"expenses_y{this_year + 2}"} <= names
+    assert db.execute(text("SELECT count(*) FROM expenses_unpartitioned")).scalar() == 1
+
+    # The old table's indexes are renamed; the parent gets migration 008/009's names
+    def indexes(table):
+        return set(db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": table}).scalars())
+    live = {"idx_expenses_year_month_live", "idx_expenses_updated_live", "idx_expenses_created_live"}
+    trigram = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+    assert live | {"expenses_pkey"} | ({"idx_expenses_title_trgm"} if trigram else set()) <= indexes("expenses")
+    assert {"expenses_unpartitioned_pkey", "idx_expenses_unpartitioned_title_trgm"} <= indexes("expenses_unpartitioned")
+    assert not (live | {"idx_expenses_title_trgm"}) & indexes("expenses_unpartitioned")
+    covering = db.execute(text("SELECT indexdef FROM pg_indexes WHERE indexname = 'idx_expenses_year_month_live'")).scalar()
+    assert "INCLUDE (amount)" in covering and "WHERE (deleted_at IS NULL)" in covering
+
+    # ORM writes keep working; a year change moves the row, a year without a
+    # partition lands in the default one until ensure_expense_partition() moves it
+    expense = db.query(Expense).one()
+    expense.year = this_year
+    db.commit()
+    assert db.execute(text(f"SELECT count(*) FROM expenses_y{this_year}")).scalar() == 1
+    db.add(Expense(title="Typo", amount=1, year=2091, month=1, date=1))
+    db.commit()
+    assert db.execute(text("SELECT count(*) FROM expenses_default")).scalar() == 1
+    assert db.execute(text("SELECT ensure_expense_partition(2091)")).scalar() == "expenses_y2091"
+    db.commit()
+    assert db.execute(text("SELECT count(*) FROM expenses_default")).scalar() == 0
+
+    # Links survive without the expense_id foreign key
+    assert db.query(ExpenseTagsCrossRef).count() == 1
+
+    assert service.detach_year(2091) == "expenses_y2091"
+    assert db.query(Expense).count() == 1
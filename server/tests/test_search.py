@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import Expense, Tag
+
+
+@pytest.fixture
+def searchable(db):
+    for name in ("groceries", "grocery run", "fuel", "100% juice"):
+        db.add(Tag(tag=name, monthly_amount=0, current_month=1, current_year=2025))
+    db.add_all([
+        Expense(title="Weekly groceries", amount=42, year=2025, month=1, date=3),
+        Expense(title="Coffee", amount=3, year=2025, month=1, date=4),
+        Expense(title="Old groceries", amount=9, year=2025, month=1, date=5, deleted_at=datetime.utcnow()),
+    ])
+    db.commit()
+
+
+def search(client, query):
+    response = client.get(f"/api/v1/search?{query}")
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_ranked_substring_matches(client, searchable):
+    result = search(client, "q=groceries")
+    assert [tag["name"] for tag in result["tags"]][0] == "groceries"
+    assert [expense["title"] for expense in result["expenses"]] == ["Weekly groceries"]
+
+    names = [tag["name"] for tag in search(client, "q=grocer&type=tags")["tags"]]
+    assert sorted(names) == ["groceries", "grocery run"]
+    assert search(client, "q=grocer&type=tags")["expenses"] == []
+
+
+def test_short_and_literal_terms(client, searchable):
+    # Under three characters there is no trigram; LIKE wildcards are literal
+    assert [tag["name"] for tag in search(client, "q=ru&type=tags")["tags"]] == ["grocery run"]
+    assert [tag["name"] for tag in search(client, "q=0%25&type=tags")["tags"]] == ["100% juice"]
+    assert search(client, "q=_&type=tags")["tags"] == []
+
+
+def test_paging_and_updates(client, db, searchable):
+    first = search(client, "q=grocer&type=tags&limit=1")["tags"]
+    second = search(client, "q=grocer&type=tags&limit=1&offset=1")["tags"]
+    assert len(first) == len(second) == 1 and first != second
+
+    coffee = db.query(Expense).filter_by(title="Coffee").one()
+    coffee.title = "Iced coffee"
+    db.commit()
+    assert [e["title"] for e in search(client, "q=iced&type=expenses")["expenses"]] == ["Iced coffee"]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import InternalError
+
+from app.database import SessionLocal, begin_read_snapshot, engine
+from app.models import Expense, Tag
+from app.routes.batch_sync import _updated_data_parts
+from app.services.archive_service import ArchiveService
+from app.sync_payloads import select_many
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def statements_during(fn):
+    seen = []
+    listener = lambda conn, cursor, statement, *args: seen.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return result, seen
+
+
+def test_one_statement_returns_what_each_select_would(db, seeded):
+    # One expense archived and one live, so two parts fill each of those lists
+    ArchiveService(db).archive(datetime.utcnow() + timedelta(days=1))
+    db.add(Tag(tag="fuel", monthly_amount=0, current_month=1, current_year=2025))
+    db.add(Expense(title="Bus", amount=3, year=2025, month=3, date=15))
+    db.commit()
+
+    parts = _updated_data_parts(EPOCH)
+    rows, statements = statements_during(lambda: select_many(db, parts))
+    assert len(statements) == 1
+
+    expected = {}
+    for spec, where in parts:
+        expected.setdefault(spec.response_key, []).extend(db.execute(spec.select().where(*where)).all())
+    assert {key: sorted(map(tuple, value)) for key, value in rows.items()} == \
+        {key: sorted(map(tuple, value)) for key, value in expected.items()}
+    assert (len(rows["expenses"]), len(rows["expenseTags"]), len(rows["tags"])) == (2, 1, 3)
+
+
+def test_filters_apply_per_part(db, seeded):
+    rows = select_many(db, _updated_data_parts(datetime.utcnow() + timedelta(days=1)))
+    assert set(rows) == {spec.response_key for spec, _ in _updated_data_parts(EPOCH)}
+    assert not any(rows.values())
+
+
+@pytest.mark.postgres
+def test_read_snapshot_is_repeatable_and_read_only(seeded):
+    reader, writer = SessionLocal(), SessionLocal()
+    try:
+        begin_read_snapshot(reader)
+        count = lambda: reader.execute(text("SELECT count(*) FROM tags")).scalar()  # noqa: E731
+        assert count() == 2
+        writer.add(Tag(tag="fuel", monthly_amount=0, current_month=1, current_year=2025))
+        writer.commit()
+        assert count() == 2  # Same snapshot for the rest of the transaction
+        assert reader.execute(text("SHOW transaction_isolation")).scalar() == "repeatable read"
+        with pytest.raises(InternalError):
+            reader.execute(text("DELETE FROM tags"))
+        reader.rollback()
+
+        begin_read_snapshot(reader)
+        assert count() == 3
+    finally:
+        reader.close()
+        writer.close()
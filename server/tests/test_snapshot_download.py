@@ -0,0 +1,65 @@
+import gzip
+
+import orjson
+import pytest
+
+from app.config import settings
+
+URL = "/api/v1/sync/snapshot"
+
+
+@pytest.fixture
+def full(client, seeded):
+    response = client.get(URL)
+    assert response.status_code == 200 and response.headers["accept-ranges"] == "bytes"
+    return response
+
+
+def get_range(client, value, **headers):
+    return client.get(URL, headers={"Range": value, **headers})
+
+
+def test_full_download_is_the_snapshot(full, seeded):
+    records = [orjson.loads(line) for line in gzip.decompress(full.content).splitlines()]
+    assert records[0]["type"] == "meta" and records[-1]["type"] == "end"
+    assert str(records[0]["watermark"]) == full.headers["x-sync-watermark"]
+    assert full.headers["etag"] == f'"snapshot-{records[0]["watermark"]}"'
+    assert int(full.headers["content-length"]) == len(full.content)
+
+
+def test_interrupted_download_resumes(client, full):
+    size = len(full.content)
+    head = get_range(client, "bytes=0-99")
+    assert head.status_code == 206 and head.headers["content-range"] == f"bytes 0-99/{size}"
+    rest = get_range(client, "bytes=100-", **{"If-Range": full.headers["etag"]})
+    assert rest.status_code == 206 and rest.headers["content-range"] == f"bytes 100-{size - 1}/{size}"
+    assert head.content + rest.content == full.content
+
+    tail = get_range(client, "bytes=-50")
+    assert tail.status_code == 206 and tail.content == full.content[-50:]
+    past_the_end = get_range(client, f"bytes={size - 10}-{size + 1000}")
+    assert past_the_end.status_code == 206 and past_the_end.content == full.content[-10:]
+
+
+def test_ranges_that_send_the_whole_file_or_416(client, full):
+    size = len(full.content)
+    for value, headers in [
+        ("bytes=100-", {"If-Range": '"snapshot-1"'}),  # Snapshot was rebuilt since
+        ("bytes=0-9,20-29", {}),  # Several ranges are not supported
+        ("bytes=abc-", {}),
+        ("items=0-9", {}),
+    ]:
+        response = get_range(client, value, **headers)
+        assert (response.status_code, response.content) == (200, full.content), value
+
+    for value in (f"bytes={size}-", "bytes=-0", "bytes=20-10"):
+        response = get_range(client, value)
+        assert response.status_code == 416 and response.headers["content-range"] == f"bytes */{size}", value
+
+
+def test_accel_redirect_leaves_the_body_to_nginx(client, full, monkeypatch):
+    monkeypatch.setattr(settings, "snapshot_accel_redirect_prefix", "/protected/snapshots/")
+    response = get_range(client, "bytes=0-99")
+    assert response.status_code == 200 and response.content == b""
+    name = response.headers["content-disposition"].split('"')[1]
+    assert response.headers["x-accel-redirect"] == f"/protected/snapshots/{name}"
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import orjson
+import pytest
+
+from app.config import settings
+from app.routes.batch_sync import _updated_data_parts
+from app.sync_payloads import _join_arrays, json_document, serialize_many, select_many
+
+
+def both_ways(client, monkeypatch, method, url):
+    python_built = client.request(method, url).json()
+    monkeypatch.setattr(settings, "sync_sql_json", True)
+    sql_built = client.request(method, url).json()
+    monkeypatch.setattr(settings, "sync_sql_json", False)
+    return python_built, sql_built
+
+
+@pytest.mark.postgres
+def test_updated_data_is_identical(client, seeded, monkeypatch):
+    python_built, sql_built = both_ways(client, monkeypatch, "GET", "/api/v1/sync/updated-data?since=0")
+    assert sql_built == python_built
+    assert all(python_built[key] for key in ("expenses", "tags", "expenseTags", "wishlistTags"))
+
+    # Nothing changed since: every list is empty, not null
+    python_built, sql_built = both_ways(client, monkeypatch, "GET", "/api/v1/sync/updated-data?since=32503680000000")
+    assert sql_built == python_built and not any(python_built.values())
+
+
+@pytest.mark.postgres
+def test_full_sync_is_identical(client, seeded, monkeypatch):
+    python_built, sql_built = both_ways(client, monkeypatch, "POST", "/api/v1/sync/full")
+    assert sql_built == python_built
+
+
+@pytest.mark.postgres
+def test_document_matches_select_many(db, seeded):
+    parts = _updated_data_parts(datetime(1970, 1, 1))
+    document = orjson.loads(json_document(db, parts, extra={"serverTimestamp": 1}))
+    assert document.pop("serverTimestamp") == 1
+    assert document == serialize_many(parts, select_many(db, parts))
+
+
+def test_join_arrays():
+    assert _join_arrays(['[{"a":1}]']) == '[{"a":1}]'
+    assert orjson.loads(_join_arrays(['[{"a":1}]', "[]", ' [ {"b":2} ] '])) == [{"a": 1}, {"b": 2}]
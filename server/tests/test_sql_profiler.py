@@ -0,0 +1,30 @@
+from app import sql_profiler
+
+
+def test_normalize_sql_groups_bound_values_and_in_lists():
+    a = sql_profiler.normalize_sql("SELECT * FROM tags WHERE id IN (?, ?, ?) AND year = 2024")
+    b = sql_profiler.normalize_sql("SELECT *  FROM tags\nWHERE id IN (?, ?) AND year = 2025")
+    assert a == b == "SELECT * FROM tags WHERE id IN (?...) AND year = ?"
+    assert sql_profiler.normalize_sql("SELECT 'x' WHERE a = :a_1") == "SELECT ? WHERE a = ?"
+
+
+def test_profiled_request_reports_its_statements(client):
+    response = client.get(
+        "/api/v1/sync/updated-data?since=0",
+        headers={"X-Profile-SQL": "1", "X-Request-ID": "profile-test"}
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "profile-test"
+    assert response.headers["X-SQL-Profile"].startswith("id=profile-test; statements=")
+
+    profile = client.get("/debug/profiles/profile-test").json()
+    assert profile["path"] == "/api/v1/sync/updated-data"
+    assert profile["statement_count"] >= 1
+    assert profile["top_statements"][0]["count"] >= 1
+    assert "profile-test" in client.get("/debug/profiles").json()["request_ids"]
+
+
+def test_unprofiled_request_has_no_summary(client):
+    response = client.get("/api/v1/sync/updated-data?since=0")
+    assert response.status_code == 200
+    assert "X-SQL-Profile" not in response.headers
@@ -0,0 +1,38 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.models import Expense
+from app.models.schemas import SyncDeltaResponse
+
+
+def _as_pydantic_would(payload):
+    """The payload as the old per-row ExpenseResponse/TagResponse/... path rendered it."""
+    return SyncDeltaResponse.model_validate(payload).model_dump(mode="json")
+
+
+def test_full_sync_matches_the_response_model(client, seeded):
+    payload = client.post("/api/v1/sync/full").json()
+
+    assert payload == _as_pydantic_would(payload)
+    assert [e["id"] for e in payload["expenses"]] == [seeded["expense"]]
+    assert sorted(t["tag"] for t in payload["tags"]) == ["groceries", "rent"]
+    assert payload["targets"][0]["tag_id"] == seeded["tag"]
+    assert payload["graph_edges"][0]["weight"] == 2
+    assert abs(payload["last_sync_timestamp"] - time.time()) < 60
+
+
+def test_full_sync_leaves_out_deleted_rows(client, db, seeded):
+    db.execute(update(Expense).values(deleted_at=datetime.utcnow()))
+    db.commit()
+    assert client.post("/api/v1/sync/full").json()["expenses"] == []
+
+
+def test_delta_filters_by_since(client, seeded):
+    everything = client.get("/api/v1/sync/delta").json()
+    assert everything == _as_pydantic_would(everything)
+    assert len(everything["expenses"]) == 1 and len(everything["graph_edges"]) == 1
+
+    later = client.get(f"/api/v1/sync/delta?since={int(time.time()) + 3600}").json()
+    assert later["expenses"] == later["tags"] == later["targets"] == later["graph_edges"] == []
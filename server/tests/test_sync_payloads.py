@@ -0,0 +1,30 @@
+from app.schemas import UpdatedDataResponse
+from app.sync_payloads import EXPENSE_SPEC, SYNC_ENTITY_SPECS
+
+
+def test_updated_data_matches_the_api_schemas(client, seeded):
+    payload = client.get("/api/v1/sync/updated-data?since=0").json()
+
+    assert set(payload) == {spec.response_key for spec in SYNC_ENTITY_SPECS}
+    # Re-validating through the Api* models and dumping by alias gives back
+    # exactly what the fast path produced: same keys, same values
+    model = UpdatedDataResponse.model_validate(payload)
+    assert model.model_dump(by_alias=True) == payload
+    assert {key: len(items) for key, items in payload.items()} == {
+        "expenses": 1, "tags": 2, "targets": 1, "expenseTags": 1,
+        "graphEdges": 1, "wishlist": 1, "wishlistTags": 1,
+    }
+
+    expense = payload["expenses"][0]
+    assert expense["id"] == seeded["expense"]
+    assert expense["title"] == "Weekly shop"
+    assert isinstance(expense["createdAt"], int) and expense["createdAt"] > 0
+    assert payload["expenseTags"][0]["expenseId"] == seeded["expense"]
+
+
+def test_serialize_converts_timestamps_to_millis(db, seeded):
+    rows = db.execute(EXPENSE_SPEC.select()).all()
+    [item] = EXPENSE_SPEC.serialize(rows)
+    assert item["updatedAt"] == int(rows[0].updated_at.timestamp() * 1000)
+    assert list(item) == list(EXPENSE_SPEC.keys)
+    assert EXPENSE_SPEC.serialize([(None,) * len(EXPENSE_SPEC.keys)])[0]["createdAt"] == 0
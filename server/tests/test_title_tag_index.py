@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, update
+
+from app.database import SessionLocal
+from app.models import Expense, ExpenseTagsCrossRef
+from app.services.archive_service import ArchiveService
+from app.services.title_tag_index import TitleTagIndex
+
+ALL_TABLES = {"expenses", "expense_tags", "tags"}
+
+
+@pytest.fixture
+def index(db, seeded):
+    # Written well before the index's mark (the newer bus ticket), so only a
+    # change a refresh can see brings them back
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    for model in (Expense, ExpenseTagsCrossRef):
+        db.execute(update(model).values(updated_at=yesterday))
+    ticket = Expense(title="Bus ticket", amount=3, year=2025, month=3, date=15)
+    db.add(ticket)
+    db.flush()
+    db.add(ExpenseTagsCrossRef(expense_id=ticket.id, tag_id=seeded["other_tag"]))
+    db.commit()
+    index = TitleTagIndex()
+    with SessionLocal() as session:
+        index.build(session)
+    return index
+
+
+def refresh(index, tables=ALL_TABLES):
+    with SessionLocal() as session:
+        index.refresh(session, set(tables))
+
+
+def suggested(index, title):
+    return [rec["tag_name"] for rec in index.suggest(title)]
+
+
+def test_new_links_and_titles_are_picked_up(db, seeded, index):
+    assert suggested(index, "weekly shop") == ["groceries"]
+    db.add(ExpenseTagsCrossRef(expense_id=seeded["expense"], tag_id=seeded["other_tag"]))
+    db.get(Expense, seeded["expense"]).title = "Monthly shop"
+    db.commit()
+
+    refresh(index)
+    assert suggested(index, "weekly") == []
+    assert sorted(suggested(index, "monthly")) == ["groceries", "rent"]
+
+
+def test_hard_deleted_link_is_subtracted(db, seeded, index):
+    # Deleted without touching the expense, as compaction does
+    db.execute(delete(ExpenseTagsCrossRef).where(ExpenseTagsCrossRef.expense_id == seeded["expense"]))
+    db.commit()
+
+    refresh(index, {"expense_tags"})
+    assert suggested(index, "weekly shop") == []
+    assert suggested(index, "bus") == ["rent"]
+
+
+def test_archived_expense_leaves_the_index(db, seeded, index):
+    ArchiveService(db).archive(datetime.utcnow() + timedelta(days=1))
+    refresh(index)
+    assert suggested(index, "weekly shop") == []
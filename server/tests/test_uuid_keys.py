@@ -0,0 +1,94 @@
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base, engine
+from app.models import Expense, ExpenseTagsCrossRef, Tag
+from app.utils import uuid7 as uuid7_module
+from app.utils.uuid7 import uuid7
+
+MIGRATION = Path(__file__).resolve().parent.parent / "migrations" / "optional" / "002_native_uuid_keys.sql"
+
+
+def test_uuid7_layout_and_order():
+    before = time.time_ns() // 1_000_000
+    ids = [uuid7() for _ in range(10_000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert {(u.version, u.variant) for u in ids} == {(7, uuid.RFC_4122)}
+    assert before <= ids[0].int >> 80 <= time.time_ns() // 1_000_000
+
+
+def test_uuid7_stays_increasing_within_one_millisecond(monkeypatch):
+    monkeypatch.setattr(uuid7_module.time, "time_ns", lambda: 1_700_000_000_000 * 1_000_000)
+    ids = [uuid7() for _ in range(10_000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    # More ids than the 12-bit counter holds: later ones borrow the next milliseconds
+    assert ids[-1].int >> 80 > ids[0].int >> 80
+
+
+@pytest.fixture
+def migrated_engine(monkeypatch):
+    """A scratch PostgreSQL database with data in it, converted by migration 002."""
+    name = f"financehub_uuid_{uuid.uuid4().hex[:8]}"
+    admin = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    scratch = create_engine(make_url(engine.url).set(database=name))
+    try:
+        Base.metadata.create_all(scratch)
+        with sessionmaker(bind=scratch)() as session:
+            tag = Tag(tag="groceries", monthly_amount=0, current_month=1, current_year=2025)
+            expense = Expense(title="Weekly shop", amount=42, year=2025, month=1, date=3)
+            session.add_all([tag, expense])
+            session.flush()
+            session.add(ExpenseTagsCrossRef(expense_id=expense.id, tag_id=tag.id))
+            session.commit()
+        raw = scratch.raw_connection()
+        try:
+            raw.cursor().execute(MIGRATION.read_text())
+            raw.commit()
+        finally:
+            raw.close()
+        scratch.dispose()
+
+        # GUID picks its column type per dialect, so the setting must be on first
+        monkeypatch.setattr(settings, "native_uuid_keys", True)
+        native = create_engine(make_url(engine.url).set(database=name))
+        yield native
+        native.dispose()
+    finally:
+        scratch.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE "{name}"'))
+
+
+@pytest.mark.postgres
+@pytest.mark.skipif(settings.compact_link_tables, reason="migration 002 needs the surrogate link ids")
+def test_native_uuid_keys_after_migration(migrated_engine):
+    schema = inspect(migrated_engine)
+    types = {(table, column["name"]): str(column["type"])
+             for table in ("expenses", "expense_tags", "entity_mappings")
+             for column in schema.get_columns(table)}
+    assert types[("expenses", "id")] == types[("expense_tags", "tag_id")] == "UUID"
+    assert types[("entity_mappings", "client_id")] == "VARCHAR"
+    assert {fk["referred_table"] for fk in schema.get_foreign_keys("expense_tags")} == {"expenses", "tags"}
+
+    with sessionmaker(bind=migrated_engine)() as db:
+        expense = db.query(Expense).one()
+        assert isinstance(expense.id, str)
+        assert db.get(Expense, expense.id.upper()).title == "Weekly shop"
+        assert db.get(Expense, "client-local-7") is None  # Not a UUID: matches nothing
+
+        tag = db.query(Tag).one()
+        db.add_all([Expense(title=f"Bus {i}", amount=i + 1, year=2025, month=1, date=4) for i in range(3)])
+        db.flush()
+        db.add_all(ExpenseTagsCrossRef(expense_id=e.id, tag_id=tag.id)
+                   for e in db.query(Expense).filter(Expense.title.like("Bus%")))
+        db.commit()
+        assert db.query(ExpenseTagsCrossRef).filter_by(tag_id=tag.id).count() == 4
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.database import SessionLocal
+from app.models import Expense, Tag
+from app.services.versioned_writes import VersionConflictError, update_versioned
+from factories import atomic_request, delete_expense, group, update_expense, update_tag
+
+
+def push(client, *operations):
+    return client.post("/api/v1/sync/atomic", json=atomic_request(group(*operations))).json()["groupResults"][0]
+
+
+def synced(client, key, entity_id):
+    items = client.get("/api/v1/sync/updated-data?since=0").json()[key]
+    return next(item for item in items if item["id"] == entity_id)
+
+
+def test_stale_expected_version_rolls_back_the_group(client, seeded):
+    assert push(client, update_expense(seeded["expense"], "Phone edit", expectedVersion=1))["success"]
+    assert synced(client, "expenses", seeded["expense"])["version"] == 2
+
+    # A second device still at version 1; the tag rename in the same group is undone too
+    result = push(client, update_tag(seeded["tag"], "food"),
+                  update_expense(seeded["expense"], "Tablet edit", expectedVersion=1))
+    assert not result["success"] and result["rolledBack"]
+    assert "version conflict" in result["error"] and "expected 1, current 2" in result["error"]
+    expense = synced(client, "expenses", seeded["expense"])
+    assert (expense["title"], expense["version"]) == ("Phone edit", 2)
+    assert synced(client, "tags", seeded["tag"])["name"] == "groceries"
+
+
+def test_without_expected_version_last_writer_wins(client, seeded):
+    assert push(client, update_expense(seeded["expense"], "First"))["success"]
+    assert push(client, update_expense(seeded["expense"], "Second"))["success"]
+    expense = synced(client, "expenses", seeded["expense"])
+    assert (expense["title"], expense["version"]) == ("Second", 3)
+
+
+def test_delete_checks_the_version(client, db, seeded):
+    assert not push(client, delete_expense(seeded["expense"], expectedVersion=7))["success"]
+    assert db.get(Expense, seeded["expense"]).deleted_at is None
+    assert push(client, delete_expense(seeded["expense"], expectedVersion=1))["success"]
+    db.expire_all()
+    expense = db.get(Expense, seeded["expense"])
+    assert expense.deleted_at is not None and expense.version == 2
+
+
+def test_missing_row_is_not_a_conflict(db, seeded):
+    assert update_versioned(db, Expense, "no-such-expense", {"title": "x"}, expected_version=1) is None
+    with pytest.raises(VersionConflictError) as conflict:
+        update_versioned(db, Expense, seeded["expense"], {"title": "x"}, expected_version=5)
+    assert (conflict.value.expected, conflict.value.current) == (5, 1)
+
+
+def test_batch_endpoint_reports_the_conflict_per_operation(client, seeded):
+    results = client.post("/api/v1/sync/batch/expenses", json={"operations": [
+        update_expense(seeded["expense"], "Stale", expectedVersion=3),
+        update_expense(seeded["expense"], "Current", expectedVersion=1),
+    ]}).json()["results"]
+    assert [r["success"] for r in results] == [False, True]
+    assert "version conflict" in results[0]["error"] and results[1]["version"] == 2
+
+
+def test_orm_flush_checks_the_version(seeded):
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        stale = second.get(Tag, seeded["tag"])
+        first.get(Tag, seeded["tag"]).tag = "food"
+        first.commit()
+        stale.tag = "drinks"
+        with pytest.raises(StaleDataError):
+            second.commit()
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,107 @@
+import msgpack
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+from app.config import settings
+from app.models import Expense
+from app.schemas_atomic import AtomicSyncRequest
+from app.wire_format import FIELD_NAMES, OPERATION_TYPE_NAMES, decode_atomic_request
+from factories import atomic_request, create_expense, create_tag, delete_expense, group, mapping, update_expense
+
+FIELD_CODES = {name: code for code, name in FIELD_NAMES.items()}
+TYPE_CODES = {name: code for code, name in OPERATION_TYPE_NAMES.items()}
+
+
+def encode(mapping_, key=str):
+    """Coded keys as the client writes them: key(code), type as its integer code."""
+    out = {}
+    for name, value in mapping_.items():
+        if name == "type":
+            value = TYPE_CODES[value]
+        elif name in ("groups", "operations"):
+            value = [encode(item, key) for item in value]
+        out[key(FIELD_CODES[name])] = value
+    return out
+
+
+def pack(body):
+    return msgpack.packb(body, use_bin_type=True)
+
+
+@pytest.fixture
+def body():
+    tag = create_tag("groceries")
+    expense = create_expense("Weekly shop")
+    return atomic_request(group(tag, expense), device_id="phone")
+
+
+def test_coded_integer_and_camel_case_bodies_decode_alike(body):
+    expected = AtomicSyncRequest.model_validate(body).model_dump()
+    for encoded in (encode(body), encode(body, key=int), body):
+        request = decode_atomic_request(pack(encoded))
+        assert isinstance(request, AtomicSyncRequest)
+        assert request.model_dump() == expected
+
+
+def test_type_name_is_accepted_in_coded_body(body):
+    encoded = encode(body)
+    operation = encoded["64"][0]["67"][0]
+    operation["type"] = OPERATION_TYPE_NAMES[operation.pop("0")]
+    assert decode_atomic_request(pack(encoded)).groups[0].operations[0].type == "create_tag"
+
+
+def test_errors_name_aliases_not_codes(body):
+    encoded = encode(body)
+    del encoded["64"][0]["67"][1]["3"]  # expense title
+    with pytest.raises(RequestValidationError) as info:
+        decode_atomic_request(pack(encoded))
+    locs = [err["loc"] for err in info.value.errors()]
+    assert ("body", "groups", 0, "operations", 1, "create_expense", "title") in locs
+
+
+def test_unknown_type_and_garbage_are_rejected(body):
+    encoded = encode(body)
+    encoded["64"][0]["67"][0]["0"] = 999
+    with pytest.raises(RequestValidationError) as info:
+        decode_atomic_request(pack(encoded))
+    assert info.value.errors()[0]["type"] == "operation_type_invalid"
+
+    with pytest.raises(RequestValidationError) as info:
+        decode_atomic_request(b"\xc1not msgpack")
+    assert info.value.errors()[0]["type"] == "msgpack_invalid"
+
+
+def test_atomic_sync_round_trip_in_msgpack(client, body):
+    response = client.post(
+        "/api/v1/sync/atomic", content=pack(encode(body)),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/msgpack")
+    result = msgpack.unpackb(response.content, raw=False)["groupResults"][0]
+    assert result["success"]
+    tag = body["groups"][0]["operations"][0]["clientId"]
+    assert mapping(result, "tag", tag)
+
+    invalid = client.post("/api/v1/sync/atomic", content=b"\xc1", headers={"Content-Type": "application/msgpack"})
+    assert invalid.status_code == 422
+
+
+@pytest.mark.parametrize("coalesce", [True, False])
+def test_msgpack_operations_address_entities_created_in_group(client, db, monkeypatch, coalesce):
+    monkeypatch.setattr(settings, "atomic_sync_coalesce", coalesce)
+    updated, deleted = create_expense("Draft"), create_expense("Scrap")
+    body = atomic_request(
+        group(updated, create_tag("food"), update_expense(updated["clientId"], "Lunch", amount=900)),
+        group(deleted, create_tag("rent"), delete_expense(deleted["clientId"])),
+    )
+    response = client.post(
+        "/api/v1/sync/atomic", content=pack(encode(body)),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    first, second = msgpack.unpackb(response.content, raw=False)["groupResults"]
+    assert first["success"], first["error"]
+    assert second["success"], second["error"]
+    expense = db.get(Expense, mapping(first, "expense", updated["clientId"]))
+    assert (expense.title, expense.amount) == ("Lunch", 900)
+    assert db.get(Expense, mapping(second, "expense", deleted["clientId"])).deleted_at is not None